@@ -0,0 +1,457 @@
+"""Build steps for the files under static/ (image variants, stylesheets, an SVG sprite), HTML minification and preload hints."""
+
+import contextlib
+import gzip
+import hashlib
+import io
+import os
+import re
+
+import click
+from flask import current_app, g, request, url_for
+from markupsafe import Markup, escape
+
+try:
+   import brotli
+except ImportError:  # Brotli is optional; without it clients get gzip instead
+   brotli = None
+
+try:
+   from PIL import Image, features
+except ImportError:  # Pillow is optional; pages fall back to the original image
+   Image = None
+
+try:
+   import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+except ImportError:
+   pass
+
+
+# Text formats worth precompressing; images like moon.png are already compressed.
+COMPRESSIBLE_MIMETYPES = {
+   "text/html",
+   "text/css",
+   "text/plain",
+   "text/calendar",
+   "application/javascript",
+   "application/json",
+   "image/svg+xml",
+}
+
+# Generated files live in their own directory so they can be wiped and rebuilt
+IMAGE_DIR = "img"
+
+# Pixel densities generated for every responsive image
+DENSITIES = (1, 2, 3)
+
+# Output formats, best first; the last one is the <img> fallback every browser supports
+IMAGE_FORMATS = (
+   ("avif", "image/avif", {"quality": 60}),
+   ("webp", "image/webp", {"quality": 85, "method": 6}),
+   ("png", "image/png", {"optimize": True}),
+)
+
+# Responsive images used by the templates: source file under static/ -> CSS width in px
+RESPONSIVE_IMAGES = {
+   "moon.png": 44,
+}
+
+# Generated stylesheets, one per page plus the shared "common" sheet
+STYLESHEET_DIR = "css"
+
+# Selectors inlined in "critical" mode: everything needed to paint the header and nav
+CRITICAL_SELECTORS = (":root", "*", "html", "body", ".moon-img", ".fixed-nav-header", ".nav-tab")
+
+# logical static filename -> fingerprinted filename, applied to url_for('static', ...)
+manifest = {}
+
+# stylesheet name -> CSS source
+_stylesheets = {}
+
+# source filename -> [(format, mimetype, [(variant filename, density), ...]), ...]
+_image_variants = {}
+
+# Every fingerprinted filename we generated, served with an immutable Cache-Control
+fingerprinted_files = set()
+
+# Static files a page's url_for calls are preloaded when they are one of these
+# types (extension -> the `as` of rel=preload); images are preloaded by
+# responsive_image(), which knows which variant the browser will pick
+PRELOAD_TYPES = {
+   ".css": "style",
+   ".js": "script",
+   ".woff2": "font",
+}
+
+# endpoint -> the Link values its last HTML response carried, sent as 103 Early Hints
+_endpoint_preloads = {}
+
+
+def compress_variants(body):
+   """Compresses `body` at maximum level, keeping only the encodings that actually shrink it."""
+   variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+   if brotli is not None:
+      variants["br"] = brotli.compress(body, quality=11)
+   return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def _encoder_available(fmt):
+   """Reports whether the installed Pillow can write `fmt`."""
+   if fmt == "png":
+      return True
+   return features.check(fmt)
+
+
+def _write_atomic(path, data):
+   """Writes `data` to `path` through a temp file so concurrent workers never see a partial file."""
+   tmp = f"{path}.{os.getpid()}.tmp"
+   with open(tmp, "wb") as f:
+      f.write(data)
+   os.replace(tmp, path)
+
+
+def _encode(image, fmt, options):
+   out = io.BytesIO()
+   image.save(out, format=fmt.upper(), **options)
+   return out.getvalue()
+
+
+def build_image_variants(static_folder, filename, width):
+   """Writes the resized variants of one image and returns its variant table.
+
+   Variant names carry a hash of the source file and of everything the variant
+   is encoded with (format, encoder options, size), so an existing file is
+   already up to date and startup only pays for the variants that are missing.
+   Changing an option in IMAGE_FORMATS gives new names rather than stale files
+   served as immutable.
+   """
+   source = os.path.join(static_folder, filename)
+   with open(source, "rb") as f:
+      source_digest = hashlib.sha256(f.read()).digest()
+   stem = os.path.splitext(filename)[0]
+   os.makedirs(os.path.join(static_folder, IMAGE_DIR), exist_ok=True)
+
+   image = None
+   table = []
+   for fmt, mimetype, options in IMAGE_FORMATS:
+      if not _encoder_available(fmt):
+         continue
+      variants = []
+      for density in DENSITIES:
+         size = width * density
+         settings = repr((fmt, sorted(options.items()), size, "lanczos")).encode("utf-8")
+         name = f"{IMAGE_DIR}/{stem}-{size}.{_fingerprint(source_digest + settings)}.{fmt}"
+         path = os.path.join(static_folder, name)
+         if not os.path.exists(path):
+            if image is None:
+               image = Image.open(source)
+               image.load()
+            height = round(image.height * size / image.width)
+            resized = image.resize((size, height), Image.LANCZOS)
+            _write_atomic(path, _encode(resized, fmt, options))
+         variants.append((name, density))
+         fingerprinted_files.add(name)
+      table.append((fmt, mimetype, variants))
+   return table
+
+
+def build_images(app):
+   """Generates every responsive image variant; a no-op when Pillow isn't installed."""
+   _image_variants.clear()
+   if Image is None:
+      app.logger.warning("Pillow is not installed; serving original images without variants")
+      return
+   for filename, width in RESPONSIVE_IMAGES.items():
+      try:
+         _image_variants[filename] = build_image_variants(app.static_folder, filename, width)
+      except OSError:
+         app.logger.exception("Could not build image variants for %s", filename)
+
+
+def _fingerprint(data):
+   return hashlib.sha256(data).hexdigest()[:10]
+
+
+def build_stylesheets(app, sheets):
+   """Writes each stylesheet to static/css/ under a content-hashed name and records it in the manifest.
+
+   With MINIFY on, the stylesheets (files and inline <style> blocks alike) are minified first.
+   """
+   os.makedirs(os.path.join(app.static_folder, STYLESHEET_DIR), exist_ok=True)
+   for name, css in sheets.items():
+      if app.config["MINIFY"]:
+         css = minify_css(css)
+      data = css.encode("utf-8")
+      logical = f"{STYLESHEET_DIR}/{name}.css"
+      filename = f"{STYLESHEET_DIR}/{name}.{_fingerprint(data)}.css"
+      path = os.path.join(app.static_folder, filename)
+      if not os.path.exists(path):
+         _write_atomic(path, data)
+      _stylesheets[name] = css
+      manifest[logical] = filename
+      fingerprinted_files.add(filename)
+
+
+# Quoted strings are left alone by the minifiers
+_CSS_TOKENS = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')""")
+_CSS_SPACE_AROUND = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(css):
+   """Drops comments and the whitespace that doesn't change meaning; strings are kept as written."""
+   css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+   parts = _CSS_TOKENS.split(css)
+   for i in range(0, len(parts), 2):
+      part = re.sub(r"\s+", " ", parts[i])
+      part = _CSS_SPACE_AROUND.sub(r"\1", part)
+      # a space after ":" only ever separates a property from its value
+      part = re.sub(r":\s+", ":", part)
+      parts[i] = part.replace(";}", "}")
+   return "".join(parts).strip()
+
+
+# Elements whose whitespace is content
+_HTML_VERBATIM = re.compile(r"(<(pre|textarea)\b.*?</\2>)", re.S | re.I)
+_HTML_LINE_BREAK = re.compile(r"[ \t]*\n\s*")
+
+
+def minify_html(html):
+   """Strips indentation and blank lines from rendered HTML.
+
+   Only whitespace runs containing a line break are touched, and each becomes
+   a single newline, so the text renders exactly as before (HTML treats any
+   run as one space) and inline scripts keep their line breaks. Works on
+   streamed chunks as well as whole documents.
+   """
+   parts = _HTML_VERBATIM.split(html)
+   out = []
+   for i in range(0, len(parts), 3):
+      out.append(_HTML_LINE_BREAK.sub("\n", parts[i]))
+      if i + 1 < len(parts):
+         out.append(parts[i + 1])
+   return "".join(out)
+
+
+def build_sprite(app, name, symbols):
+   """Writes `symbols` ({id: (viewBox, inner SVG)}) as one fingerprinted SVG sprite under static/img/.
+
+   Pages reference an icon with <svg><use href="{{ url_for('static', filename='img/<name>.svg') }}#<id>"/></svg>,
+   so every icon is downloaded once and cached like any other fingerprinted file.
+   """
+   body = "".join(
+      f'<symbol id="{symbol}" viewBox="{view_box}">{inner}</symbol>' for symbol, (view_box, inner) in symbols.items())
+   data = f'<svg xmlns="http://www.w3.org/2000/svg">{body}</svg>\n'.encode("utf-8")
+   logical = f"{IMAGE_DIR}/{name}.svg"
+   filename = f"{IMAGE_DIR}/{name}.{_fingerprint(data)}.svg"
+   path = os.path.join(app.static_folder, filename)
+   if not os.path.exists(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      _write_atomic(path, data)
+   manifest[logical] = filename
+   fingerprinted_files.add(filename)
+
+
+def _css_rules(css):
+   """Splits a stylesheet into its top-level (prelude, block) pairs, dropping comments."""
+   css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+   rules = []
+   depth = start = block_start = 0
+   prelude = ""
+   for i, ch in enumerate(css):
+      if ch == "{":
+         if depth == 0:
+            prelude = css[start:i].strip()
+            block_start = i + 1
+         depth += 1
+      elif ch == "}":
+         depth -= 1
+         if depth == 0:
+            rules.append((prelude, css[block_start:i]))
+            start = i + 1
+   return rules
+
+
+def critical_css(css, selectors=CRITICAL_SELECTORS):
+   """Returns the rules of `css` (including inside @media) whose selectors start with one of `selectors`."""
+   out = []
+   for prelude, block in _css_rules(css):
+      if prelude.startswith("@media"):
+         inner = critical_css(block, selectors)
+         if inner:
+            out.append(f"{prelude}{{{inner}}}")
+      elif any(part.strip().startswith(selectors) for part in prelude.split(",")):
+         out.append(f"{prelude}{{{block.strip()}}}")
+   return "\n".join(out)
+
+
+def _stylesheet_url(name):
+   return url_for("static", filename=f"{STYLESHEET_DIR}/{name}.css")
+
+
+def stylesheets(page):
+   """Renders the style tags for a page according to the app's STYLES_MODE.
+
+   "inline" puts all CSS in a <style> block, "external" links the fingerprinted
+   files, and "critical" inlines the header/nav subset and loads the rest without
+   blocking first paint.
+   """
+   names = ["common", page]
+   mode = current_app.config["STYLES_MODE"]
+   if mode == "inline":
+      return Markup("<style>\n%s\n</style>" % "\n".join(_stylesheets[name] for name in names))
+   if mode == "critical":
+      links = [f'<style>{critical_css(_stylesheets["common"])}</style>']
+      for name in names:
+         url = _stylesheet_url(name)
+         links.append(f'<link rel="preload" href="{url}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">')
+         links.append(f'<noscript><link rel="stylesheet" href="{url}"></noscript>')
+      return Markup("\n".join(links))
+   return Markup("\n".join(f'<link rel="stylesheet" href="{_stylesheet_url(name)}">' for name in names))
+
+
+@contextlib.contextmanager
+def collect_preloads():
+   """Collects the Link: rel=preload values for the assets referenced inside the block.
+
+   Yields a dict of URL -> Link value in first-reference order. Collections
+   nest: whatever an inner block collects is also added to the outer one.
+   """
+   outer = g.get("preload_links")
+   links = g.preload_links = {}
+   try:
+      yield links
+   finally:
+      g.preload_links = outer
+      if outer is not None:
+         outer.update(links)
+
+
+def add_preloads(links):
+   """Adds Link values (URL -> value) to the current collection, e.g. those of a cached fragment."""
+   collecting = g.get("preload_links")
+   if collecting is not None:
+      collecting.update(links)
+
+
+def _preload(url, as_, **attributes):
+   collecting = g.get("preload_links")
+   if collecting is not None and url not in collecting:
+      params = "".join(f'; {name}="{value}"' for name, value in attributes.items())
+      collecting[url] = f"<{url}>; rel=preload; as={as_}{params}"
+
+
+def _preload_static(filename):
+   collecting = g.get("preload_links")
+   as_ = PRELOAD_TYPES.get(os.path.splitext(filename)[1])
+   if as_ is None or collecting is None:
+      return
+   # url_for comes back through fingerprint_static_urls; don't collect twice
+   g.preload_links = None
+   try:
+      url = url_for("static", filename=filename)
+   finally:
+      g.preload_links = collecting
+   # fonts are always fetched in CORS mode, and a preload only matches a request made the same way
+   _preload(url, as_, **({"crossorigin": "anonymous"} if as_ == "font" else {}))
+
+
+def remember_preloads(endpoint, links):
+   """Records the Link values `endpoint`'s pages carry, for its next requests' Early Hints."""
+   _endpoint_preloads[endpoint] = list(links)
+
+
+def _srcset(variants):
+   return ", ".join(f"{url_for('static', filename=name)} {density}x" for name, density in variants)
+
+
+def responsive_image(filename, alt, class_=""):
+   """Renders a <picture> for an image under static/, or a plain <img> when it has no variants."""
+   width = RESPONSIVE_IMAGES.get(filename)
+   size = f' width="{width}" height="{width}"' if width else ""
+   attrs = f'class="{escape(class_)}" alt="{escape(alt)}"{size}'
+   table = _image_variants.get(filename)
+   if not table:
+      return Markup(f'<img {attrs} src="{url_for("static", filename=filename)}">')
+
+   *sources, (_, _, fallback) = table
+   # the browser takes the first <source> it supports; preload that one, at its own density
+   _, mimetype, variants = (sources or [table[-1]])[0]
+   _preload(url_for("static", filename=variants[0][0]), "image", type=mimetype, imagesrcset=_srcset(variants))
+   lines = ["<picture>"]
+   for _, mimetype, variants in sources:
+      lines.append(f'<source type="{mimetype}" srcset="{_srcset(variants)}">')
+   lines.append(
+      f'<img {attrs} src="{url_for("static", filename=fallback[0][0])}" srcset="{_srcset(fallback)}">')
+   lines.append("</picture>")
+   return Markup("\n".join(lines))
+
+
+def init_app(app):
+   """Builds the static asset variants and wires them into templates and static responses."""
+   build_images(app)
+   app.config.setdefault("STYLES_MODE", "external")
+   # Minify stylesheets and rendered pages; turn off to read the output while developing
+   app.config.setdefault("MINIFY", True)
+   # Link: rel=preload headers on pages for the stylesheets and images they reference
+   app.config.setdefault("PRELOAD_LINKS", True)
+   # Also send those links as a 103 Early Hints response before the page, where the
+   # server offers it (gunicorn's environ["wsgi.early_hints"])
+   app.config.setdefault("EARLY_HINTS", True)
+   app.jinja_env.globals["responsive_image"] = responsive_image
+   app.jinja_env.globals["stylesheets"] = stylesheets
+
+   @app.url_defaults
+   def fingerprint_static_urls(endpoint, values):
+      """Resolves url_for('static', filename=...) through the manifest to the fingerprinted name.
+
+      Inside collect_preloads() it also notes the files worth a rel=preload.
+      """
+      if endpoint != "static" or "filename" not in values:
+         return
+      if values["filename"] in manifest:
+         values["filename"] = manifest[values["filename"]]
+      _preload_static(values["filename"])
+
+   @app.before_request
+   def send_early_hints():
+      """Sends the preloads this endpoint's pages carried last time before the page is even looked up."""
+      send = request.environ.get("wsgi.early_hints")
+      if not send or request.method != "GET" or not (app.config["EARLY_HINTS"] and app.config["PRELOAD_LINKS"]):
+         return
+      links = _endpoint_preloads.get(request.endpoint)
+      if links:
+         send([("Link", link) for link in links])
+
+   @app.after_request
+   def preload_headers(response):
+      """Notes each page endpoint's preloads; streamed pages, which can't know theirs yet, get the last ones."""
+      if response.mimetype != "text/html" or response.status_code != 200 or not app.config["PRELOAD_LINKS"]:
+         return response
+      links = response.headers.getlist("Link")
+      if links:
+         remember_preloads(request.endpoint, links)
+      elif request.endpoint in _endpoint_preloads:
+         response.headers.extend(("Link", link) for link in _endpoint_preloads[request.endpoint])
+      return response
+
+   @app.after_request
+   def cache_fingerprinted(response):
+      """Fingerprinted files never change under the same name, so browsers may keep them forever."""
+      if request_filename() in fingerprinted_files and response.status_code in (200, 206, 304):
+         response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+      return response
+
+   @app.cli.command("build-images")
+   def build_images_command():
+      """Regenerate the resized image variants under static/."""
+      build_images(app)
+      for filename, table in _image_variants.items():
+         for fmt, _, variants in table:
+            click.echo(f"{filename} -> {fmt}: {', '.join(name for name, _ in variants)}")
+
+
+def request_filename():
+   """Returns the static filename requested, or None outside the static endpoint."""
+   if request.endpoint != "static":
+      return None
+   return request.view_args.get("filename")
@@ -0,0 +1,134 @@
+"""Measures how the /events channel scales with open connections.
+
+Starts live.py in a subprocess, opens --connections SSE streams to it, and
+records the server's resident memory before and after, per connection. Then
+it posts --updates admin status changes and times how long each one takes to
+reach every subscriber (fan-out latency: p50, p99 and the last one).
+
+Usage: python benchmarks/bench_live.py [--connections 1000 5000] [--updates 20]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "bench"
+
+
+def free_port():
+   with socket.socket() as s:
+      s.bind(("127.0.0.1", 0))
+      return s.getsockname()[1]
+
+
+def rss_mib(pid):
+   with open(f"/proc/{pid}/status") as f:
+      for line in f:
+         if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+   return 0.0
+
+
+def start_live(port):
+   env = dict(os.environ, LIVE_ADMIN_TOKEN=TOKEN)
+   process = subprocess.Popen([sys.executable, "live.py", "--host", "127.0.0.1", "--port", str(port)],
+                              cwd=ROOT, env=env)
+   deadline = time.monotonic() + 30
+   while time.monotonic() < deadline:
+      try:
+         with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return process
+      except OSError:
+         time.sleep(0.1)
+   process.terminate()
+   sys.exit("live.py did not start listening within 30 s")
+
+
+class Subscriber:
+   """One SSE connection that notes when each status event arrives."""
+
+   def __init__(self, received):
+      self.received = received
+
+   async def run(self, session, url, connected):
+      async with session.get(url, timeout=aiohttp.ClientTimeout(total=None)) as response:
+         first = True
+         async for line in response.content:
+            if line.startswith(b"event: status"):
+               if first:
+                  first = False
+                  connected.release()
+               else:
+                  self.received.append(time.perf_counter())
+
+
+def percentile(samples, p):
+   return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+async def measure(base_url, pid, count, updates):
+   received = []
+   connected = asyncio.Semaphore(0)
+   connector = aiohttp.TCPConnector(limit=0)
+   async with aiohttp.ClientSession(connector=connector) as session:
+      before = rss_mib(pid)
+      started = time.perf_counter()
+      tasks = [asyncio.create_task(Subscriber(received).run(session, base_url + "/events", connected))
+               for _ in range(count)]
+      for _ in range(count):
+         await connected.acquire()
+      connect_seconds = time.perf_counter() - started
+      await asyncio.sleep(0.5)
+      after = rss_mib(pid)
+
+      latencies, last = [], []
+      headers = {"Authorization": f"Bearer {TOKEN}"}
+      for i in range(updates):
+         received.clear()
+         status = "on_stream" if i % 2 == 0 else None
+         sent = time.perf_counter()
+         async with session.post(base_url + "/events/status", json={"event": "daily", "status": status},
+                                 headers=headers) as response:
+            response.raise_for_status()
+         while len(received) < count:
+            await asyncio.sleep(0.001)
+         latencies.extend(t - sent for t in received)
+         last.append(max(received) - sent)
+
+      for task in tasks:
+         task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+
+   latencies.sort()
+   last.sort()
+   print(f"{count:6d} connections | connect {connect_seconds:5.2f} s"
+         f" | server RSS {before:6.1f} -> {after:6.1f} MiB ({(after - before) * 1024 * 1024 / count / 1024:5.1f} KiB/conn)"
+         f" | fan-out p50 {percentile(latencies, 50) * 1000:6.1f} ms  p99 {percentile(latencies, 99) * 1000:6.1f} ms"
+         f"  all {percentile(last, 50) * 1000:6.1f} ms")
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--connections", type=int, nargs="+", default=[1000, 5000])
+   parser.add_argument("--updates", type=int, default=20)
+   args = parser.parse_args()
+
+   for count in args.connections:
+      port = free_port()
+      process = start_live(port)
+      try:
+         asyncio.run(measure(f"http://127.0.0.1:{port}", process.pid, count, args.updates))
+      finally:
+         process.terminate()
+         process.wait()
+
+
+if __name__ == "__main__":
+   main()
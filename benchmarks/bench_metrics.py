@@ -0,0 +1,73 @@
+"""Measures the per-request cost of the metrics middleware.
+
+Calls a trivial WSGI app directly and through MetricsMiddleware, consuming and
+closing the body as a server would, and reports the difference per request.
+
+Usage: python benchmarks/bench_metrics.py [--requests 200000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import ENDPOINT_KEY, Metrics, MetricsMiddleware  # noqa: E402
+
+
+BODY = [b"x" * 2048]
+
+
+def hello(environ, start_response):
+   environ[ENDPOINT_KEY] = "index"
+   start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "2048")])
+   return BODY
+
+
+def start_response(status, headers, exc_info=None):
+   return None
+
+
+def serve(app, count):
+   environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/"}
+   started = time.perf_counter()
+   for _ in range(count):
+      result = app(dict(environ), start_response)
+      for _chunk in result:
+         pass
+      close = getattr(result, "close", None)
+      if close is not None:
+         close()
+   return time.perf_counter() - started
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--requests", type=int, default=200_000)
+   args = parser.parse_args()
+
+   with tempfile.TemporaryDirectory() as tmp:
+      metrics = Metrics(tmp)
+      wrapped = MetricsMiddleware(hello, metrics)
+      serve(wrapped, 1000)
+      bare = min(serve(hello, args.requests) for _ in range(3))
+      timed = min(serve(wrapped, args.requests) for _ in range(3))
+      started = time.perf_counter()
+      for _ in range(args.requests):
+         metrics.observe_request("index", "GET", 200, 0.001, 0.0001, 2048)
+      observe = time.perf_counter() - started
+      started = time.perf_counter()
+      metrics.flush()
+      flush = time.perf_counter() - started
+
+   per_request = (timed - bare) / args.requests * 1e6
+   print(f"bare app          {bare / args.requests * 1e6:6.2f} us/request")
+   print(f"with middleware   {timed / args.requests * 1e6:6.2f} us/request  (+{per_request:.2f} us)")
+   print(f"observe_request   {observe / args.requests * 1e6:6.2f} us")
+   print(f"flush (1/s)       {flush * 1e6:6.0f} us")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,67 @@
+"""Times Glicko-2/Elo rating updates over a synthetic multi-year history.
+
+Usage: python benchmarks/bench_ratings.py [--sets 100000] [--players 5000] [--days 1000]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratings import RatingsEngine, ResultSet  # noqa: E402
+
+
+def synthetic_sets(count, players, days, seed=0):
+   """Sets between random players whose hidden skill decides most outcomes."""
+   rng = np.random.default_rng(seed)
+   skill = rng.normal(0, 1, players)
+   a = rng.integers(0, players, count)
+   b = (a + rng.integers(1, players, count)) % players
+   a_wins = rng.random(count) < 1 / (1 + np.exp(skill[b] - skill[a]))
+   day = np.sort(rng.integers(0, days, count))
+   start = datetime.date(2022, 1, 1)
+   dates = [(start + datetime.timedelta(days=int(d))).isoformat() for d in range(days)]
+   return [
+      ResultSet(dates[day[i]], "bench", f"p{a[i] if a_wins[i] else b[i]}", f"p{b[i] if a_wins[i] else a[i]}")
+      for i in range(count)
+   ]
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--sets", type=int, default=100_000)
+   parser.add_argument("--players", type=int, default=5_000)
+   parser.add_argument("--days", type=int, default=1_000)
+   args = parser.parse_args()
+
+   sets = synthetic_sets(args.sets, args.players, args.days)
+   last_day = sets[-1].date
+   history = [row for row in sets if row.date != last_day]
+   nightly = [row for row in sets if row.date == last_day]
+
+   engine = RatingsEngine()
+   started = time.perf_counter()
+   engine.add_sets(history)
+   full = time.perf_counter() - started
+
+   started = time.perf_counter()
+   engine.add_sets(nightly)
+   incremental = time.perf_counter() - started
+
+   started = time.perf_counter()
+   engine.standings(limit=100)
+   standings = time.perf_counter() - started
+
+   print(f"history:     {len(history):>8} sets, {args.days - 1} periods, {len(engine)} players "
+         f"in {full * 1000:8.1f} ms ({len(history) / full:,.0f} sets/s)")
+   print(f"incremental: {len(nightly):>8} sets, 1 period in {incremental * 1000:8.2f} ms")
+   print(f"standings:   top 100 in {standings * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,60 @@
+"""Times worker boot from the results log: full replay versus snapshot plus tail.
+
+Usage: python benchmarks/bench_results_log.py [--sets 200000] [--brackets 1500] [--tail 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ratings import synthetic_sets  # noqa: E402
+from results_log import ResultsStore  # noqa: E402
+
+
+def boot(log_path, snapshot_path):
+   store = ResultsStore(log_path, snapshot_path)
+   started = time.perf_counter()
+   store.load()
+   return store, time.perf_counter() - started
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--sets", type=int, default=200_000)
+   parser.add_argument("--players", type=int, default=10_000)
+   parser.add_argument("--brackets", type=int, default=1_500)
+   parser.add_argument("--tail", type=int, default=20, help="brackets logged after the snapshot")
+   args = parser.parse_args()
+
+   sets = synthetic_sets(args.sets, args.players, args.brackets)
+   brackets = {}
+   for row in sets:
+      brackets.setdefault(row.date, []).append(row)
+
+   with tempfile.TemporaryDirectory() as tmp:
+      log_path = os.path.join(tmp, "results.log")
+      snapshot_path = os.path.join(tmp, "results.snapshot.npz")
+      writer = ResultsStore(log_path, snapshot_path)
+      dates = sorted(brackets)
+      for date in dates[:-args.tail]:
+         writer.append(date, None, brackets[date])
+      writer.load()
+      writer.snapshot()
+      for date in dates[-args.tail:]:
+         writer.append(date, None, brackets[date])
+
+      _, with_snapshot = boot(log_path, snapshot_path)
+      store, replay = boot(log_path, os.path.join(tmp, "missing.npz"))
+
+      print(f"log:      {os.path.getsize(log_path) / 1e6:6.1f} MB, {len(dates)} brackets, {len(store.engine)} players")
+      print(f"snapshot: {os.path.getsize(snapshot_path) / 1e6:6.1f} MB")
+      print(f"boot, full replay:            {replay * 1000:8.1f} ms")
+      print(f"boot, snapshot + {args.tail:>3} brackets: {with_snapshot * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+   main()
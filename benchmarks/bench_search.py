@@ -0,0 +1,69 @@
+"""Measures player search latency at 10k and 100k tags.
+
+Usage: python benchmarks/bench_search.py [--sizes 10000 100000] [--queries 5000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import PlayerIndex  # noqa: E402
+
+
+SPONSORS = ("C9", "TSM", "LG", "PG", "FLY", "MOC")
+ACCENTED = "áéíóúñçü"
+
+
+def synthetic_tags(count, seed=0):
+   rng = random.Random(seed)
+   alphabet = string.ascii_letters + string.digits + ACCENTED
+   tags = set()
+   while len(tags) < count:
+      tag = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 10)))
+      if rng.random() < 0.15:
+         tag = f"{rng.choice(SPONSORS)} | {tag}"
+      tags.add(tag)
+   return sorted(tags)
+
+
+def percentile(samples, p):
+   return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+   parser.add_argument("--queries", type=int, default=5_000)
+   args = parser.parse_args()
+
+   rng = random.Random(1)
+   for size in args.sizes:
+      tags = synthetic_tags(size)
+      ratings = np.random.default_rng(0).normal(0, 1, size)
+      started = time.perf_counter()
+      index = PlayerIndex(tags)
+      build = time.perf_counter() - started
+
+      queries = []
+      for _ in range(args.queries):
+         tag = rng.choice(tags).split("|")[-1].strip()
+         queries.append(tag[:rng.randint(1, 4)])
+      samples = []
+      for query in queries:
+         started = time.perf_counter()
+         index.search(query, ratings, 10)
+         samples.append(time.perf_counter() - started)
+      samples.sort()
+      print(f"{size:>7} tags: build {build * 1000:7.1f} ms | query p50 {percentile(samples, 50) * 1e6:6.1f} us"
+            f"  p95 {percentile(samples, 95) * 1e6:6.1f} us  p99 {percentile(samples, 99) * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,134 @@
+"""Measures the shared page cache: the cost of each tier, and how much rendering workers share.
+
+Boots the app on a synthetic results log with the shared tier in a temporary
+directory. Reports the time for a rankings page and a player page when
+rendered (miss), read back from SQLite by another worker (shared hit) and found
+in the process's own LRU (local hit). Then forks --workers processes that
+all ask for the same player pages, with and without the shared tier, and
+counts the renders. Finally one more bracket is logged and every worker
+catches up and serves the rankings: with the shared tier the page is rendered
+once for all of them.
+
+Usage: python benchmarks/bench_shared_cache.py [--sets 100000] [--workers 4] [--pages 200]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ratings import synthetic_sets  # noqa: E402
+from results_log import ResultsStore  # noqa: E402
+
+
+def timed(function, repeat=1):
+   started = time.perf_counter()
+   for _ in range(repeat):
+      function()
+   return (time.perf_counter() - started) / repeat
+
+
+def tier_costs(label, render, clear):
+   """Times `render` on a miss, a shared hit (after clearing the local tier) and a local hit."""
+   miss = timed(render)
+   clear()
+   shared_hit = timed(render)
+   local_hit = timed(render, 1000)
+   print(f"  {label:<14} miss {miss * 1000:8.2f} ms | shared hit {shared_hit * 1000:6.3f} ms"
+         f" | local hit {local_hit * 1e6:6.2f} µs")
+
+
+def render_players(tags, use_shared):
+   """Runs in a forked worker: serves every tag's page once and returns (renders, seconds)."""
+   import flask_app
+
+   if not use_shared:
+      flask_app.cache.shared = None
+   flask_app.render_player.cache_clear()
+   with flask_app.app.test_request_context("/"):
+      started = time.perf_counter()
+      for tag in tags:
+         flask_app.render_player(tag, flask_app.results.offset, "", flask_app._assets_version)
+      seconds = time.perf_counter() - started
+   return flask_app.render_player.cache_info().misses, seconds
+
+
+def serve_rankings(use_shared):
+   """Runs in a forked worker: catches up with the log, then serves /rankings; returns renders."""
+   import flask_app
+
+   if not use_shared:
+      flask_app.cache.shared = None
+   flask_app.results.refresh()
+   before = flask_app.cached_page.cache_info().misses
+   with flask_app.app.test_request_context("/rankings"):
+      flask_app.render_page("rankings")
+   return flask_app.cached_page.cache_info().misses - before
+
+
+def in_workers(count, function, *args):
+   context = multiprocessing.get_context("fork")
+   with context.Pool(count) as pool:
+      return pool.starmap(function, [args] * count)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--sets", type=int, default=100_000)
+   parser.add_argument("--players", type=int, default=5_000)
+   parser.add_argument("--days", type=int, default=500)
+   parser.add_argument("--workers", type=int, default=4)
+   parser.add_argument("--pages", type=int, default=200, help="Player pages every worker serves.")
+   args = parser.parse_args()
+
+   sets = synthetic_sets(args.sets, args.players, args.days)
+   last_day = sets[-1].date
+   with tempfile.TemporaryDirectory() as tmp:
+      log_path = os.path.join(tmp, "results.log")
+      writer = ResultsStore(log_path, os.path.join(tmp, "results.snapshot.npz"))
+      writer.append("history", None, [row for row in sets if row.date != last_day])
+
+      os.environ["SHARED_CACHE_PATH"] = os.path.join(tmp, "cache.sqlite3")
+      os.environ["METRICS_DIR"] = os.path.join(tmp, "metrics")
+      import flask_app
+
+      store = ResultsStore(log_path, os.path.join(tmp, "results.snapshot.npz"))
+      store.load()
+      flask_app.results = store
+      tags = list(store.engine.tags[:args.pages])
+      print(f"{len(store.engine)} players, {args.sets} sets")
+
+      print("tiers:")
+      with flask_app.app.test_request_context("/rankings"):
+         tier_costs("/rankings", lambda: flask_app.render_page("rankings"),
+                    flask_app.cached_page.cache_clear)
+         tier_costs("/player/<tag>",
+                    lambda: flask_app.render_player(tags[0], store.offset, "", flask_app._assets_version),
+                    flask_app.render_player.cache_clear)
+      flask_app.cache.shared.clear()
+
+      print(f"{args.workers} workers x {args.pages} player pages:")
+      for use_shared in (False, True):
+         started = time.perf_counter()
+         answers = in_workers(args.workers, render_players, tags, use_shared)
+         wall = time.perf_counter() - started
+         renders = sum(renders for renders, _ in answers)
+         print(f"  {'shared tier' if use_shared else 'local only':<12} {renders:6d} renders"
+               f" | {wall:6.2f} s wall | {max(seconds for _, seconds in answers):6.2f} s slowest worker")
+
+      print("new bracket, then every worker serves /rankings:")
+      writer.append(last_day, None, [row for row in sets if row.date == last_day])
+      for use_shared in (False, True):
+         renders = in_workers(args.workers, serve_rankings, use_shared)
+         print(f"  {'shared tier' if use_shared else 'local only':<12} {sum(renders):6d} renders")
+      entries, size = flask_app.cache.shared.stats()
+      print(f"shared tier: {entries} entries, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+   main()
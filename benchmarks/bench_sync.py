@@ -0,0 +1,65 @@
+"""Measures start.gg sync throughput against the local fake API.
+
+Runs a cold sync (every event fetched) and then two polls with nothing changed:
+the first re-lists recent tournaments, the second revalidates that listing with
+If-None-Match and gets a 304. No event is refetched by either. Repeats at
+several concurrency levels, then imports the synced events into a results log.
+
+Usage: python benchmarks/bench_sync.py [--tournaments 300] [--latency 0.02] [--concurrency 1 4 16]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import startgg  # noqa: E402
+from fake_startgg import FakeServer, FakeStartGG  # noqa: E402
+from results_log import ResultsStore  # noqa: E402
+
+
+def report(label, counts):
+   seconds = counts["seconds"]
+   print(f"  {label:<5} {seconds:6.2f} s | {counts['requests']:5d} requests ({counts['requests'] / seconds:6.0f}/s)"
+         f" | {counts['events']:4d} events, {counts['sets']:6d} sets ({counts['sets'] / seconds:7.0f} sets/s)"
+         f" | {counts['not_modified']} not modified, {counts['retries']} retries")
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--tournaments", type=int, default=300)
+   parser.add_argument("--entrants", type=int, default=48)
+   parser.add_argument("--latency", type=float, default=0.02, help="Seconds the fake API takes per request.")
+   parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+   parser.add_argument("--failure-rate", type=float, default=0.0)
+   parser.add_argument("--rate-limit", type=int, default=None, help="Fake API requests per second before 429s.")
+   args = parser.parse_args()
+
+   for concurrency in args.concurrency:
+      fake = FakeStartGG(args.tournaments, entrants=args.entrants, latency=args.latency,
+                         rate_limit=args.rate_limit, failure_rate=args.failure_rate)
+      with FakeServer(fake) as server, tempfile.TemporaryDirectory() as tmp:
+         db_path = os.path.join(tmp, "startgg.sqlite3")
+         print(f"concurrency {concurrency}:")
+         for label in ("cold", "poll", "poll"):
+            counts = asyncio.run(startgg.sync(
+               db_path, server.url, None, 1, concurrency=concurrency, rate=1e6, burst=concurrency,
+               retries=8, timeout=60))
+            report(label, counts)
+
+         store = ResultsStore(os.path.join(tmp, "results.log"), os.path.join(tmp, "snapshot.npz"), sync_db=db_path)
+         started = time.perf_counter()
+         store.refresh()
+         print(f"  import {time.perf_counter() - started:5.2f} s | {len(store.sources)} events into the results log,"
+               f" {len(store.engine)} players rated")
+         if fake.counts["rate_limited"] or fake.counts["failed"]:
+            print(f"  server: {fake.counts['rate_limited']} rate limited, {fake.counts['failed']} failed")
+
+
+if __name__ == "__main__":
+   main()
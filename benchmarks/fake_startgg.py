@@ -0,0 +1,223 @@
+"""A local stand-in for the start.gg GraphQL API, for running the sync offline.
+
+It answers the three operations startgg.py sends (Tournaments, EventSets,
+EventStandings) from deterministic synthetic brackets, and can add latency,
+enforce a rate limit with 429 + Retry-After, and fail a share of requests with
+502 so the client's retries get exercised. Responses carry an ETag and honour
+If-None-Match.
+
+Usage: python benchmarks/fake_startgg.py [--port 8765] [--tournaments 200]
+and point the sync at it with STARTGG_API=http://127.0.0.1:8765/gql and any
+STARTGG_OWNER_ID. benchmarks/bench_sync.py starts one in-process.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from startgg import MELEE_VIDEOGAME_ID, SINGLES_EVENT_TYPE  # noqa: E402
+
+
+FIRST_START = 1_700_000_000 - 1_700_000_000 % 86400 + 3 * 3600  # 22:00 Eastern
+
+
+def _bracket(rng, players, entrants):
+   """Plays a double-elimination bracket; returns (sets, placements) as player indexes.
+
+   Each round pairs the players left with the same number of losses; a second
+   loss knocks a player out in last place among those still in.
+   """
+   field = rng.sample(range(players), entrants)
+   strength = {pid: rng.random() for pid in field}
+   losses = dict.fromkeys(field, 0)
+   sets, placements = [], []
+   while len(losses) > 1:
+      for pool in (0, 1):
+         alive = [pid for pid, count in losses.items() if count == pool]
+         if len(alive) < 2:
+            alive = list(losses)
+         rng.shuffle(alive)
+         for a, b in zip(alive[::2], alive[1::2]):
+            winner, loser = (a, b) if rng.random() < strength[a] / (strength[a] + strength[b]) else (b, a)
+            sets.append((winner, loser, 2, rng.randint(0, 1)))
+            losses[loser] += 1
+            if losses[loser] == 2:
+               placements.append((loser, len(losses)))
+               del losses[loser]
+         if len(losses) == 1:
+            break
+   placements.append((next(iter(losses)), 1))
+   return sets, placements[::-1]
+
+
+class FakeStartGG:
+   """Synthetic tournaments plus the request counters the benchmark reports."""
+
+   def __init__(self, tournaments=100, players=400, entrants=48, seed=0,
+                latency=0.0, rate_limit=None, failure_rate=0.0):
+      rng = random.Random(seed)
+      self.players = [f"Player{i:04d}" for i in range(players)]
+      self.latency = latency
+      self.rate_limit = rate_limit
+      self.failure_rate = failure_rate
+      self.rng = random.Random(seed + 1)
+      self.counts = {"requests": 0, "not_modified": 0, "rate_limited": 0, "failed": 0}
+      self._window = []
+      self.tournaments = []
+      self.brackets = {}
+      for t in range(tournaments):
+         start = FIRST_START + t * 86400
+         tournament = {"id": 10_000 + t, "name": f"Melee at Night #{t + 1}", "slug": f"tournament/man-{t + 1}",
+                       "startAt": start, "events": []}
+         for kind, name, type_, videogame in (("singles", "Melee Singles", SINGLES_EVENT_TYPE, MELEE_VIDEOGAME_ID),
+                                              ("doubles", "Melee Doubles", 5, MELEE_VIDEOGAME_ID)):
+            if kind == "doubles" and t % 7 != 5:
+               continue
+            event_id = 100_000 + t * 10 + len(tournament["events"])
+            tournament["events"].append({
+               "id": event_id, "name": name, "slug": f"{tournament['slug']}/event/{kind}", "type": type_,
+               "state": "COMPLETED", "startAt": start, "updatedAt": start + 4 * 3600,
+               "videogame": {"id": videogame},
+            })
+            if kind == "singles":
+               self.brackets[event_id] = _bracket(rng, players, min(entrants, players))
+         self.tournaments.append(tournament)
+
+   def touch(self, event_id):
+      """Marks an event as edited, as a TO fixing a reported score would."""
+      for tournament in self.tournaments:
+         for event in tournament["events"]:
+            if event["id"] == event_id:
+               event["updatedAt"] += 1
+
+   def _entrant(self, pid):
+      return {"id": 1_000_000 + pid, "participants": [{"gamerTag": self.players[pid]}]}
+
+   @staticmethod
+   def _page(nodes, variables):
+      per_page, page = variables["perPage"], variables["page"]
+      total = max(1, -(-len(nodes) // per_page))
+      return {"pageInfo": {"totalPages": total}, "nodes": nodes[(page - 1) * per_page:page * per_page]}
+
+   def answer(self, operation, variables):
+      if operation == "Tournaments":
+         after = variables.get("afterDate") or 0
+         found = [t for t in reversed(self.tournaments) if t["startAt"] >= after]
+         return {"tournaments": self._page(found, variables)}
+      sets, placements = self.brackets.get(int(variables["eventId"]), ([], []))
+      if operation == "EventSets":
+         nodes = [{
+            "id": int(variables["eventId"]) * 1000 + i,
+            "completedAt": FIRST_START + i * 60,
+            "winnerId": 1_000_000 + winner,
+            "slots": [
+               {"entrant": self._entrant(winner), "standing": {"stats": {"score": {"value": w_score}}}},
+               {"entrant": self._entrant(loser), "standing": {"stats": {"score": {"value": l_score}}}},
+            ],
+         } for i, (winner, loser, w_score, l_score) in enumerate(sets)]
+         return {"event": {"sets": self._page(nodes, variables)}}
+      if operation == "EventStandings":
+         nodes = [{"placement": placement, "entrant": self._entrant(pid)} for pid, placement in placements]
+         return {"event": {"standings": self._page(nodes, variables)}}
+      return None
+
+   def _limited(self):
+      """Sliding one-second window; returns seconds to wait, or 0."""
+      if not self.rate_limit:
+         return 0
+      now = time.monotonic()
+      self._window = [t for t in self._window if t > now - 1.0]
+      if len(self._window) >= self.rate_limit:
+         return self._window[0] + 1.0 - now
+      self._window.append(now)
+      return 0
+
+   async def handle(self, request):
+      self.counts["requests"] += 1
+      if self.latency:
+         await asyncio.sleep(self.latency)
+      wait = self._limited()
+      if wait:
+         self.counts["rate_limited"] += 1
+         return web.json_response({"success": False, "message": "Rate limit exceeded"}, status=429,
+                                  headers={"Retry-After": f"{wait:.2f}"})
+      if self.failure_rate and self.rng.random() < self.failure_rate:
+         self.counts["failed"] += 1
+         return web.Response(status=502, text="Bad Gateway")
+      payload = await request.json()
+      data = self.answer(payload.get("operationName"), payload.get("variables") or {})
+      if data is None:
+         return web.json_response({"errors": [{"message": "Unknown operation"}]})
+      body = json.dumps({"data": data}, separators=(",", ":"))
+      etag = '"%s"' % hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+      if request.headers.get("If-None-Match") == etag:
+         self.counts["not_modified"] += 1
+         return web.Response(status=304, headers={"ETag": etag})
+      return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+
+class FakeServer:
+   """Runs a FakeStartGG on its own event loop in a background thread; use as a context manager."""
+
+   def __init__(self, fake, host="127.0.0.1", port=0):
+      self.fake = fake
+      self.host = host
+      self.port = port
+      self.loop = asyncio.new_event_loop()
+      self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+   @property
+   def url(self):
+      return f"http://{self.host}:{self.port}/gql"
+
+   async def _start(self):
+      app = web.Application()
+      app.router.add_post("/gql", self.fake.handle)
+      self._runner = web.AppRunner(app, access_log=None)
+      await self._runner.setup()
+      site = web.TCPSite(self._runner, self.host, self.port)
+      await site.start()
+      self.port = site._server.sockets[0].getsockname()[1]
+
+   def __enter__(self):
+      self._thread.start()
+      asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+      return self
+
+   def __exit__(self, *exc):
+      asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+      self.loop.call_soon_threadsafe(self.loop.stop)
+      self._thread.join()
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--port", type=int, default=8765)
+   parser.add_argument("--tournaments", type=int, default=200)
+   parser.add_argument("--players", type=int, default=400)
+   parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+   parser.add_argument("--rate-limit", type=int, default=None, help="Requests per second before 429s.")
+   parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 502.")
+   args = parser.parse_args()
+   fake = FakeStartGG(args.tournaments, args.players, latency=args.latency,
+                      rate_limit=args.rate_limit, failure_rate=args.failure_rate)
+   with FakeServer(fake, port=args.port) as server:
+      print(f"Fake start.gg API on {server.url} ({len(fake.tournaments)} tournaments); Ctrl-C to stop")
+      try:
+         threading.Event().wait()
+      except KeyboardInterrupt:
+         pass
+
+
+if __name__ == "__main__":
+   main()
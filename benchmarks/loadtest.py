@@ -0,0 +1,262 @@
+"""Load-tests the site under gunicorn and gates on regressions against a saved baseline.
+
+Boots `gunicorn flask_app:app` on a free local port (or targets --url), then
+drives each route for --duration seconds with --concurrency keep-alive
+connections, --repeat times over. For each route it records the median requests/s, p50/p95/p99 latency and
+bytes on the wire (compressed bodies plus headers). The results are written as
+JSON. With --baseline, the run fails (exit 1) when a route's throughput drops,
+or its p95 rises, by more than --threshold.
+
+Usage:
+   python benchmarks/loadtest.py --save-baseline          # record benchmarks/results/baseline.json
+   python benchmarks/loadtest.py --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+ROUTES = ("/", "/schedule", "/rankings", "/support", "/static/moon.png")
+
+# What a current browser sends, so responses come back compressed as they would in production
+HEADERS = {"Accept-Encoding": "gzip, deflate, br", "Accept": "text/html,*/*"}
+
+# Latency differences below this are noise on a loaded laptop, whatever the ratio
+MIN_LATENCY_DELTA_MS = 0.5
+
+
+def free_port():
+   with socket.socket() as s:
+      s.bind(("127.0.0.1", 0))
+      return s.getsockname()[1]
+
+
+def start_gunicorn(port, workers, worker_class, extra_args=()):
+   """Starts gunicorn from the repo root and waits until it answers; returns the process."""
+   command = [
+      sys.executable, "-m", "gunicorn", "flask_app:app",
+      "--bind", f"127.0.0.1:{port}",
+      "--workers", str(workers),
+      "--worker-class", worker_class,
+      "--keep-alive", "5",
+      "--log-level", "warning",
+      *extra_args,
+   ]
+   process = subprocess.Popen(command, cwd=ROOT)
+   deadline = time.monotonic() + 60
+   while time.monotonic() < deadline:
+      if process.poll() is not None:
+         sys.exit(f"gunicorn exited with status {process.returncode}")
+      try:
+         with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return process
+      except OSError:
+         time.sleep(0.1)
+   process.terminate()
+   sys.exit("gunicorn did not start listening within 60 s")
+
+
+def stop_gunicorn(process):
+   process.terminate()
+   try:
+      process.wait(10)
+   except subprocess.TimeoutExpired:
+      process.kill()
+
+
+def percentile(samples, p):
+   return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+async def drive(session, url, duration, concurrency):
+   """Hits `url` from `concurrency` loops for `duration` seconds; returns (latencies, bytes, errors)."""
+   latencies = []
+   sizes = []
+   errors = 0
+   deadline = time.perf_counter() + duration
+
+   async def loop():
+      nonlocal errors
+      while time.perf_counter() < deadline:
+         started = time.perf_counter()
+         try:
+            async with session.get(url) as response:
+               body = await response.read()
+               if response.status != 200:
+                  errors += 1
+                  continue
+               header_bytes = sum(len(name) + len(value) + 4 for name, value in response.raw_headers)
+         except aiohttp.ClientError:
+            errors += 1
+            continue
+         latencies.append(time.perf_counter() - started)
+         sizes.append(len(body) + header_bytes)
+
+   await asyncio.gather(*(loop() for _ in range(concurrency)))
+   return latencies, sizes, errors
+
+
+def summarize(latencies, sizes, errors, duration):
+   latencies.sort()
+   count = len(latencies)
+   return {
+      "requests": count,
+      "errors": errors,
+      "rps": round(count / duration, 1),
+      "p50_ms": round(percentile(latencies, 50) * 1000, 3) if count else None,
+      "p95_ms": round(percentile(latencies, 95) * 1000, 3) if count else None,
+      "p99_ms": round(percentile(latencies, 99) * 1000, 3) if count else None,
+      "bytes_per_request": round(sum(sizes) / count) if count else None,
+      "bytes_per_second": round(sum(sizes) / duration),
+   }
+
+
+def median_run(runs):
+   """Combines repeated runs of one route, taking the median of every figure."""
+   combined = {}
+   for key in runs[0]:
+      values = sorted(run[key] for run in runs if run[key] is not None)
+      combined[key] = values[len(values) // 2] if values else None
+   combined["errors"] = sum(run["errors"] for run in runs)
+   return combined
+
+
+async def run(base_url, routes, duration, warmup, concurrency, repeat):
+   """Measures every route `repeat` times, interleaved so drift hits all routes alike; returns medians."""
+   # auto_decompress=False so body sizes are what actually crossed the wire
+   connector = aiohttp.TCPConnector(limit=concurrency, force_close=False)
+   async with aiohttp.ClientSession(connector=connector, headers=HEADERS, auto_decompress=False) as session:
+      if warmup:
+         for route in routes:
+            await drive(session, base_url + route, warmup, concurrency)
+      runs = {route: [] for route in routes}
+      for _ in range(repeat):
+         for route in routes:
+            runs[route].append(summarize(*await drive(session, base_url + route, duration, concurrency), duration))
+      results = {route: median_run(route_runs) for route, route_runs in runs.items()}
+      for route, stats in results.items():
+         print_route(route, stats)
+      return results
+
+
+def print_route(route, stats):
+   if not stats["requests"]:
+      print(f"{route:<18} no successful requests ({stats['errors']} errors)")
+      return
+   errors = f" | {stats['errors']} errors" if stats["errors"] else ""
+   print(f"{route:<18} {stats['rps']:9.1f} req/s | p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms"
+         f"  p99 {stats['p99_ms']:7.2f} ms | {stats['bytes_per_request']:7d} B/req{errors}")
+
+
+def git_revision():
+   try:
+      return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout.strip()
+   except (OSError, subprocess.CalledProcessError):
+      return None
+
+
+def compare(results, baseline, threshold):
+   """Returns one message per route that regressed against `baseline`."""
+   failures = []
+   for route, stats in results.items():
+      before = baseline["routes"].get(route)
+      if not before or not before["requests"]:
+         continue
+      if not stats["requests"]:
+         failures.append(f"{route}: no successful requests")
+         continue
+      if stats["rps"] < before["rps"] * (1 - threshold):
+         failures.append(f"{route}: {stats['rps']:.1f} req/s, baseline {before['rps']:.1f}")
+      if (stats["p95_ms"] > before["p95_ms"] * (1 + threshold)
+            and stats["p95_ms"] - before["p95_ms"] > MIN_LATENCY_DELTA_MS):
+         failures.append(f"{route}: p95 {stats['p95_ms']:.2f} ms, baseline {before['p95_ms']:.2f} ms")
+      if stats["errors"] > before["errors"]:
+         failures.append(f"{route}: {stats['errors']} errors, baseline {before['errors']}")
+   return failures
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--routes", nargs="+", default=list(ROUTES))
+   parser.add_argument("--concurrency", type=int, default=16)
+   parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per route.")
+   parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per route first.")
+   parser.add_argument("--repeat", type=int, default=3, help="Runs per route; the median is reported.")
+   parser.add_argument("--workers", type=int, default=2)
+   parser.add_argument("--worker-class", default="sync")
+   parser.add_argument("--gunicorn-arg", action="append", default=[],
+                       help="Extra argument passed to gunicorn (repeatable).")
+   parser.add_argument("--url", help="Benchmark an already running server instead of starting gunicorn.")
+   parser.add_argument("--out", help="Where to write the results (default: benchmarks/results/<time>.json).")
+   parser.add_argument("--baseline", help="Fail if a route regressed against this results file.")
+   parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                       help="Also write the results as the baseline (default: %(const)s).")
+   parser.add_argument("--threshold", type=float, default=0.10,
+                       help="Allowed regression as a fraction (default: 0.10).")
+   args = parser.parse_args()
+
+   process = None
+   base_url = args.url
+   if base_url is None:
+      port = free_port()
+      process = start_gunicorn(port, args.workers, args.worker_class, args.gunicorn_arg)
+      base_url = f"http://127.0.0.1:{port}"
+   try:
+      routes = asyncio.run(run(base_url.rstrip("/"), args.routes, args.duration, args.warmup, args.concurrency,
+                             args.repeat))
+   finally:
+      if process is not None:
+         stop_gunicorn(process)
+
+   document = {
+      "meta": {
+         "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+         "revision": git_revision(),
+         "python": platform.python_version(),
+         "cpus": os.cpu_count(),
+         "server": args.url or f"gunicorn -w {args.workers} -k {args.worker_class} {' '.join(args.gunicorn_arg)}".strip(),
+         "concurrency": args.concurrency,
+         "duration": args.duration,
+         "repeat": args.repeat,
+      },
+      "routes": routes,
+   }
+   stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+   paths = [args.out or os.path.join(RESULTS_DIR, f"loadtest-{stamp}.json")]
+   if args.save_baseline:
+      paths.append(args.save_baseline)
+   for path in paths:
+      os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+      with open(path, "w") as f:
+         json.dump(document, f, indent=2)
+      print(f"Wrote {path}")
+
+   if args.baseline:
+      with open(args.baseline) as f:
+         baseline = json.load(f)
+      failures = compare(routes, baseline, args.threshold)
+      if failures:
+         print(f"Regressed against {args.baseline} (threshold {args.threshold:.0%}):")
+         for failure in failures:
+            print(f"  {failure}")
+         sys.exit(1)
+      print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,368 @@
+"""The recurring tournament schedule, a precomputed table of upcoming occurrences and its iCalendar feed."""
+
+import bisect
+import collections
+import datetime
+import threading
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+# Every event time is wall-clock Eastern, DST included
+EASTERN = ZoneInfo("America/New_York")
+
+# iCalendar BYDAY codes, indexed by datetime.weekday()
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WEEKDAY_ABBREVIATIONS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# How far ahead the occurrence table reaches
+OCCURRENCE_WEEKS = 8
+
+# Registration for an occurrence opens this long before it starts
+REGISTRATION_OPENS = datetime.timedelta(hours=4)
+
+# What /events reports for each event. Times alone give registration_open, live
+# and finished ("scheduled" before any occurrence has happened); on_stream is
+# only ever set by an admin, for the occurrence in progress.
+STATUSES = ("scheduled", "registration_open", "live", "on_stream", "finished")
+
+# The iCalendar series start on the first matching day from here; clients
+# expand the RRULE forward from that first occurrence
+CALENDAR_START = datetime.date(2025, 1, 1)
+
+# How often subscribed calendar clients are asked to refetch the feed
+CALENDAR_REFRESH = "PT12H"
+
+# US Eastern rules in force since 2007, which is everything CALENDAR_START can reach
+EASTERN_VTIMEZONE = (
+   "BEGIN:VTIMEZONE",
+   f"TZID:{EASTERN.key}",
+   "BEGIN:DAYLIGHT",
+   "TZOFFSETFROM:-0500",
+   "TZOFFSETTO:-0400",
+   "TZNAME:EDT",
+   "DTSTART:20070311T020000",
+   "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU",
+   "END:DAYLIGHT",
+   "BEGIN:STANDARD",
+   "TZOFFSETFROM:-0400",
+   "TZOFFSETTO:-0500",
+   "TZNAME:EST",
+   "DTSTART:20071104T020000",
+   "RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=1SU",
+   "END:STANDARD",
+   "END:VTIMEZONE",
+)
+
+
+def clock_label(value):
+   """A time of day as "10:00 PM"."""
+   hour = value.hour % 12 or 12
+   return f"{hour}:{value.minute:02d} {'AM' if value.hour < 12 else 'PM'}"
+
+
+def find_zone(key):
+   """Returns the ZoneInfo for an IANA zone name, or None if there is no such zone."""
+   if not key or len(key) > 64:
+      return None
+   try:
+      return ZoneInfo(key)
+   except (ZoneInfoNotFoundError, ValueError):
+      return None
+
+
+class Event(collections.namedtuple(
+      "Event", "key name description weekday start style duration", defaults=(datetime.timedelta(hours=3),))):
+   """A recurring tournament: every day when `weekday` is None, otherwise weekly on that day.
+
+   `style` is the CSS modifier the schedule page uses ("", "noobtube" or "weekly").
+   """
+
+   __slots__ = ()
+
+   @property
+   def time_label(self):
+      """The start time as the schedule page shows it, e.g. "10:00 PM"."""
+      return clock_label(self.start)
+
+   @property
+   def rrule(self):
+      """The recurrence as an iCalendar RRULE value."""
+      if self.weekday is None:
+         return "FREQ=DAILY"
+      return f"FREQ=WEEKLY;BYDAY={WEEKDAY_CODES[self.weekday]}"
+
+   def occurs_on(self, day):
+      return self.weekday is None or day.weekday() == self.weekday
+
+   def first_on_or_after(self, day):
+      """The first day from `day` on which the event happens."""
+      if self.weekday is None:
+         return day
+      return day + datetime.timedelta(days=(self.weekday - day.weekday()) % 7)
+
+   @property
+   def ical_duration(self):
+      minutes = int(self.duration.total_seconds() // 60)
+      return f"PT{minutes // 60}H{minutes % 60}M" if minutes % 60 else f"PT{minutes // 60}H"
+
+   def as_dict(self):
+      return {
+         "key": self.key,
+         "name": self.name,
+         "description": self.description,
+         "style": self.style,
+         "weekday": None if self.weekday is None else WEEKDAY_CODES[self.weekday],
+         "start": self.start.strftime("%H:%M"),
+         "time_label": self.time_label,
+         "timezone": EASTERN.key,
+         "duration_minutes": int(self.duration.total_seconds() // 60),
+         "rrule": self.rrule,
+      }
+
+
+EVENTS = (
+   Event("daily", "Melee at Night (Daily)", "The main singles event, every day.",
+         None, datetime.time(22, 0), ""),
+   Event("noobtube", "The NoobTube", "Singles tournament for newer players. Every Monday.",
+         0, datetime.time(20, 0), "noobtube"),
+   Event("doubles", "Doubles Night", "2 vs 2 Melee action! Every Saturday.",
+         5, datetime.time(20, 0), "weekly"),
+)
+
+
+class OccurrenceTable:
+   """Every occurrence of `events` over the next few weeks, sorted by start time.
+
+   Starts and ends are UTC timestamps in parallel lists, so "what's next" is a
+   single bisect and "what's live" only looks back over the longest duration.
+   """
+
+   def __init__(self, events, now, weeks=OCCURRENCE_WEEKS):
+      self.events = events
+      today = datetime.datetime.fromtimestamp(now, EASTERN).date()
+      # start a day back so anything that began last night is still found as live
+      first = today - datetime.timedelta(days=1)
+      rows = []
+      for offset in range(weeks * 7 + 1):
+         day = first + datetime.timedelta(days=offset)
+         for event in events:
+            if event.occurs_on(day):
+               start = datetime.datetime.combine(day, event.start, EASTERN)
+               rows.append((start.timestamp(), (start + event.duration).timestamp(), event))
+      rows.sort(key=lambda row: row[0])
+      self.starts = [row[0] for row in rows]
+      self.ends = [row[1] for row in rows]
+      self.occurrences = [row[2] for row in rows]
+      self.longest = max((event.duration.total_seconds() for event in events), default=0)
+      # rebuild once less than a week of lookahead is left
+      self.expires = self.starts[-1] - 7 * 86400 if rows else now
+
+   def next_index(self, now):
+      """Index of the first occurrence starting after `now` (len(starts) if none)."""
+      return bisect.bisect_right(self.starts, now)
+
+   def upcoming(self, now, count):
+      i = self.next_index(now)
+      return [self.occurrence(j) for j in range(i, min(i + count, len(self.starts)))]
+
+   def live(self, now):
+      """Occurrences in progress at `now`, earliest first."""
+      i = self.next_index(now)
+      lo = bisect.bisect_left(self.starts, now - self.longest, 0, i)
+      return [self.occurrence(j) for j in range(lo, i) if self.ends[j] > now]
+
+   def next_change(self, now):
+      """The next time the live/next answer changes: an occurrence starting or ending."""
+      i = self.next_index(now)
+      candidates = [self.starts[i]] if i < len(self.starts) else [self.expires]
+      lo = bisect.bisect_left(self.starts, now - self.longest, 0, i)
+      candidates.extend(end for end in self.ends[lo:i] if end > now)
+      return min(candidates)
+
+   def occurrence(self, i):
+      start = datetime.datetime.fromtimestamp(self.starts[i], EASTERN)
+      end = datetime.datetime.fromtimestamp(self.ends[i], EASTERN)
+      return {"event": self.occurrences[i].key, "start": start.isoformat(), "end": end.isoformat()}
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def occurrence_table(now=None):
+   """Returns the shared occurrence table, rebuilding it when its lookahead runs short."""
+   global _table
+   now = time.time() if now is None else now
+   table = _table
+   if table is None or now >= table.expires:
+      with _table_lock:
+         if _table is None or now >= _table.expires:
+            _table = OccurrenceTable(EVENTS, now)
+         table = _table
+   return table
+
+
+def schedule_document(now=None, upcoming=10):
+   """Returns the /api/schedule payload and the timestamp until which it stays correct."""
+   now = time.time() if now is None else now
+   table = occurrence_table(now)
+   upcoming = table.upcoming(now, upcoming)
+   document = {
+      "timezone": EASTERN.key,
+      "events": [event.as_dict() for event in EVENTS],
+      "live": table.live(now),
+      "next": upcoming[0] if upcoming else None,
+      "upcoming": upcoming,
+   }
+   return document, min(table.next_change(now), table.expires)
+
+
+def live_status(now=None, overrides=None):
+   """Returns each event's current status and the timestamp until which that stays correct.
+
+   `overrides` maps an event key to {"status", "occurrence", "message"} set by
+   an admin. One only applies while `occurrence` (a start timestamp) is still
+   the event's current occurrence, the one in progress or else the next one,
+   so a forgotten "on_stream" lapses by itself once that bracket ends.
+   """
+   now = time.time() if now is None else now
+   overrides = overrides or {}
+   table = occurrence_table(now)
+   opens = REGISTRATION_OPENS.total_seconds()
+   statuses = []
+   valid_until = table.expires
+   for event in EVENTS:
+      previous = current = None
+      for i, occurrence in enumerate(table.occurrences):
+         if occurrence is not event:
+            continue
+         if table.ends[i] <= now:
+            previous = i
+         else:
+            current = i
+            break
+      entry = {"event": event.key, "name": event.name}
+      if current is not None:
+         start, end = table.starts[current], table.ends[current]
+         if start <= now:
+            status = "live"
+            valid_until = min(valid_until, end)
+         elif start - opens <= now:
+            status = "registration_open"
+            valid_until = min(valid_until, start)
+         else:
+            status = "finished" if previous is not None else "scheduled"
+            valid_until = min(valid_until, start - opens)
+         entry["occurrence"] = table.occurrence(current)
+      else:
+         status = "finished" if previous is not None else "scheduled"
+      if previous is not None:
+         entry["previous"] = table.occurrence(previous)
+      override = overrides.get(event.key)
+      if override and current is not None and override["occurrence"] == table.starts[current]:
+         status = override["status"]
+         if override.get("message"):
+            entry["message"] = override["message"]
+      entry["status"] = status
+      statuses.append(entry)
+   return {"timezone": EASTERN.key, "events": statuses}, valid_until
+
+
+def current_occurrence(key, now=None):
+   """The start timestamp of event `key`'s occurrence in progress, or else its next one (None if unknown)."""
+   now = time.time() if now is None else now
+   table = occurrence_table(now)
+   for i, occurrence in enumerate(table.occurrences):
+      if occurrence.key == key and table.ends[i] > now:
+         return table.starts[i]
+   return None
+
+
+def _ical_text(value):
+   """Escapes a TEXT property value (RFC 5545 3.3.11)."""
+   return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+   """Folds a content line into 75-octet pieces joined by CRLF + space (RFC 5545 3.1)."""
+   data = line.encode("utf-8")
+   if len(data) <= 75:
+      return line
+   pieces, start = [], 0
+   while start < len(data):
+      end = min(start + (75 if not pieces else 74), len(data))
+      # never split inside a UTF-8 sequence
+      while end < len(data) and data[end] & 0xC0 == 0x80:
+         end -= 1
+      pieces.append(data[start:end].decode("utf-8"))
+      start = end
+   return "\r\n ".join(pieces)
+
+
+def icalendar(stamp, name="Melee at Night", domain="meleeatnight"):
+   """Returns the schedule as an iCalendar (RFC 5545) feed with one recurring VEVENT per event.
+
+   `stamp` (a UTC timestamp, e.g. when the schedule last changed) becomes every
+   DTSTAMP, so the same schedule always serializes to the same bytes.
+   """
+   dtstamp = datetime.datetime.fromtimestamp(stamp, datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+   lines = [
+      "BEGIN:VCALENDAR",
+      "VERSION:2.0",
+      f"PRODID:-//{name}//Schedule//EN",
+      "CALSCALE:GREGORIAN",
+      "METHOD:PUBLISH",
+      f"X-WR-CALNAME:{_ical_text(name)}",
+      f"X-WR-TIMEZONE:{EASTERN.key}",
+      f"REFRESH-INTERVAL;VALUE=DURATION:{CALENDAR_REFRESH}",
+      f"X-PUBLISHED-TTL:{CALENDAR_REFRESH}",
+      *EASTERN_VTIMEZONE,
+   ]
+   for event in EVENTS:
+      start = datetime.datetime.combine(event.first_on_or_after(CALENDAR_START), event.start)
+      lines += [
+         "BEGIN:VEVENT",
+         f"UID:{event.key}@{domain}",
+         f"DTSTAMP:{dtstamp}",
+         f"DTSTART;TZID={EASTERN.key}:{start.strftime('%Y%m%dT%H%M%S')}",
+         f"DURATION:{event.ical_duration}",
+         f"RRULE:{event.rrule}",
+         f"SUMMARY:{_ical_text(event.name)}",
+         f"DESCRIPTION:{_ical_text(event.description)}",
+         "END:VEVENT",
+      ]
+   lines.append("END:VCALENDAR")
+   return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def localized_times(zone, now=None):
+   """Returns each event's start time as seen in `zone`, and the DST period those labels hold for.
+
+   Labels come from each event's current occurrence, so they are right across
+   a DST change in either zone. A weekly event that lands on another day in
+   `zone` gets that day in front ("Tue 9:00 AM"). The period is the pair of UTC
+   offsets (Eastern, `zone`) at each of those occurrences; it is all that can
+   change the labels, which makes (zone, period) a complete cache key.
+   """
+   now = time.time() if now is None else now
+   labels, period = [], []
+   for event in EVENTS:
+      start = current_occurrence(event.key, now)
+      eastern = datetime.datetime.fromtimestamp(start, EASTERN)
+      local = datetime.datetime.fromtimestamp(start, zone)
+      label = clock_label(local)
+      if event.weekday is not None and local.weekday() != eastern.weekday():
+         label = f"{WEEKDAY_ABBREVIATIONS[local.weekday()]} {label}"
+      labels.append(label)
+      period.append((int(eastern.utcoffset().total_seconds()), int(local.utcoffset().total_seconds())))
+   return labels, tuple(period)
+
+
+def zone_label(zone, now=None):
+   """How the schedule page names a zone, e.g. "Europe/London (BST)"."""
+   now = time.time() if now is None else now
+   abbreviation = datetime.datetime.fromtimestamp(now, zone).tzname()
+   name = zone.key.replace("_", " ")
+   # zones without an abbreviation report the offset ("+09"), which reads fine too
+   return f"{name} ({abbreviation})" if abbreviation and abbreviation != zone.key else name
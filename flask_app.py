@@ -1,7 +1,69 @@
-from flask import Flask, render_template_string, url_for
+import base64
+import binascii
+import functools
+import hashlib
+import json
+import mimetypes
+import os
+import time
+import zlib
+
+import click
+from flask import Flask, Response, abort, redirect, request, stream_with_context, url_for
+from jinja2 import DictLoader
+from markupsafe import Markup
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+import assets
+import events
+import freeze
+import metrics
+import profiler
+import profiles
+import results_log
+import search
+import shared_cache
+import startgg
 
 
 app = Flask(__name__)
+assets.init_app(app)
+freeze.init_app(app)
+startgg.init_app(app)
+metrics.init_app(app)
+# Rendered pages and API answers, shared by every worker (SHARED_CACHE_PATH)
+cache = shared_cache.init_app(app)
+
+# Cache-Control sent with each page; anything not listed gets DEFAULT_CACHE_CONTROL.
+# Browsers revalidate with the ETag/Last-Modified validators once max-age runs out.
+app.config.setdefault("DEFAULT_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+# Tournament result exports (JSON/CSV) imported into the results log
+app.config.setdefault("RESULTS_DIR", os.path.join(app.root_path, "data", "results"))
+app.config.setdefault("RESULTS_POLL_SECONDS", 30)
+# Rows on the cached first rankings page, and the most ?limit= may ask for
+app.config.setdefault("RANKINGS_LIMIT", 100)
+# Where pages open the live status stream (live.py, routed there by the proxy)
+app.config.setdefault("LIVE_EVENTS_URL", "/events")
+app.config.setdefault("RANKINGS_MAX_LIMIT", 1000)
+# Optional {"tag": ["alias", ...]} file used by player search
+app.config.setdefault("PLAYER_ALIASES", os.path.join(app.root_path, "data", "aliases.json"))
+# Routes that only answer with query arguments have nothing to freeze, and
+# /api/schedule's live/next answer is stale by the next event change
+app.config["FREEZE_SKIP"].extend(["api_h2h", "api_player_search", "api_schedule"])
+app.config.setdefault("PAGE_CACHE_CONTROL", {
+   "index": "public, max-age=300",
+   "schedule": "public, max-age=300",
+   "schedule_ics": "public, max-age=3600",
+   # /schedule?tz=<zone>; only the URL picks the zone, so it is as shareable as the default
+   "schedule_localized": "public, max-age=300",
+   "rankings": "public, max-age=60",
+   "rankings_api": "public, max-age=60",
+   "player": "public, max-age=60",
+   "h2h": "public, max-age=60",
+   "search": "public, max-age=60",
+   "support": "public, max-age=3600",
+})
 
 
 # --- CSS STYLES ---
@@ -128,6 +190,20 @@ body{
 }
 .cta:hover{transform:translateY(-3px); box-shadow:0 18px 50px rgba(255,140,0,0.12)}
 
+/* What's live right now, filled in from /events by LIVE_SCRIPT */
+.live-badge{
+   display:inline-block;
+   background:#e33232;
+   color:#fff;
+   font-size:12px;
+   font-weight:800;
+   letter-spacing:.04em;
+   text-transform:uppercase;
+   padding:4px 10px;
+   border-radius:100px;
+}
+.live-badge[hidden]{display:none}
+
 
 @media (max-width:540px){
    .moon-img{width:36px;height:36px;top:12px;right:12px}
@@ -146,112 +222,440 @@ body{
 """
 
 
+# Home page styles
+INDEX_STYLES = """
+header.content-header{
+   padding:48px 24px;
+   background:linear-gradient(180deg, rgba(255,255,255,0.02), transparent);
+   border-radius:16px;
+   border:1px solid rgba(255,255,255,0.03);
+   box-shadow:0 12px 40px rgba(30,10,0,0.6);
+   margin-bottom: 22px;
+}
+h1{
+   margin:0 0 8px 0;
+   font-size:48px;
+   letter-spacing:-1px;
+   line-height:1;
+   font-weight:800;
+   color:var(--accent);
+   text-shadow:0 6px 24px rgba(255,140,0,0.06);
+}
+p.lead{
+   margin:0 0 0 0;
+   color:var(--muted);
+   font-size:15px;
+}
+.cta-group {
+   display: flex;
+   justify-content: center;
+   gap: 12px;
+   flex-wrap: wrap;
+   margin-top: 20px;
+}
+main{
+   background:transparent;
+   text-align:left;
+   padding:24px;
+   border-radius:12px;
+}
+.about{
+   background:rgba(255,255,255,0.01);
+   padding:18px;
+   border-radius:10px;
+   border:1px solid rgba(255,255,255,0.02);
+   color:var(--muted);
+   font-size:15px;
+   line-height:1.5;
+}
+footer{
+   margin-top:18px;
+   display:flex;
+   gap:12px;
+   justify-content:center;
+   align-items:center;
+   padding-top:18px;
+}
+.icon-link{
+   width:44px;
+   height:44px;
+   display:inline-flex;
+   align-items:center;
+   justify-content:center;
+   border-radius:10px;
+   background:rgba(255,255,255,0.02);
+   color:var(--accent);
+   text-decoration:none;
+   border:1px solid rgba(255,255,255,0.03);
+   transition:transform .12s ease, background .12s ease;
+}
+.icon-link:hover{transform:translateY(-4px); background:rgba(255,160,80,0.06)}
+
+
+@media (max-width:540px){
+   h1{font-size:34px}
+   .cta{padding:12px 18px}
+}
+"""
+
+
+# Schedule page styles
+SCHEDULE_STYLES = """
+.content-box{
+   width:100%;
+   max-width:550px;
+   text-align:center;
+   padding: 30px;
+   background:rgba(255,255,255,0.01);
+   border-radius:16px;
+   border:1px solid rgba(255,255,255,0.03);
+   box-shadow:0 12px 40px rgba(30,10,0,0.6);
+   margin: 0 auto;
+}
+h2{
+   margin:0 0 12px 0;
+   font-size:32px;
+   color:var(--accent);
+   text-align:center;
+}
+.schedule-list {
+   list-style: none;
+   padding: 0;
+   margin: 20px 0 0 0;
+}
+.schedule-item {
+   display: flex;
+   justify-content: space-between;
+   align-items: center;
+   background: var(--panel);
+   margin-bottom: 10px;
+   padding: 15px 20px;
+   border-radius: var(--radius);
+   border-left: 5px solid var(--accent);
+   text-align: left;
+   transition: border-color 0.2s ease;
+}
+/* Style for weekly/special tournaments */
+.schedule-item.weekly {
+   border-left-color: var(--support-accent);
+}
+.schedule-item.noobtube {
+   border-left-color: #e33232; /* Red color for NoobTube */
+}
+.schedule-item strong {
+   color: #fff;
+   font-size: 16px;
+   display: block;
+   margin-bottom: 2px;
+}
+.schedule-item span {
+   color: var(--muted);
+   font-size: 14px;
+}
+.time {
+   font-weight: 800;
+   color: var(--accent);
+   font-size: 18px;
+   flex-shrink: 0;
+   margin-left: 15px;
+}
+.time-weekly {
+   color: var(--support-accent);
+}
+.time-noobtube {
+   color: #e33232; /* Red color for NoobTube time */
+}
+"""
+
+
+# Support page styles
+SUPPORT_STYLES = """
+.content-box{
+   width:100%;
+   max-width:450px;
+   text-align:center;
+   padding: 30px;
+   background:rgba(255,255,255,0.01);
+   border-radius:16px;
+   border:1px solid rgba(255,255,255,0.03);
+   box-shadow:0 12px 40px rgba(30,10,0,0.6);
+   /* Centering applied to the content-box */
+   margin: 0 auto;
+}
+h2{
+   margin:0 0 30px 0;
+   font-size:32px;
+   color:var(--accent);
+   text-align:center;
+}
+/* VIP Button Styles */
+.vip-cta {
+   background: linear-gradient(180deg, #ffc700, #ff9a00); /* Gold/VIP color */
+   color: #382500 !important;
+   font-size: 1.2em;
+   padding: 16px 30px;
+   box-shadow: 0 10px 40px rgba(255, 199, 0, 0.2);
+   border: none;
+   cursor: pointer;
+}
+.or-text {
+   margin: 25px 0 20px 0;
+   font-size: 16px;
+   font-weight: 600;
+   color: var(--muted);
+}
+.bitcoin-box {
+   padding: 20px;
+   background: var(--panel);
+   border-radius: var(--radius);
+   border: 1px solid rgba(255, 255, 255, 0.05);
+   display: inline-block;
+   max-width: 90%;
+   text-align: center;
+}
+.bitcoin-box p {
+   margin: 0 0 8px 0;
+   color: var(--muted);
+}
+.address-group {
+   display: flex;
+   align-items: center;
+   justify-content: center;
+   gap: 10px;
+   background: #120700;
+   padding: 8px 12px;
+   border-radius: 8px;
+   font-family: monospace;
+   overflow-x: auto;
+   max-width: 100%;
+}
+#bitcoin-address {
+   color: #b3ffb3; /* Light green for Bitcoin address */
+   font-size: 14px;
+   user-select: all;
+   word-break: break-all;
+   text-align: left;
+   flex-grow: 1;
+}
+.copy-btn {
+   background: var(--accent);
+   color: #2b0f00;
+   padding: 8px 12px;
+   border: none;
+   border-radius: 6px;
+   cursor: pointer;
+   font-weight: 700;
+   transition: background-color 0.1s, transform 0.1s;
+   flex-shrink: 0;
+}
+.copy-btn:active {
+   transform: scale(0.95);
+}
+.copy-btn:hover {
+   background: var(--accent-2);
+}
+@media (max-width: 480px) {
+   .content-box { padding: 20px; }
+   #bitcoin-address { font-size: 12px; }
+   .copy-btn { font-size: 12px; padding: 6px 10px; }
+}
+"""
+
+
+# Rankings page styles
+RANKINGS_STYLES = """
+.content-box{
+   width:100%;
+   text-align:center;
+   padding: 40px 30px;
+   background:rgba(255,255,255,0.01);
+   border-radius:16px;
+   border:1px solid rgba(255,255,255,0.03);
+   box-shadow:0 12px 40px rgba(30,10,0,0.6);
+}
+h2{
+   margin:0 0 12px 0;
+   font-size:32px;
+   color:var(--accent);
+   text-align:center;
+}
+p {
+   color: var(--muted);
+   font-size: 16px;
+   line-height: 1.6;
+   margin: 0;
+}
+.rankings-table {
+   width: 100%;
+   border-collapse: collapse;
+   margin: 10px 0 0 0;
+   text-align: left;
+}
+.rankings-table th {
+   color: var(--muted);
+   font-size: 13px;
+   text-transform: uppercase;
+   padding: 8px 12px;
+   border-bottom: 1px solid rgba(255,255,255,0.06);
+}
+.rankings-table td {
+   padding: 10px 12px;
+   border-bottom: 1px solid rgba(255,255,255,0.03);
+}
+.rankings-table td.rank {
+   color: var(--accent);
+   font-weight: 800;
+   width: 48px;
+}
+.rankings-table .rd {
+   color: var(--muted);
+   font-size: 12px;
+   margin-left: 6px;
+}
+.rankings-table a {
+   color: #fff;
+   text-decoration: none;
+}
+.rankings-table a:hover {
+   color: var(--accent);
+}
+.pager {
+   margin-top: 16px;
+   text-align: right;
+}
+.pager a {
+   color: var(--accent);
+   font-weight: 700;
+   text-decoration: none;
+}
+/* Player profile pages */
+h3 {
+   margin: 28px 0 8px 0;
+   color: #ffe8cc;
+   font-size: 18px;
+   text-align: left;
+}
+.player-summary {
+   margin-bottom: 8px;
+}
+.player-summary strong {
+   color: var(--accent);
+}
+"""
+
+
 # --- HTML TEMPLATES ---
 
 
-# Main Index Page (Home)
-INDEX_HTML = """<!doctype html>
+# The layout every page extends. A page sets `section` (its stylesheet and
+# active nav tab) and fills the title and content blocks; the shared pieces
+# come from fragment(), which renders each once per key (see PAGE CACHE).
+BASE_HTML = """<!doctype html>
 <html lang="en">
 <head>
    <meta charset="utf-8" />
    <meta name="viewport" content="width=device-width,initial-scale=1" />
-   <title>Melee at Night | Home</title>
-   <style>
-       /* --- COMMON STYLES --- */
-       {{ COMMON_STYLES|safe }}
-       /* --- PAGE-SPECIFIC STYLES --- */
-       header.content-header{
-           padding:48px 24px;
-           background:linear-gradient(180deg, rgba(255,255,255,0.02), transparent);
-           border-radius:16px;
-           border:1px solid rgba(255,255,255,0.03);
-           box-shadow:0 12px 40px rgba(30,10,0,0.6);
-           margin-bottom: 22px;
-       }
-       h1{
-           margin:0 0 8px 0;
-           font-size:48px;
-           letter-spacing:-1px;
-           line-height:1;
-           font-weight:800;
-           color:var(--accent);
-           text-shadow:0 6px 24px rgba(255,140,0,0.06);
-       }
-       p.lead{
-           margin:0 0 0 0;
-           color:var(--muted);
-           font-size:15px;
-       }
-       .cta-group {
-           display: flex;
-           justify-content: center;
-           gap: 12px;
-           flex-wrap: wrap;
-           margin-top: 20px;
-       }
-       main{
-           background:transparent;
-           text-align:left;
-           padding:24px;
-           border-radius:12px;
-       }
-       .about{
-           background:rgba(255,255,255,0.01);
-           padding:18px;
-           border-radius:10px;
-           border:1px solid rgba(255,255,255,0.02);
-           color:var(--muted);
-           font-size:15px;
-           line-height:1.5;
-       }
-       footer{
-           margin-top:18px;
-           display:flex;
-           gap:12px;
-           justify-content:center;
-           align-items:center;
-           padding-top:18px;
-       }
-       .icon-link{
-           width:44px;
-           height:44px;
-           display:inline-flex;
-           align-items:center;
-           justify-content:center;
-           border-radius:10px;
-           background:rgba(255,255,255,0.02);
-           color:var(--accent);
-           text-decoration:none;
-           border:1px solid rgba(255,255,255,0.03);
-           transition:transform .12s ease, background .12s ease;
-       }
-       .icon-link:hover{transform:translateY(-4px); background:rgba(255,160,80,0.06)}
-
-
-       @media (max-width:540px){
-           h1{font-size:34px}
-           .cta{padding:12px 18px}
-       }
-   </style>
+   <title>Melee at Night | {% block title %}{% endblock %}</title>
+   {{ fragment('styles', section) }}
 </head>
 <body>
-   <img class="moon-img" src="{{ url_for('static', filename='moon.png') }}" alt="Melee at Night logo">
+   {{ fragment('header', section) }}
+   {{- flush() }}
+
+{% block content %}{% endblock -%}
+</body>
+</html>
+"""
+
+
+# (endpoint, label, extra class) of each nav tab
+NAV_TABS = (
+   ("index", "Home", ""),
+   ("schedule", "Schedule", ""),
+   ("rankings", "Rankings", ""),
+   ("support", "Support Us", "support-tab"),
+)
+
+# The moon logo and the nav, with the tab of `section` active
+HEADER_HTML = """{{ responsive_image('moon.png', 'Melee at Night logo', class_='moon-img') }}
 
 
    <div class="fixed-nav-header">
        <nav class="nav-tabs" aria-label="Main navigation">
-           <a class="nav-tab active" href="/">Home</a>
-           <a class="nav-tab" href="/schedule">Schedule</a>
-           <a class="nav-tab" href="/rankings">Rankings</a>
-           <a class="nav-tab support-tab" href="/support">Support Us</a>
+           {%- for endpoint, label, extra in nav_tabs %}
+           <a class="nav-tab{{ ' ' ~ extra if extra }}{{ ' active' if endpoint == section }}" href="{{ url_for(endpoint) }}">{{ label }}</a>
+           {%- endfor %}
        </nav>
-   </div>
+   </div>"""
+
+# Social icons, served as one SVG sprite (assets.build_sprite): id -> (viewBox, paths)
+SOCIAL_ICONS = {
+   "discord": ("0 0 71 55", (
+      '<path d="M60.104 4.41A58.99 58.99 0 0044.64.1a41.21 41.21 0 00-1.94 4.03 55.7 55.7 0 00-12.52 0 41.1 41.1 0 00-1.93-4.03C26.36.1 10.9 4.41 10.9 4.41c-6.37 11.23-7.12 21.07-6.32 30.7 0 0 7.04 5.03 12.9 8.3 0 0 3.63-4.37 6.6-8.02 0 0-2.09-.62-3.03-1.06 5.7-1.63 11.16-1.63 16.1 0-.94.44-3.03 1.06-3.03 1.06 2.97 3.65 6.6 8.02 6.6 8.02 5.86-3.27 12.9-8.3 12.9-8.3.8-9.63.05-19.47-6.32-30.7z" fill="currentColor"/>'
+      '<path d="M23.76 33.1c-2.08 0-3.77-1.9-3.77-4.23 0-2.33 1.69-4.23 3.77-4.23 2.09 0 3.78 1.9 3.77 4.23 0 2.33-1.68 4.23-3.77 4.23zM47.24 33.1c-2.08 0-3.77-1.9-3.77-4.23 0-2.33 1.69-4.23 3.77-4.23 2.09 0 3.78 1.9 3.77 4.23 0 2.33-1.68 4.23-3.77 4.23z" fill="#021018"/>'
+   )),
+   "youtube": ("0 0 24 24", (
+      '<path d="M23.498 6.186a2.99 2.99 0 0 0-2.106-2.117C19.42 3.5 12 3.5 12 3.5s-7.42 0-9.392.569A2.99 2.99 0 0 0 .502 6.186C0 8.186 0 12 0 12s0 3.814.502 5.814a2.99 2.99 0 0 0 2.106 2.117C4.58 20.5 12 20.5 12 20.5s7.42 0 9.392-.569a2.99 2.99 0 0 0 2.106-2.117C24 15.814 24 12 24 12s0-3.814-.502-5.814zM9.75 15.02V8.98L15.5 12l-5.75 3.02z" fill="currentColor"/>'
+   )),
+   "twitch": ("0 0 24 24", (
+      '<path d="M4 2v14l3 3h4l3 3v-3h2l3-3V2H4zm15 10h-3v3h-2v-3H8V4h11v8zM10 7h2v4h-2zM14 7h2v4h-2z" fill="currentColor"/>'
+   )),
+   "x": ("0 0 24 24", (
+      '<path d="M5.636 4.222a1 1 0 0 1 1.414 0L12 9.172l4.95-4.95a1 1 0 1 1 1.414 1.415L13.414 10.586l4.95 4.95a1 1 0 0 1-1.414 1.414L12 12l-4.95 4.95a1 1 0 1 1-1.414-1.414l4.95-4.95-4.95-4.95a1 1 0 0 1 0-1.414z" fill="currentColor"/>'
+   )),
+}
+
+# Social links
+FOOTER_HTML = """<footer>
+    <a class="icon-link" href="https://discord.gg/SG2X4ESNXz" rel="noopener" target="_blank" aria-label="Discord">
+        <svg width="20" height="20" fill="none" aria-hidden="true"><use href="{{ url_for('static', filename='img/icons.svg') }}#discord"/></svg>
+    </a>
+    <a class="icon-link" href="https://www.youtube.com/channel/UCZv8Bu0yyJ4M3q8ypZJTeaA" rel="noopener" target="_blank" aria-label="YouTube">
+        <svg width="20" height="20" fill="none" aria-hidden="true"><use href="{{ url_for('static', filename='img/icons.svg') }}#youtube"/></svg>
+    </a>
+    <a class="icon-link" href="https://www.twitch.tv/melee_at_night" rel="noopener" target="_blank" aria-label="Twitch">
+        <svg width="20" height="20" fill="none" aria-hidden="true"><use href="{{ url_for('static', filename='img/icons.svg') }}#twitch"/></svg>
+    </a>
+    <a class="icon-link" href="https://twitter.com/MeleeAtNight" rel="noopener" target="_blank" aria-label="X">
+        <svg width="20" height="20" fill="none" aria-hidden="true"><use href="{{ url_for('static', filename='img/icons.svg') }}#x"/></svg>
+    </a>
+</footer>"""
+
+
+# Live status: every [data-live-event] badge follows the "status" events from
+# live.py ("*" shows the most live event); the page itself stays cacheable
+LIVE_SCRIPT = """<script>
+    (function () {
+        if (!window.EventSource) return;
+        var labels = {on_stream: "On stream", live: "Live now", registration_open: "Registration open"};
+        var priority = ["on_stream", "live", "registration_open"];
+        var source = new EventSource({{ config.LIVE_EVENTS_URL|tojson }});
+        source.addEventListener("status", function (message) {
+            var events = JSON.parse(message.data).events;
+            document.querySelectorAll("[data-live-event]").forEach(function (badge) {
+                var key = badge.getAttribute("data-live-event"), shown = null;
+                events.forEach(function (event) {
+                    var rank = priority.indexOf(event.status);
+                    if (rank >= 0 && (key === "*" || key === event.event) && (!shown || rank < priority.indexOf(shown.status))) shown = event;
+                });
+                badge.hidden = !shown;
+                if (shown) badge.textContent = labels[shown.status] + (key === "*" ? ": " + shown.name : "") + (shown.message ? " \\u2014 " + shown.message : "");
+            });
+        });
+    })();
+</script>"""
 
 
+# Main Index Page (Home)
+INDEX_HTML = """{% extends "base.html" %}
+{% set section = "index" %}
+{% block title %}Home{% endblock %}
+{% block content %}
    <div class="wrap" role="main">
        <header class="content-header">
            <h1>Melee at Night</h1>
            <p class="lead">Daily online Super Smash Bros. Melee tournaments every night.</p>
+           <p><span class="live-badge" data-live-event="*" aria-live="polite" hidden></span></p>
 
 
            <div class="cta-group">
@@ -269,155 +673,50 @@ INDEX_HTML = """<!doctype html>
            </section>
 
 
-           <footer>
-               <a class="icon-link" href="https://discord.gg/SG2X4ESNXz" rel="noopener" target="_blank" aria-label="Discord">
-                   <svg width="20" height="20" viewBox="0 0 71 55" fill="none" xmlns="http://www.w3.org/2000/svg" aria-hidden="true">
-                       <path d="M60.104 4.41A58.99 58.99 0 0044.64.1a41.21 41.21 0 00-1.94 4.03 55.7 55.7 0 00-12.52 0 41.1 41.1 0 00-1.93-4.03C26.36.1 10.9 4.41 10.9 4.41c-6.37 11.23-7.12 21.07-6.32 30.7 0 0 7.04 5.03 12.9 8.3 0 0 3.63-4.37 6.6-8.02 0 0-2.09-.62-3.03-1.06 5.7-1.63 11.16-1.63 16.1 0-.94.44-3.03 1.06-3.03 1.06 2.97 3.65 6.6 8.02 6.6 8.02 5.86-3.27 12.9-8.3 12.9-8.3.8-9.63.05-19.47-6.32-30.7z" fill="currentColor"/>
-                       <path d="M23.76 33.1c-2.08 0-3.77-1.9-3.77-4.23 0-2.33 1.69-4.23 3.77-4.23 2.09 0 3.78 1.9 3.77 4.23 0 2.33-1.68 4.23-3.77 4.23zM47.24 33.1c-2.08 0-3.77-1.9-3.77-4.23 0-2.33 1.69-4.23 3.77-4.23 2.09 0 3.78 1.9 3.77 4.23 0 2.33-1.68 4.23-3.77 4.23z" fill="#021018"/>
-                   </svg>
-               </a>
-               <a class="icon-link" href="https://www.youtube.com/channel/UCZv8Bu0yyJ4M3q8ypZJTeaA" rel="noopener" target="_blank" aria-label="YouTube">
-                   <svg width="20" height="20" viewBox="0 0 24 24" fill="none" aria-hidden="true" xmlns="http://www.w3.org/2000/svg">
-                       <path d="M23.498 6.186a2.99 2.99 0 0 0-2.106-2.117C19.42 3.5 12 3.5 12 3.5s-7.42 0-9.392.569A2.99 2.99 0 0 0 .502 6.186C0 8.186 0 12 0 12s0 3.814.502 5.814a2.99 2.99 0 0 0 2.106 2.117C4.58 20.5 12 20.5 12 20.5s7.42 0 9.392-.569a2.99 2.99 0 0 0 2.106-2.117C24 15.814 24 12 24 12s0-3.814-.502-5.814zM9.75 15.02V8.98L15.5 12l-5.75 3.02z" fill="currentColor"/>
-                   </svg>
-               </a>
-               <a class="icon-link" href="https://www.twitch.tv/melee_at_night" rel="noopener" target="_blank" aria-label="Twitch">
-                   <svg width="20" height="20" viewBox="0 0 24 24" fill="none" aria-hidden="true" xmlns="http://www.w3.org/2000/svg">
-                       <path d="M4 2v14l3 3h4l3 3v-3h2l3-3V2H4zm15 10h-3v3h-2v-3H8V4h11v8zM10 7h2v4h-2zM14 7h2v4h-2z" fill="currentColor"/>
-                   </svg>
-               </a>
-               <a class="icon-link" href="https://twitter.com/MeleeAtNight" rel="noopener" target="_blank" aria-label="X">
-                   <svg width="20" height="20" viewBox="0 0 24 24" fill="none" aria-hidden="true" xmlns="http://www.w3.org/2000/svg">
-                       <path d="M5.636 4.222a1 1 0 0 1 1.414 0L12 9.172l4.95-4.95a1 1 0 1 1 1.414 1.415L13.414 10.586l4.95 4.95a1 1 0 0 1-1.414 1.414L12 12l-4.95 4.95a1 1 0 1 1-1.414-1.414l4.95-4.95-4.95-4.95a1 1 0 0 1 0-1.414z" fill="currentColor"/>
-                   </svg>
-               </a>
-           </footer>
+           {{ fragment('footer') }}
        </main>
    </div>
-</body>
-</html>
+   {{ fragment('live') }}
+{% endblock %}
 """
 
 
 # Schedule Page HTML
-SCHEDULE_HTML = """<!doctype html>
-<html lang="en">
-<head>
-   <meta charset="utf-8" />
-   <meta name="viewport" content="width=device-width,initial-scale=1" />
-   <title>Melee at Night | Schedule</title>
-   <style>
-       /* --- COMMON STYLES --- */
-       {{ COMMON_STYLES|safe }}
-       /* --- PAGE-SPECIFIC STYLES --- */
-       .content-box{
-           width:100%;
-           max-width:550px;
-           text-align:center;
-           padding: 30px;
-           background:rgba(255,255,255,0.01);
-           border-radius:16px;
-           border:1px solid rgba(255,255,255,0.03);
-           box-shadow:0 12px 40px rgba(30,10,0,0.6);
-           margin: 0 auto;
-       }
-       h2{
-           margin:0 0 12px 0;
-           font-size:32px;
-           color:var(--accent);
-           text-align:center;
-       }
-       .schedule-list {
-           list-style: none;
-           padding: 0;
-           margin: 20px 0 0 0;
-       }
-       .schedule-item {
-           display: flex;
-           justify-content: space-between;
-           align-items: center;
-           background: var(--panel);
-           margin-bottom: 10px;
-           padding: 15px 20px;
-           border-radius: var(--radius);
-           border-left: 5px solid var(--accent);
-           text-align: left;
-           transition: border-color 0.2s ease;
-       }
-       /* Style for weekly/special tournaments */
-       .schedule-item.weekly {
-            border-left-color: var(--support-accent);
-       }
-       .schedule-item.noobtube {
-            border-left-color: #e33232; /* Red color for NoobTube */
-       }
-       .schedule-item strong {
-           color: #fff;
-           font-size: 16px;
-           display: block;
-           margin-bottom: 2px;
-       }
-       .schedule-item span {
-           color: var(--muted);
-           font-size: 14px;
-       }
-       .time {
-           font-weight: 800;
-           color: var(--accent);
-           font-size: 18px;
-           flex-shrink: 0;
-           margin-left: 15px;
-       }
-       .time-weekly {
-            color: var(--support-accent);
-       }
-       .time-noobtube {
-           color: #e33232; /* Red color for NoobTube time */
-       }
-   </style>
-</head>
-<body>
-   <img class="moon-img" src="{{ url_for('static', filename='moon.png') }}" alt="Melee at Night logo">
-
-
-   <div class="fixed-nav-header">
-       <nav class="nav-tabs" aria-label="Main navigation">
-           <a class="nav-tab" href="/">Home</a>
-           <a class="nav-tab active" href="/schedule">Schedule</a>
-           <a class="nav-tab" href="/rankings">Rankings</a>
-           <a class="nav-tab support-tab" href="/support">Support Us</a>
-       </nav>
-   </div>
-
-
+SCHEDULE_HTML = """{% extends "base.html" %}
+{% set section = "schedule" %}
+{% block title %}Schedule{% endblock %}
+{% block content %}
    <div class="wrap" role="main">
        <div class="content-box">
            <h2>Tournament Schedule</h2>
-           <p style="color:var(--accent); font-weight:700;">All times are in Eastern Time (ET)</p>
+           <p style="color:var(--accent); font-weight:700;">All times are in {{ schedule_zone }}</p>
+           <p style="font-size:14px;">
+               <a href="{{ url_for('schedule_ics') }}" style="color:var(--accent); text-decoration:underline;">Add the schedule to your calendar</a>
+               {%- if localized %}
+               &middot; <a href="{{ url_for('schedule', tz=eastern) }}" style="color:var(--accent); text-decoration:underline;">Show Eastern Time</a>
+               {%- else %}
+               <span id="local-times" hidden>&middot; <a href="{{ url_for('schedule') }}" style="color:var(--accent); text-decoration:underline;">Show my time zone</a></span>
+               <script>
+                   (function () {
+                       var zone = Intl.DateTimeFormat().resolvedOptions().timeZone, span = document.getElementById("local-times");
+                       if (zone && zone !== "{{ eastern }}") { span.firstElementChild.href += "?tz=" + encodeURIComponent(zone); span.hidden = false; }
+                   })();
+               </script>
+               {%- endif %}
+           </p>
 
 
            <ul class="schedule-list">
-               <li class="schedule-item">
-                   <div>
-                       <strong>Melee at Night (Daily)</strong>
-                       <span>The main singles event, every day.</span>
-                   </div>
-                   <div class="time">10:00 PM</div>
-               </li>
-               <li class="schedule-item noobtube">
-                   <div>
-                       <strong>The NoobTube</strong>
-                       <span>Singles tournament for newer players. Every Monday.</span>
-                   </div>
-                   <div class="time time-noobtube">8:00 PM</div>
-               </li>
-               <li class="schedule-item weekly">
+               {%- for event in schedule_events %}
+               <li class="schedule-item{{ ' ' ~ event.style if event.style }}">
                    <div>
-                       <strong>Doubles Night</strong>
-                       <span>2 vs 2 Melee action! Every Saturday.</span>
+                       <strong>{{ event.name }}</strong>
+                       <span class="live-badge" data-live-event="{{ event.key }}" hidden></span>
+                       <span>{{ event.description }}</span>
                    </div>
-                   <div class="time time-weekly">8:00 PM</div>
+                   <div class="time{{ ' time-' ~ event.style if event.style }}">{{ schedule_times[loop.index0] }}</div>
                </li>
+               {%- endfor %}
            </ul>
 
 
@@ -429,127 +728,16 @@ SCHEDULE_HTML = """<!doctype html>
            </p>
        </div>
    </div>
-</body>
-</html>
+   {{ fragment('live') }}
+{% endblock %}
 """
 
 
 # Support Page HTML
-SUPPORT_HTML = """<!doctype html>
-<html lang="en">
-<head>
-   <meta charset="utf-8" />
-   <meta name="viewport" content="width=device-width,initial-scale=1" />
-   <title>Melee at Night | Support</title>
-   <style>
-       /* --- COMMON STYLES --- */
-       {{ COMMON_STYLES|safe }}
-       /* --- PAGE-SPECIFIC STYLES --- */
-       .content-box{
-           width:100%;
-           max-width:450px;
-           text-align:center;
-           padding: 30px;
-           background:rgba(255,255,255,0.01);
-           border-radius:16px;
-           border:1px solid rgba(255,255,255,0.03);
-           box-shadow:0 12px 40px rgba(30,10,0,0.6);
-           /* Centering applied to the content-box */
-           margin: 0 auto;
-       }
-       h2{
-           margin:0 0 30px 0;
-           font-size:32px;
-           color:var(--accent);
-           text-align:center;
-       }
-       /* VIP Button Styles */
-       .vip-cta {
-           background: linear-gradient(180deg, #ffc700, #ff9a00); /* Gold/VIP color */
-           color: #382500 !important;
-           font-size: 1.2em;
-           padding: 16px 30px;
-           box-shadow: 0 10px 40px rgba(255, 199, 0, 0.2);
-           border: none;
-           cursor: pointer;
-       }
-       .or-text {
-           margin: 25px 0 20px 0;
-           font-size: 16px;
-           font-weight: 600;
-           color: var(--muted);
-       }
-       .bitcoin-box {
-           padding: 20px;
-           background: var(--panel);
-           border-radius: var(--radius);
-           border: 1px solid rgba(255, 255, 255, 0.05);
-           display: inline-block;
-           max-width: 90%;
-           text-align: center;
-       }
-       .bitcoin-box p {
-           margin: 0 0 8px 0;
-           color: var(--muted);
-       }
-       .address-group {
-           display: flex;
-           align-items: center;
-           justify-content: center;
-           gap: 10px;
-           background: #120700;
-           padding: 8px 12px;
-           border-radius: 8px;
-           font-family: monospace;
-           overflow-x: auto;
-           max-width: 100%;
-       }
-       #bitcoin-address {
-           color: #b3ffb3; /* Light green for Bitcoin address */
-           font-size: 14px;
-           user-select: all;
-           word-break: break-all;
-           text-align: left;
-           flex-grow: 1;
-       }
-       .copy-btn {
-           background: var(--accent);
-           color: #2b0f00;
-           padding: 8px 12px;
-           border: none;
-           border-radius: 6px;
-           cursor: pointer;
-           font-weight: 700;
-           transition: background-color 0.1s, transform 0.1s;
-           flex-shrink: 0;
-       }
-       .copy-btn:active {
-           transform: scale(0.95);
-       }
-       .copy-btn:hover {
-           background: var(--accent-2);
-       }
-       @media (max-width: 480px) {
-           .content-box { padding: 20px; }
-           #bitcoin-address { font-size: 12px; }
-           .copy-btn { font-size: 12px; padding: 6px 10px; }
-       }
-   </style>
-</head>
-<body>
-   <img class="moon-img" src="{{ url_for('static', filename='moon.png') }}" alt="Melee at Night logo">
-
-
-   <div class="fixed-nav-header">
-       <nav class="nav-tabs" aria-label="Main navigation">
-           <a class="nav-tab" href="/">Home</a>
-           <a class="nav-tab" href="/schedule">Schedule</a>
-           <a class="nav-tab" href="/rankings">Rankings</a>
-           <a class="nav-tab support-tab active" href="/support">Support Us</a>
-       </nav>
-   </div>
-
-
+SUPPORT_HTML = """{% extends "base.html" %}
+{% set section = "support" %}
+{% block title %}Support{% endblock %}
+{% block content %}
    <div class="wrap" role="main">
        <div class="content-box">
            <h2>Support Melee at Night</h2>
@@ -605,66 +793,46 @@ SUPPORT_HTML = """<!doctype html>
            }
        }
    </script>
-</body>
-</html>
+{% endblock %}
 """
 
 
 # --- RANKINGS PAGE ---
-RANKINGS_HTML = """<!doctype html>
-<html lang="en">
-<head>
-   <meta charset="utf-8" />
-   <meta name="viewport" content="width=device-width,initial-scale=1" />
-   <title>Melee at Night | Rankings</title>
-   <style>
-       /* --- COMMON STYLES --- */
-       {{ COMMON_STYLES|safe }}
-       /* --- PAGE-SPECIFIC STYLES --- */
-       .content-box{
-           width:100%;
-           text-align:center;
-           padding: 40px 30px;
-           background:rgba(255,255,255,0.01);
-           border-radius:16px;
-           border:1px solid rgba(255,255,255,0.03);
-           box-shadow:0 12px 40px rgba(30,10,0,0.6);
-       }
-       h2{
-           margin:0 0 12px 0;
-           font-size:32px;
-           color:var(--accent);
-           text-align:center;
-       }
-       p {
-           color: var(--muted);
-           font-size: 16px;
-           line-height: 1.6;
-           margin: 0;
-       }
-   </style>
-</head>
-<body>
-   <img class="moon-img" src="{{ url_for('static', filename='moon.png') }}" alt="Melee at Night logo">
-
-
-   <div class="fixed-nav-header">
-       <nav class="nav-tabs" aria-label="Main navigation">
-           <a class="nav-tab" href="/">Home</a>
-           <a class="nav-tab" href="/schedule">Schedule</a>
-           <a class="nav-tab active" href="/rankings">Rankings</a>
-           <a class="nav-tab support-tab" href="/support">Support Us</a>
-       </nav>
-   </div>
-
-
+RANKINGS_HTML = """{% extends "base.html" %}
+{% set section = "rankings" %}
+{% block title %}Rankings{% endblock %}
+{% block content %}
    <div class="wrap" role="main">
        <div class="content-box">
            <h2>Rankings</h2>
+           {% if rankings %}
+           <table class="rankings-table">
+               <thead>
+                   <tr><th>#</th><th>Player</th><th>Rating</th><th>Sets</th></tr>
+               </thead>
+               <tbody>
+                   {%- for rank, tag, rating, rd, elo, wins, losses in rankings %}
+                   <tr>
+                       <td class="rank">{{ rank }}</td>
+                       <td><a href="{{ url_for('player', tag=tag) }}">{{ tag }}</a></td>
+                       <td>{{ rating|round|int }}<span class="rd">&plusmn;{{ (2 * rd)|round|int }}</span></td>
+                       <td>{{ wins }}-{{ losses }}</td>
+                   </tr>
+                   {%- endfor %}
+               </tbody>
+           </table>
+           {% if next_cursor %}
+           <p class="pager"><a href="{{ url_for('rankings', cursor=next_cursor, limit=page_limit) }}">Next page &rarr;</a></p>
+           {% endif %}
+           <br>
+           <p>Older rankings are in the external rankings document:</p>
+           <br>
+           {% else %}
            <p>This page is under construction. Check back soon!</p>
            <br>
            <p>For now, please see the external rankings document:</p>
            <br>
+           {% endif %}
            <a class="cta"
               href="https://docs.google.com/document/d/1tLmDPMMN1ocRrvV8Sj-9Ru2lFBkHMnHyj4rxaYmbujA/edit?tab=t.0"
               target="_blank"
@@ -673,11 +841,610 @@ RANKINGS_HTML = """<!doctype html>
            </a>
        </div>
    </div>
-</body>
-</html>
+{% endblock %}
 """
 
 
+# --- PLAYER PROFILE PAGE ---
+PLAYER_HTML = """{% extends "base.html" %}
+{% set section = "rankings" %}
+{% block title %}{{ player.tag }}{% endblock %}
+{% block content %}
+   <div class="wrap" role="main">
+       <div class="content-box">
+           <h2>{{ player.tag }}</h2>
+           <p class="player-summary">
+               Rank <strong>#{{ player.rank }}</strong>
+               &middot; Rating <strong>{{ player.rating|round|int }}</strong>&plusmn;{{ (2 * player.rd)|round|int }}
+               &middot; Sets <strong>{{ player.sets_won }}-{{ player.sets_lost }}</strong>
+           </p>
+
+           {% if player.placements %}
+           <h3>Recent placements</h3>
+           <table class="rankings-table">
+               <tbody>
+                   {%- for placement in player.placements[:10] %}
+                   <tr>
+                       <td class="rank">{{ placement.placement }}</td>
+                       <td>{{ placement.event or "Bracket" }}</td>
+                       <td>{{ placement.date or "" }}</td>
+                   </tr>
+                   {%- endfor %}
+               </tbody>
+           </table>
+           {% endif %}
+
+           {% if player.opponents %}
+           <h3>Head to head</h3>
+           <table class="rankings-table">
+               <thead>
+                   <tr><th>Opponent</th><th>Sets</th></tr>
+               </thead>
+               <tbody>
+                   {%- for opponent in player.opponents %}
+                   <tr>
+                       <td><a href="{{ url_for('player', tag=opponent.tag) }}">{{ opponent.tag }}</a></td>
+                       <td>{{ opponent.wins }}-{{ opponent.losses }}</td>
+                   </tr>
+                   {%- endfor %}
+               </tbody>
+           </table>
+           {% endif %}
+
+           {% if player.rating_history %}
+           <h3>Rating history</h3>
+           <table class="rankings-table">
+               <tbody>
+                   {%- for entry in player.rating_history[-10:]|reverse %}
+                   <tr>
+                       <td>{{ entry.date }}</td>
+                       <td>{{ entry.rating|round|int }}<span class="rd">&plusmn;{{ (2 * entry.rd)|round|int }}</span></td>
+                   </tr>
+                   {%- endfor %}
+               </tbody>
+           </table>
+           {% endif %}
+           <br>
+           <a class="cta" href="{{ url_for('rankings') }}">Back to Rankings</a>
+       </div>
+   </div>
+{% endblock %}
+"""
+
+
+
+
+# --- PAGE CACHE ---
+
+
+# The pages never change between requests, so each template is compiled once
+# at import and its rendered bytes are cached in `cache` under the versions of
+# everything they are rendered from (see render_page): the templates (part of
+# the cache generation), the asset manifest and, for the rankings, the results
+# log offset. Whichever worker renders a version first shares it with the rest.
+PAGE_TEMPLATES = {
+   "index": INDEX_HTML,
+   "schedule": SCHEDULE_HTML,
+   "rankings": RANKINGS_HTML,
+   "support": SUPPORT_HTML,
+   "player": PLAYER_HTML,
+}
+
+# Pieces of the layout shared by every page. Each is rendered once per key
+# (the page's section) and reused as-is by every page render (see fragment).
+FRAGMENT_TEMPLATES = {
+   "styles": "{{ stylesheets(section) }}",
+   "header": HEADER_HTML,
+   "footer": FOOTER_HTML,
+   "live": LIVE_SCRIPT,
+}
+
+# Pages extend "base.html"; every template is loaded as "<name>.html" so it is autoescaped
+app.jinja_loader = DictLoader({
+   f"{name}.html": source for name, source in {"base": BASE_HTML, **PAGE_TEMPLATES}.items()
+})
+
+_compiled_templates = {}
+_compiled_fragments = {}
+_fragments = {}
+_schedule_api = None
+_schedule_ics = None
+
+# Streamed pages are sent in chunks of about this many characters
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Templates call flush() where a streamed page should go out early; rendering
+# to a single body ignores it.
+app.jinja_env.globals["flush"] = lambda: ""
+
+# When the page content last changed. The templates live in this file, so its
+# mtime is the starting point; it is shared by every worker started from the
+# same checkout, which keeps If-Modified-Since consistent across workers.
+_pages_modified = int(os.path.getmtime(__file__))
+_assets_version = None
+
+
+class CachedBody:
+   """A response body plus its validators and precompressed variants, computed once per version.
+
+   `links` are the Link: rel=preload values for the assets a page references.
+   """
+
+   __slots__ = ("body", "mimetype", "etag", "last_modified", "variants", "links")
+
+   def __init__(self, body, mimetype, last_modified, links=()):
+      self.body = body
+      self.mimetype = mimetype
+      self.links = links
+      self.etag = hashlib.sha256(body).hexdigest()[:32]
+      self.last_modified = last_modified
+      self.variants = {}
+      if mimetype in assets.COMPRESSIBLE_MIMETYPES:
+         self.variants = assets.compress_variants(body)
+
+   def negotiate(self):
+      """Picks the variant the client rates highest, returning (encoding, body, etag).
+
+      Equal q-values go to the smaller variant (br, then gzip, then the plain body).
+      """
+      offered = [encoding for encoding in ("br", "gzip") if encoding in self.variants]
+      encoding = request.accept_encodings.best_match(offered + ["identity"])
+      if encoding in self.variants:
+         # each encoding is a different representation, so it needs its own strong ETag
+         return encoding, self.variants[encoding], f"{self.etag}-{encoding}"
+      return None, self.body, self.etag
+
+
+def send_cached(cached, cache_control, accept_ranges=False):
+   """Builds a response for a CachedBody, answering conditional (and optionally Range) GETs."""
+   encoding, body, etag = cached.negotiate()
+   response = Response(body, mimetype=cached.mimetype)
+   if encoding is not None:
+      response.headers["Content-Encoding"] = encoding
+   if cached.variants:
+      response.vary.add("Accept-Encoding")
+   response.set_etag(etag)
+   response.last_modified = cached.last_modified
+   response.headers["Cache-Control"] = cache_control
+   if cached.links and app.config["PRELOAD_LINKS"]:
+      response.headers["Link"] = ", ".join(cached.links)
+   # werkzeug compares If-None-Match first and only falls back to If-Modified-Since
+   return response.make_conditional(request, accept_ranges=accept_ranges, complete_length=len(body))
+
+
+def compile_templates():
+   """Compiles every page and fragment template and drops anything this process rendered with them."""
+   _compiled_templates.clear()
+   for name in PAGE_TEMPLATES:
+      _compiled_templates[name] = app.jinja_env.get_template(f"{name}.html")
+   _compiled_fragments.clear()
+   for name, source in FRAGMENT_TEMPLATES.items():
+      _compiled_fragments[name] = app.jinja_env.from_string(source)
+   _fragments.clear()
+   cached_page.cache_clear()
+
+
+def fragment(name, key=None):
+   """Returns a shared piece of the layout, rendered once per key, mount point and assets version."""
+   cache_key = (name, key, request.script_root, _assets_version)
+   entry = _fragments.get(cache_key)
+   metrics.count_cache("fragments", entry is not None)
+   if entry is None:
+      with assets.collect_preloads() as links:
+         html = Markup(_compiled_fragments[name].render(section=key, nav_tabs=NAV_TABS))
+      entry = _fragments[cache_key] = (html, links)
+   else:
+      # the page being rendered references the fragment's assets all the same
+      assets.add_preloads(entry[1])
+   return entry[0]
+
+
+app.jinja_env.globals["fragment"] = fragment
+
+
+def assets_version():
+   """Returns a digest of the asset URLs pages link to, which is part of every rendered page's key."""
+   parts = [
+      app.config["STYLES_MODE"],
+      str(app.config["MINIFY"]),
+      repr(sorted(assets.manifest.items())),
+      repr(sorted(assets.fingerprinted_files)),
+   ]
+   return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def invalidate_pages():
+   """Starts a new Last-Modified for pages rendered from now on and re-keys them on the current assets.
+
+   Nothing is dropped: pages are cached under the versions they were built
+   from, so once a version changes its old pages are simply never looked up.
+   """
+   global _pages_modified, _assets_version
+   _pages_modified = int(time.time())
+   _assets_version = assets_version()
+   # fragments for older assets versions can never be asked for again
+   _fragments.clear()
+
+
+def page_context(name):
+   """Returns the data a page template is rendered with."""
+   context = {"COMMON_STYLES": COMMON_STYLES}
+   if name == "schedule":
+      context["schedule_events"] = events.EVENTS
+      context["schedule_times"] = [event.time_label for event in events.EVENTS]
+      context["schedule_zone"] = "Eastern Time (ET)"
+      context["eastern"] = events.EASTERN.key
+      context["localized"] = False
+   elif name == "rankings":
+      page = StandingsPage(results.engine, 0, app.config["RANKINGS_LIMIT"])
+      context["rankings"] = list(page)
+      context["next_cursor"] = page.next_cursor
+      context["page_limit"] = None
+   return context
+
+
+def page_version(name):
+   """Returns a digest of everything a page's output depends on (used by `flask freeze`)."""
+   parts = [
+      BASE_HTML,
+      *FRAGMENT_TEMPLATES.values(),
+      PAGE_TEMPLATES[name],
+      repr(sorted(page_context(name).items())),
+      app.config["STYLES_MODE"],
+      str(app.config["MINIFY"]),
+      repr(sorted(assets.manifest.items())),
+      repr(sorted(assets.fingerprinted_files)),
+   ]
+   return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def render_body(name, context):
+   """Renders a compiled template into a CachedBody that knows the assets the page preloads."""
+   app.update_template_context(context)
+   started = time.perf_counter()
+   with assets.collect_preloads() as links:
+      html = _compiled_templates[name].render(context)
+   if app.config["MINIFY"]:
+      html = assets.minify_html(html)
+   body = html.encode("utf-8")
+   metrics.observe_render(time.perf_counter() - started)
+   return CachedBody(body, "text/html", _pages_modified, tuple(links.values()))
+
+
+@cache.memoize("pages", maxsize=64)
+def cached_page(name, script_root, assets_version, data_version):
+   """Renders page `name`; the other arguments only key the cache."""
+   return render_body(name, page_context(name))
+
+
+def render_page(name):
+   """Returns the CachedBody for `name`, rendering and compressing it only on a cache miss."""
+   # url_for output depends on where the app is mounted, so that is part of the key
+   data_version = results.offset if name == "rankings" else None
+   return cached_page(name, request.script_root, _assets_version, data_version)
+
+
+# The schedule in other zones: one rendered variant per (zone, DST period),
+# and few zones are ever asked for, so a small LRU holds them all
+SCHEDULE_ZONE_COOKIE = "tz"
+
+
+@cache.memoize("schedule_zones", maxsize=256)
+def localized_schedule(zone_key, period, script_root, assets_version):
+   """Renders the schedule page with its times in `zone_key`; `period` is from events.localized_times()."""
+   zone = events.find_zone(zone_key)
+   context = page_context("schedule")
+   context["schedule_times"], _ = events.localized_times(zone)
+   context["schedule_zone"] = events.zone_label(zone)
+   context["localized"] = True
+   return render_body("schedule", context)
+
+
+def stream_page(name, context):
+   """Streams a page template without building the whole document in memory.
+
+   Output goes out as soon as the template calls flush() (after the header and
+   nav), then in chunks of about STREAM_CHUNK_SIZE bytes. Clients that accept
+   gzip get one gzip stream, sync-flushed at every chunk.
+   """
+   flushed = []
+
+   def flush():
+      flushed.append(True)
+      return ""
+
+   context["flush"] = flush
+   app.update_template_context(context)
+   finish = assets.minify_html if app.config["MINIFY"] else (lambda html: html)
+
+   def chunks():
+      buffer, size = [], 0
+      # render time is what the generator spends between chunks, not the writes in between
+      rendering, resumed = 0.0, time.perf_counter()
+      for piece in _compiled_templates[name].generate(context):
+         buffer.append(piece)
+         size += len(piece)
+         if flushed or size >= STREAM_CHUNK_SIZE:
+            chunk = finish("".join(buffer)).encode("utf-8")
+            buffer, size = [], 0
+            flushed.clear()
+            rendering += time.perf_counter() - resumed
+            yield chunk
+            resumed = time.perf_counter()
+      chunk = finish("".join(buffer)).encode("utf-8")
+      metrics.observe_render(rendering + time.perf_counter() - resumed)
+      yield chunk
+
+   body = chunks()
+   response = Response(mimetype="text/html")
+   response.vary.add("Accept-Encoding")
+   if request.accept_encodings.best_match(["gzip", "identity"]) == "gzip":
+      body = gzip_stream(body)
+      response.headers["Content-Encoding"] = "gzip"
+   # ask buffering proxies (nginx) to pass chunks through as they come
+   response.headers["X-Accel-Buffering"] = "no"
+   response.response = stream_with_context(body)
+   return response
+
+
+def gzip_stream(chunks):
+   """Gzips a stream of byte chunks, flushing the compressor after each so none is held back."""
+   compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+   for chunk in chunks:
+      yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+   yield compressor.flush()
+
+
+# Player pages and API answers are per-argument, so each function has its own
+# bounded local tier. The results log offset is part of every key (it is the
+# same in every worker that has read the same results): new results make old
+# entries unreachable and they age out on their own.
+@cache.memoize("player", maxsize=1024)
+def render_player(tag, version, script_root, assets_version):
+   """Returns the CachedBody for a player's profile page, or None for an unknown tag."""
+   player = profiles.profile(results.engine, results.stats, tag)
+   if player is None:
+      return None
+   return render_body("player", {"player": player})
+
+
+@cache.memoize("h2h", maxsize=4096, shared=False)
+def head_to_head_json(a, b, version):
+   """Returns the CachedBody for an /api/h2h answer, or None if either tag is unknown."""
+   record = profiles.head_to_head(results.engine, results.stats, a, b)
+   if record is None:
+      return None
+   return CachedBody(json.dumps(record).encode("utf-8"), "application/json", _pages_modified)
+
+
+class StandingsPage:
+   """A window of the ladder, read lazily so a streamed page never holds every row."""
+
+   def __init__(self, engine, start, limit):
+      self.engine = engine
+      self.limit = limit
+      self.start = min(start, len(engine))
+      self.stop = min(self.start + limit, len(engine))
+
+   def __bool__(self):
+      return self.stop > self.start
+
+   def __iter__(self):
+      return self.engine.iter_standings(self.start, self.stop)
+
+   @property
+   def next_cursor(self):
+      """The cursor of the page after this one, or None on the last page."""
+      if self.stop >= len(self.engine):
+         return None
+      _, tag, rating, *_ = next(self.engine.iter_standings(self.stop - 1, self.stop))
+      return encode_cursor(tag, rating)
+
+
+def encode_cursor(tag, rating):
+   """An opaque cursor for "the rows after `tag`", which stays valid as ratings change."""
+   raw = json.dumps([tag, round(rating, 3)], ensure_ascii=False, separators=(",", ":"))
+   return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def rankings_window():
+   """Reads ?cursor= and ?limit= into a StandingsPage, aborting with 400 on a bad cursor."""
+   engine = results.engine
+   limit = request.args.get("limit", app.config["RANKINGS_LIMIT"], type=int)
+   limit = max(1, min(limit, app.config["RANKINGS_MAX_LIMIT"]))
+   cursor = request.args.get("cursor")
+   start = 0
+   if cursor:
+      try:
+         raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+         tag, rating = json.loads(raw)
+         start = engine.position_after(str(tag), float(rating))
+      except (binascii.Error, ValueError, TypeError):
+         abort(400, "Invalid cursor")
+   return StandingsPage(engine, start, limit)
+
+
+@cache.memoize("rankings_api", maxsize=1024)
+def rankings_json(start, limit, version, script_root):
+   """Returns the CachedBody for one /api/rankings page: rows as arrays, not objects."""
+   page = StandingsPage(results.engine, start, limit)
+   rows = [
+      [rank, tag, round(rating, 1), round(rd, 1), round(elo, 1), wins, losses]
+      for rank, tag, rating, rd, elo, wins, losses in page
+   ]
+   next_cursor = page.next_cursor
+   document = {
+      "version": version,
+      "total": len(results.engine),
+      "fields": ["rank", "tag", "rating", "rd", "elo", "wins", "losses"],
+      "rows": rows,
+      "next": next_cursor and url_for("api_rankings", cursor=next_cursor, limit=limit),
+   }
+   body = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+   return CachedBody(body, "application/json", _pages_modified)
+
+
+_player_index = None
+
+
+def player_index():
+   """Returns the search index for the current players, rebuilt only when the roster changes."""
+   global _player_index
+   engine = results.engine
+   key = (id(engine), len(engine.tags))
+   if _player_index is None or _player_index[0] != key:
+      aliases = search.load_aliases(app.config["PLAYER_ALIASES"])
+      _player_index = (key, search.PlayerIndex(engine.tags, aliases))
+   return _player_index[1]
+
+
+@cache.memoize("search", maxsize=4096, shared=False)
+def player_search_json(query, limit, version, script_root):
+   """Returns the CachedBody for an /api/players/search answer."""
+   engine = results.engine
+   matches = [
+      {
+         "tag": engine.tags[pid],
+         "rating": round(engine.rating(pid), 1),
+         "rank": engine.rank_of(pid),
+         "url": url_for("player", tag=engine.tags[pid]),
+      }
+      for pid in player_index().search(query, engine.mu, limit)
+   ]
+   body = json.dumps({"query": query, "results": matches}).encode("utf-8")
+   return CachedBody(body, "application/json", _pages_modified)
+
+
+def refresh_results():
+   """Catches up with the results log; pages built from the new results get a new Last-Modified."""
+   if results.refresh_if_due():
+      invalidate_pages()
+
+
+def serve_page(name):
+   """Builds the HTML response for a cached page."""
+   cache_control = app.config["PAGE_CACHE_CONTROL"].get(name, app.config["DEFAULT_CACHE_CONTROL"])
+   return send_cached(render_page(name), cache_control)
+
+
+STYLESHEETS = {
+   "common": COMMON_STYLES,
+   "index": INDEX_STYLES,
+   "schedule": SCHEDULE_STYLES,
+   "rankings": RANKINGS_STYLES,
+   "support": SUPPORT_STYLES,
+}
+assets.build_stylesheets(app, STYLESHEETS)
+assets.build_sprite(app, "icons", {
+   name: (view_box, "".join(paths)) for name, (view_box, paths) in SOCIAL_ICONS.items()})
+results = results_log.init_app(app)
+_assets_version = assets_version()
+compile_templates()
+freeze.on_manifest_change(invalidate_pages)
+metrics.register_lru("pages", cached_page)
+metrics.register_lru("schedule_zones", localized_schedule)
+metrics.register_lru("player_pages", render_player)
+metrics.register_lru("h2h", head_to_head_json)
+metrics.register_lru("search", player_search_json)
+metrics.register_lru("rankings_api", rankings_json)
+for _name in PAGE_TEMPLATES:
+   freeze.register_version(_name, functools.partial(page_version, _name))
+
+
+
+
+# --- STATIC FILES ---
+
+
+# Everything under static/ is indexed once at startup: small files are held in
+# memory with their ETag and compressed variants ready, larger ones keep their
+# precomputed metadata and are streamed through wsgi.file_wrapper, which
+# gunicorn turns into sendfile. Neither path opens or stats a file per request.
+app.config.setdefault("STATIC_MEMORY_LIMIT", 1024 * 1024)
+# Re-stat requested files and pick up new ones; defaults to on under the debugger
+app.config.setdefault("STATIC_WATCH", None)
+
+_static_files = {}
+
+
+class StaticFile:
+   """Metadata for one file under static/, plus its contents when it is small enough to hold."""
+
+   __slots__ = ("path", "mimetype", "version", "etag", "last_modified", "cached")
+
+   def __init__(self, path, stat):
+      self.path = path
+      self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+      self.version = (stat.st_mtime_ns, stat.st_size)
+      self.last_modified = int(stat.st_mtime)
+      self.cached = None
+      if stat.st_size <= app.config["STATIC_MEMORY_LIMIT"]:
+         with open(path, "rb") as f:
+            self.cached = CachedBody(f.read(), self.mimetype, self.last_modified)
+         self.etag = self.cached.etag
+      else:
+         # hashing a large file would cost more than it saves; mtime and size identify it
+         self.etag = "%x-%x" % self.version
+
+
+def load_static_file(filename):
+   """(Re)indexes one file under static/, returning None if it doesn't exist."""
+   path = safe_join(app.static_folder, filename)
+   try:
+      stat = os.stat(path) if path else None
+   except OSError:
+      stat = None
+   if stat is None or not os.path.isfile(path):
+      _static_files.pop(filename, None)
+      return None
+   entry = _static_files.get(filename)
+   if entry is None or entry.version != (stat.st_mtime_ns, stat.st_size):
+      entry = _static_files[filename] = StaticFile(path, stat)
+   return entry
+
+
+def load_static_files():
+   """Indexes every file under static/."""
+   _static_files.clear()
+   for root, _, files in os.walk(app.static_folder):
+      for name in files:
+         if not name.endswith(".tmp"):
+            filename = os.path.relpath(os.path.join(root, name), app.static_folder)
+            load_static_file(filename.replace(os.sep, "/"))
+
+
+@app.before_request
+def serve_static_file():
+   """Serves static/ from the startup index instead of Flask's per-request open and stat."""
+   if request.endpoint != "static":
+      return None
+   filename = request.view_args["filename"]
+   watch = app.config["STATIC_WATCH"]
+   if watch or (watch is None and app.debug):
+      entry = load_static_file(filename)
+   else:
+      entry = _static_files.get(filename)
+   if entry is None:
+      # unknown names fall through to Flask's own handler, which 404s them
+      return None
+   max_age = app.get_send_file_max_age(filename)
+   metrics.count_cache("static_memory", entry.cached is not None)
+   if entry.cached is not None:
+      cache_control = "public, max-age=%d" % max_age if max_age else "no-cache"
+      return send_cached(entry.cached, cache_control, accept_ranges=True)
+   return send_file(
+      entry.path,
+      request.environ,
+      mimetype=entry.mimetype,
+      etag=entry.etag,
+      last_modified=entry.last_modified,
+      max_age=max_age,
+   )
+
+
+load_static_files()
+
+
 
 
 # --- FLASK ROUTES ---
@@ -686,23 +1453,151 @@ RANKINGS_HTML = """<!doctype html>
 @app.route("/")
 def index():
    """Renders the main landing page."""
-   return render_template_string(INDEX_HTML, COMMON_STYLES=COMMON_STYLES)
+   return serve_page("index")
 
 
 
 
 @app.route("/schedule")
 def schedule():
-   """Renders the new schedule page."""
-   return render_template_string(SCHEDULE_HTML, COMMON_STYLES=COMMON_STYLES)
+   """Renders the schedule page, in the visitor's time zone when ?tz= or the tz cookie names one.
+
+   Every page is chosen by its URL alone, so shared caches can keep them: a tz
+   cookie for another zone redirects /schedule to /schedule?tz=<zone>. A valid
+   ?tz= that differs from the cookie is remembered in it, on a response no
+   shared cache may store. Eastern is the cached default page.
+   """
+   requested = request.args.get("tz")
+   remembered = request.cookies.get(SCHEDULE_ZONE_COOKIE)
+   if requested is None:
+      zone = events.find_zone(remembered)
+      if zone is None or zone.key == events.EASTERN.key:
+         return serve_page("schedule")
+      response = redirect(url_for("schedule", tz=zone.key))
+      # only this answer depends on the cookie
+      response.headers["Cache-Control"] = "private, no-cache"
+      response.vary.add("Cookie")
+      return response
+
+   zone = events.find_zone(requested)
+   if zone is None or zone.key == events.EASTERN.key:
+      response = serve_page("schedule")
+   else:
+      _, period = events.localized_times(zone)
+      page = localized_schedule(zone.key, period, request.script_root, _assets_version)
+      response = send_cached(page, app.config["PAGE_CACHE_CONTROL"].get(
+         "schedule_localized", app.config["DEFAULT_CACHE_CONTROL"]))
+   if zone is not None and zone.key != remembered:
+      response.set_cookie(SCHEDULE_ZONE_COOKIE, zone.key, max_age=365 * 86400, samesite="Lax")
+      # a shared cache must never replay someone's Set-Cookie to other visitors
+      response.headers["Cache-Control"] = "private, no-store"
+   return response
+
+
+
+
+@app.route("/api/schedule")
+def api_schedule():
+   """Returns the schedule, what's live and what's next as JSON, rebuilt only when that changes."""
+   global _schedule_api
+   now = time.time()
+   if _schedule_api is None or now >= _schedule_api[0]:
+      document, valid_until = events.schedule_document(now)
+      body = json.dumps(document, separators=(",", ":")).encode("utf-8")
+      _schedule_api = (valid_until, CachedBody(body, "application/json", int(now)))
+   valid_until, cached = _schedule_api
+   # never let a cache hold the answer past the next start or end
+   max_age = max(0, min(60, int(valid_until - now)))
+   return send_cached(cached, "public, max-age=%d" % max_age)
+
+
+
+
+@app.route("/schedule.ics")
+def schedule_ics():
+   """Serves the schedule as an iCalendar feed, serialized and compressed once per process."""
+   global _schedule_ics
+   if _schedule_ics is None:
+      # the schedule lives in events.py, so it changes exactly when that file does
+      modified = int(os.path.getmtime(events.__file__))
+      _schedule_ics = CachedBody(events.icalendar(modified).encode("utf-8"), "text/calendar", modified)
+   # calendar apps poll subscriptions every few minutes; almost every poll revalidates to a 304
+   return send_cached(_schedule_ics, app.config["PAGE_CACHE_CONTROL"].get(
+      "schedule_ics", app.config["DEFAULT_CACHE_CONTROL"]))
 
 
 
 
 @app.route("/rankings")
 def rankings():
-   """Renders the rankings page."""
-   return render_template_string(RANKINGS_HTML, COMMON_STYLES=COMMON_STYLES)
+   """Renders the rankings page; ?cursor= and ?limit= pages are streamed instead of cached."""
+   refresh_results()
+   if "cursor" not in request.args and "limit" not in request.args:
+      return serve_page("rankings")
+   page = rankings_window()
+   # the next page keeps an explicit ?limit=, like "next" in /api/rankings
+   page_limit = page.limit if "limit" in request.args else None
+   response = stream_page("rankings", {"rankings": page, "next_cursor": page.next_cursor, "page_limit": page_limit})
+   response.headers["Cache-Control"] = app.config["PAGE_CACHE_CONTROL"].get(
+      "rankings", app.config["DEFAULT_CACHE_CONTROL"])
+   return response
+
+
+
+
+@app.route("/api/rankings")
+def api_rankings():
+   """Returns one page of the ladder as compact JSON; follow "next" for the rest."""
+   refresh_results()
+   page = rankings_window()
+   cached = rankings_json(page.start, page.limit, results.offset, request.script_root)
+   return send_cached(
+      cached, app.config["PAGE_CACHE_CONTROL"].get("rankings_api", app.config["DEFAULT_CACHE_CONTROL"]))
+
+
+
+
+@app.route("/rankings/player/<path:tag>")
+def player(tag):
+   """Renders a player's profile: rating, placements and head-to-head records."""
+   refresh_results()
+   # the tag is free text from the URL; only real players may reach the shared cache tier
+   if tag not in results.engine.ids:
+      abort(404)
+   page = render_player(tag, results.offset, request.script_root, _assets_version)
+   if page is None:
+      abort(404)
+   return send_cached(page, app.config["PAGE_CACHE_CONTROL"].get("player", app.config["DEFAULT_CACHE_CONTROL"]))
+
+
+
+
+@app.route("/api/h2h")
+def api_h2h():
+   """Returns the set record between players ?a= and ?b= as JSON."""
+   a = request.args.get("a", "").strip()
+   b = request.args.get("b", "").strip()
+   if not a or not b:
+      abort(400, "Both ?a= and ?b= are required")
+   refresh_results()
+   cached = head_to_head_json(a, b, results.offset)
+   if cached is None:
+      abort(404, "Unknown player")
+   return send_cached(cached, app.config["PAGE_CACHE_CONTROL"].get("h2h", app.config["DEFAULT_CACHE_CONTROL"]))
+
+
+
+
+@app.route("/api/players/search")
+def api_player_search():
+   """Autocompletes player tags: ?q= prefix, optional ?limit= (at most search.MAX_RESULTS)."""
+   query = search.fold(request.args.get("q", ""))
+   if not query:
+      abort(400, "?q= is required")
+   limit = max(1, min(request.args.get("limit", 10, type=int), search.MAX_RESULTS))
+   refresh_results()
+   cached = player_search_json(query, limit, results.offset, request.script_root)
+   return send_cached(cached, app.config["PAGE_CACHE_CONTROL"].get("search", app.config["DEFAULT_CACHE_CONTROL"]))
 
 
 
@@ -710,14 +1605,66 @@ def rankings():
 @app.route("/support")
 def support():
    """Renders the custom support/donation page."""
-   return render_template_string(SUPPORT_HTML, COMMON_STYLES=COMMON_STYLES)
+   return serve_page("support")
+
+
+# Opt-in request profiling (PROFILE_ENABLED); it wraps the page views above
+profiler.init_app(app)
+
+
+
+
+# --- WARMUP ---
+
+
+def warmup():
+   """Fills every cache a first request would otherwise pay for; returns what it warmed.
+
+   gunicorn.conf.py calls this in the master after the preloaded import, so the
+   rendered pages and lookup tables are shared with every worker.
+   """
+   warmed = []
+   with app.test_request_context("/", headers={"Accept-Encoding": "br, gzip"}):
+      for name in ("index", "schedule", "rankings", "support"):
+         # the endpoints share the page names; their first requests get Early Hints too
+         assets.remember_preloads(name, render_page(name).links)
+         warmed.append(name)
+      api_schedule()
+      warmed.append("api_schedule")
+      schedule_ics()
+      warmed.append("schedule_ics")
+      rankings_json(0, app.config["RANKINGS_LIMIT"], results.offset, request.script_root)
+      warmed.append("api_rankings")
+      player_index()
+      warmed.append("player_index")
+   warmed.append(f"{len(_static_files)} static files")
+   return warmed
+
+
+def _weights(data):
+   """`data`'s size raw and in each transfer encoding, as 'raw / gzip / br' bytes."""
+   sizes = [len(data)] + [len(body) for body in assets.compress_variants(data).values()]
+   return " / ".join(f"{size:6d}" for size in sizes)
+
+
+@app.cli.command("page-weight")
+def page_weight_command():
+   """Print each page's and stylesheet's bytes (raw / gzip / br) before and after minifying."""
+   with app.test_request_context("/"):
+      for name in ("index", "schedule", "rankings", "support"):
+         context = page_context(name)
+         app.update_template_context(context)
+         html = _compiled_templates[name].render(context)
+         click.echo(f"{name + '.html':<14} {_weights(html.encode())}  ->  {_weights(assets.minify_html(html).encode())}")
+   for name, css in STYLESHEETS.items():
+      click.echo(f"{name + '.css':<14} {_weights(css.encode())}  ->  {_weights(assets.minify_css(css).encode())}")
 
 
 
 
 if __name__ == "__main__":
-   # For production use a real WSGI server; this is for local testing only
-   app.run(host="0.0.0.0", port=5000, debug=True)
+   # For production run gunicorn (see gunicorn.conf.py); this is for local testing only
+   app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=os.environ.get("FLASK_DEBUG") == "1")
 
 
 
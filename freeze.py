@@ -0,0 +1,184 @@
+"""`flask freeze`: exports every static route to a directory nginx or object storage can serve."""
+
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+
+import assets
+
+
+# Name of the manifest written at the top of the output directory
+MANIFEST_NAME = "manifest.json"
+
+# endpoint -> callable returning a string that changes whenever the endpoint's output would
+version_functions = {}
+
+# Called whenever freezing swaps the static manifest, so cached renders can be dropped
+manifest_listeners = []
+
+
+def register_version(endpoint, version):
+   """Lets the freezer skip re-rendering `endpoint` while `version()` is unchanged."""
+   version_functions[endpoint] = version
+
+
+def on_manifest_change(listener):
+   """Registers `listener()` to run when the freezer changes assets.manifest."""
+   manifest_listeners.append(listener)
+
+
+def _set_manifest(mapping):
+   assets.manifest.clear()
+   assets.manifest.update(mapping)
+   for listener in manifest_listeners:
+      listener()
+
+
+def _digest(data):
+   return hashlib.sha256(data).hexdigest()
+
+
+def _write(path, data):
+   os.makedirs(os.path.dirname(path), exist_ok=True)
+   assets._write_atomic(path, data)
+
+
+def _write_with_siblings(path, data, mimetype):
+   """Writes `data` plus .gz/.br siblings for compressible types (nginx gzip_static/brotli_static)."""
+   _write(path, data)
+   if mimetype in assets.COMPRESSIBLE_MIMETYPES:
+      suffixes = {"gzip": ".gz", "br": ".br"}
+      for encoding, compressed in assets.compress_variants(data).items():
+         _write(path + suffixes[encoding], compressed)
+
+
+def output_path(route, mimetype="text/html"):
+   """Maps a URL path to the file it is frozen into.
+
+   Pages become directory indexes (/schedule -> schedule/index.html); other
+   types get their extension so a static server sends the right Content-Type
+   (/api/rankings -> api/rankings.json). Paths that already name a file keep it.
+   """
+   route = route.strip("/")
+   if "." in route.rsplit("/", 1)[-1]:
+      return route
+   if mimetype == "text/html":
+      return f"{route}/index.html" if route else "index.html"
+   extension = mimetypes.guess_extension(mimetype)
+   if not route or extension is None:
+      raise click.ClickException(f"Don't know which file to freeze /{route} ({mimetype}) into")
+   return f"{route}{extension}"
+
+
+def freeze_static(app, out_dir):
+   """Copies static/ into the output under content-hashed names, returning logical -> hashed names."""
+   static_manifest = {}
+   for root, _, files in os.walk(app.static_folder):
+      for name in files:
+         source = os.path.join(root, name)
+         logical = os.path.relpath(source, app.static_folder).replace(os.sep, "/")
+         if name.endswith(".tmp") or logical in assets.manifest.values():
+            # generated sheets are already fingerprinted and are copied under their own name below
+            continue
+         with open(source, "rb") as f:
+            data = f.read()
+         if logical in assets.fingerprinted_files:
+            hashed = logical
+         else:
+            stem, ext = os.path.splitext(logical)
+            hashed = f"{stem}.{_digest(data)[:10]}{ext}"
+            static_manifest[logical] = hashed
+         target = os.path.join(out_dir, "static", hashed)
+         if not os.path.exists(target):
+            _write_with_siblings(target, data, mimetypes.guess_type(name)[0])
+   for logical, hashed in assets.manifest.items():
+      target = os.path.join(out_dir, "static", hashed)
+      if not os.path.exists(target):
+         with open(os.path.join(app.static_folder, hashed), "rb") as f:
+            _write_with_siblings(target, f.read(), mimetypes.guess_type(hashed)[0])
+      static_manifest[logical] = hashed
+   return static_manifest
+
+
+def freezable_rules(app):
+   """Yields the GET routes without URL arguments that are not excluded by FREEZE_SKIP."""
+   skip = set(app.config["FREEZE_SKIP"])
+   for rule in app.url_map.iter_rules():
+      if rule.endpoint == "static" or rule.endpoint in skip:
+         continue
+      if "GET" not in rule.methods or rule.arguments:
+         continue
+      yield rule
+
+
+def freeze(app, out_dir, force=False):
+   """Freezes the app into `out_dir`, re-rendering only routes whose version changed.
+
+   Returns a list of (path, "rendered" | "unchanged") pairs.
+   """
+   previous = {}
+   manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+   if not force and os.path.exists(manifest_path):
+      with open(manifest_path) as f:
+         previous = json.load(f).get("routes", {})
+
+   static_manifest = freeze_static(app, out_dir)
+   saved_manifest = dict(assets.manifest)
+   # every url_for('static', ...) rendered from here on points at a hashed file
+   _set_manifest({**saved_manifest, **static_manifest})
+   routes = {}
+   report = []
+   try:
+      client = app.test_client()
+      for rule in freezable_rules(app):
+         version_function = version_functions.get(rule.endpoint)
+         version = version_function() if version_function else None
+         entry = previous.get(rule.rule)
+         if (version is not None and entry and entry["version"] == version
+               and os.path.exists(os.path.join(out_dir, entry["file"]))):
+            routes[rule.rule] = entry
+            report.append((rule.rule, "unchanged"))
+            continue
+         response = client.get(rule.rule, headers={"Accept-Encoding": "identity"})
+         if response.status_code != 200:
+            raise click.ClickException(f"{rule.rule} returned {response.status_code}")
+         data = response.get_data()
+         target = output_path(rule.rule, response.mimetype)
+         _write_with_siblings(os.path.join(out_dir, target), data, response.mimetype)
+         routes[rule.rule] = {
+            "file": target,
+            "version": version,
+            "sha256": _digest(data),
+            "content_type": response.content_type,
+         }
+         report.append((rule.rule, "rendered"))
+   finally:
+      _set_manifest(saved_manifest)
+
+   with open(manifest_path, "w") as f:
+      json.dump({"static": static_manifest, "routes": routes}, f, indent=2, sort_keys=True)
+   return report
+
+
+def init_app(app):
+   """Registers the `flask freeze` command."""
+   app.config.setdefault("FREEZE_DIR", "build")
+   # Endpoints that stay dynamic and are never exported
+   app.config.setdefault("FREEZE_SKIP", [])
+
+   @app.cli.command("freeze")
+   @click.option("--out", "out_dir", default=None, help="Output directory (default: FREEZE_DIR).")
+   @click.option("--force", is_flag=True, help="Re-render every route even if unchanged.")
+   @click.option("--clean", is_flag=True, help="Delete the output directory first.")
+   def freeze_command(out_dir, force, clean):
+      """Export every static route to a directory for CDN/edge serving."""
+      out_dir = out_dir or app.config["FREEZE_DIR"]
+      if clean and os.path.isdir(out_dir):
+         shutil.rmtree(out_dir)
+      for path, status in freeze(app, out_dir, force=force):
+         click.echo(f"{status:>9}  {path}")
+      click.echo(f"Wrote {os.path.join(out_dir, MANIFEST_NAME)}")
@@ -0,0 +1,69 @@
+"""Production gunicorn settings; gunicorn reads this file from the working directory.
+
+Every setting can be overridden from the environment (the names below) or the
+gunicorn command line. The app is imported once in the master (preload_app)
+and warmed there, so the compiled templates, static index, rendered pages and
+ratings arrays are shared with every worker copy-on-write instead of being
+rebuilt per worker.
+
+Worker classes (GUNICORN_WORKER_CLASS):
+   sync     one request at a time per process; simplest, fine behind a buffering proxy
+   gthread  GUNICORN_THREADS threads per process; keeps idle keep-alive connections cheap
+   gevent   greenlets (needs `pip install gevent`); for many slow or long-lived clients
+"""
+
+import gc
+import multiprocessing
+import os
+
+
+def _int(name, default):
+   return int(os.environ.get(name, default))
+
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+
+# The usual 2 x cores + 1 for sync workers; threaded and async workers each
+# handle many connections, so one per core is enough
+_cores = multiprocessing.cpu_count()
+workers = _int("WEB_CONCURRENCY", 2 * _cores + 1 if worker_class == "sync" else _cores)
+threads = _int("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1)
+worker_connections = _int("GUNICORN_WORKER_CONNECTIONS", 1000)
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+timeout = _int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+
+# Recycle workers now and then so slow leaks can't accumulate; the jitter keeps
+# them from all restarting at once
+max_requests = _int("GUNICORN_MAX_REQUESTS", 5000)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", 500)
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG")
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def when_ready(server):
+   """Warms every cache in the master, after the preloaded import and before the first fork."""
+   if not preload_app:
+      return
+   import flask_app
+
+   warmed = flask_app.warmup()
+   server.log.info("Warmed %s", ", ".join(warmed))
+   # Objects that exist now live as long as the master; moving them out of the
+   # collector's generations stops gc passes in the workers from writing to
+   # (and so un-sharing) the pages that hold them.
+   gc.collect()
+   gc.freeze()
+
+
+def post_worker_init(worker):
+   """Without preload, each worker warms its own caches after loading the app, before it takes requests."""
+   if not preload_app:
+      import flask_app
+
+      flask_app.warmup()
@@ -0,0 +1,229 @@
+"""The /events Server-Sent Events channel: what's live, pushed to every open page.
+
+The Flask views run in sync workers where a request holds a thread or process.
+An open SSE connection would do the same for hours, so this channel runs as
+its own small asyncio service (aiohttp) in a single process. It sits alongside
+the gunicorn app, and the proxy sends /events there:
+
+   python live.py                     listens on LIVE_PORT (default 8001)
+
+One producer task works out every event's status with events.live_status().
+It wakes at the next registration, start or end, when an admin posts an
+update, or for a heartbeat. Each change is encoded once into an SSE message.
+An idle subscriber is one coroutine waiting on a shared asyncio.Event, with
+no queue of its own. When it wakes, it sends the latest message. A slow
+client that missed several changes jumps straight to the newest, because
+only the current status matters.
+
+   GET  /events          text/event-stream; "status" events with the live_status() document
+   GET  /events/status   the same document as JSON
+   POST /events/status   {"event": "daily", "status": "on_stream", "message": "..."}, needs
+                         "Authorization: Bearer $LIVE_ADMIN_TOKEN"; "status": null clears it
+
+The index and schedule pages subscribe with EventSource (LIVE_SCRIPT in
+flask_app.py) and show a badge for whatever is live. They open LIVE_EVENTS_URL,
+/events by default, on the site's own origin. The proxy sends that path here
+unbuffered and lets the connection stay open, e.g. for nginx:
+
+   location /events {
+      proxy_pass http://127.0.0.1:8001;
+      proxy_http_version 1.1;
+      proxy_set_header Connection "";
+      proxy_buffering off;
+      proxy_read_timeout 1h;
+   }
+
+Run one process only: admin updates live in its memory, and are lost (falling
+back to the times) on restart.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import time
+
+from aiohttp import web
+
+import events
+
+
+# Comment line sent when nothing changed for this long, so proxies keep the connection open
+HEARTBEAT_SECONDS = 20
+
+# Clients reconnect after this many milliseconds if the connection drops
+RETRY_MS = 5000
+
+HEARTBEAT = b": ping\n\n"
+
+LIVE = web.AppKey("live", object)
+ADMIN_TOKEN = web.AppKey("admin_token", object)
+
+
+def encode_event(name, document, event_id):
+   data = json.dumps(document, separators=(",", ":"))
+   return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n".encode("utf-8")
+
+
+class Broadcaster:
+   """Hands the latest status message to any number of subscribers.
+
+   `version` changes with every status; a wake-up without a new version is a
+   heartbeat. Subscribers compare versions, so none can miss the latest status.
+   """
+
+   def __init__(self):
+      self.message = None
+      self.version = 0
+      self.subscribers = 0
+      self._changed = asyncio.Event()
+
+   def _wake(self):
+      changed, self._changed = self._changed, asyncio.Event()
+      changed.set()
+
+   def publish(self, message):
+      self.message = message
+      self.version += 1
+      self._wake()
+
+   def heartbeat(self):
+      self._wake()
+
+   async def stream(self, write):
+      """Writes the current status, then every change and heartbeat, until the client goes away."""
+      self.subscribers += 1
+      sent = None
+      try:
+         while True:
+            changed = self._changed
+            if self.version != sent:
+               sent = self.version
+               await write(self.message)
+            else:
+               await write(HEARTBEAT)
+            await changed.wait()
+      finally:
+         self.subscribers -= 1
+
+
+class LiveStatus:
+   """The producer: owns the admin overrides and publishes each status change once."""
+
+   def __init__(self, broadcaster, heartbeat=HEARTBEAT_SECONDS):
+      self.broadcaster = broadcaster
+      self.heartbeat = heartbeat
+      self.overrides = {}
+      self.document = None
+      self._wake = asyncio.Event()
+
+   def refresh(self):
+      """Recomputes the statuses, publishing them if they changed; returns when they next change."""
+      document, valid_until = events.live_status(time.time(), self.overrides)
+      if document != self.document:
+         self.document = document
+         self.broadcaster.publish(encode_event("status", document, self.broadcaster.version + 1))
+      return valid_until
+
+   def update(self, key, status, message=None):
+      """Applies an admin update to event `key`'s current occurrence; status None clears it."""
+      if status is None:
+         self.overrides.pop(key, None)
+      else:
+         self.overrides[key] = {
+            "status": status,
+            "occurrence": events.current_occurrence(key),
+            "message": message,
+         }
+      self._wake.set()
+
+   async def run(self):
+      last_sent = time.monotonic()
+      while True:
+         version = self.broadcaster.version
+         valid_until = self.refresh()
+         if self.broadcaster.version != version:
+            last_sent = time.monotonic()
+         elif time.monotonic() - last_sent >= self.heartbeat:
+            self.broadcaster.heartbeat()
+            last_sent = time.monotonic()
+         # +0.01 s so a start or end time has passed when we look again
+         timeout = min(valid_until - time.time() + 0.01, last_sent + self.heartbeat - time.monotonic())
+         self._wake.clear()
+         try:
+            await asyncio.wait_for(self._wake.wait(), max(0.0, timeout))
+         except asyncio.TimeoutError:
+            pass
+
+
+async def stream_events(request):
+   live = request.app[LIVE]
+   response = web.StreamResponse(headers={
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-store",
+      "X-Accel-Buffering": "no",
+   })
+   await response.prepare(request)
+   await response.write(f"retry: {RETRY_MS}\n\n".encode("ascii"))
+   try:
+      await live.broadcaster.stream(response.write)
+   except ConnectionResetError:
+      pass
+   return response
+
+
+async def get_status(request):
+   return web.json_response(request.app[LIVE].document, headers={"Cache-Control": "no-store"})
+
+
+async def post_status(request):
+   token = request.app[ADMIN_TOKEN]
+   supplied = request.headers.get("Authorization", "")
+   if not token or not hmac.compare_digest(supplied, f"Bearer {token}"):
+      raise web.HTTPForbidden()
+   try:
+      update = await request.json()
+      key, status = update["event"], update.get("status")
+   except (ValueError, KeyError, TypeError):
+      raise web.HTTPBadRequest(text="Expected {\"event\": ..., \"status\": ...}")
+   if key not in {event.key for event in events.EVENTS}:
+      raise web.HTTPNotFound(text="Unknown event")
+   if status is not None and status not in events.STATUSES:
+      raise web.HTTPBadRequest(text=f"status must be one of {', '.join(events.STATUSES)} or null")
+   live = request.app[LIVE]
+   live.update(key, status, update.get("message"))
+   live.refresh()
+   return web.json_response(live.document)
+
+
+def create_app(admin_token=None, heartbeat=HEARTBEAT_SECONDS):
+   """The aiohttp application; its producer task runs for the app's lifetime."""
+   app = web.Application()
+   app[ADMIN_TOKEN] = admin_token if admin_token is not None else os.environ.get("LIVE_ADMIN_TOKEN")
+
+   async def producer(app):
+      live = app[LIVE] = LiveStatus(Broadcaster(), heartbeat)
+      live.refresh()
+      task = asyncio.create_task(live.run())
+      yield
+      task.cancel()
+
+   app.cleanup_ctx.append(producer)
+   app.router.add_get("/events", stream_events)
+   app.router.add_get("/events/status", get_status)
+   app.router.add_post("/events/status", post_status)
+   return app
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--host", default=os.environ.get("LIVE_HOST", "0.0.0.0"))
+   parser.add_argument("--port", type=int, default=int(os.environ.get("LIVE_PORT", 8001)))
+   args = parser.parse_args()
+   # open streams never finish on their own, so don't wait long for them on shutdown
+   web.run_app(create_app(), host=args.host, port=args.port, access_log=None, shutdown_timeout=1.0)
+
+
+if __name__ == "__main__":
+   main()
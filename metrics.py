@@ -0,0 +1,434 @@
+"""Per-route request metrics, shared across gunicorn workers, exposed at /metrics.
+
+Each worker counts into plain dicts under one lock (a few dict updates per
+request) and a background thread writes its cumulative totals to its own file
+in METRICS_DIR about once a second. A scrape sums every worker's file; files
+left behind by workers that have exited are folded into an archive file so
+counters never go backwards when gunicorn recycles workers.
+
+Timing is taken in a WSGI middleware around the Flask app. The request's
+latency runs until the response iterable is closed, so it includes writing the
+body; the write time is the part after the app returned. Template rendering is
+reported separately through observe_render().
+"""
+
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, abort, has_request_context, request
+
+try:
+   import fcntl
+except ImportError:  # not on Windows; single-process dev servers don't need the lock
+   fcntl = None
+
+
+# Metric names are PREFIX_<name>
+PREFIX = "man"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+ARCHIVE_NAME = "archive.json"
+
+# Request methods kept as their own label; anything else a client sends is "other",
+# so scanners can't create unbounded series
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"))
+
+# environ keys the Flask side leaves for the middleware
+ENDPOINT_KEY = "metrics.endpoint"
+
+_start_lock = threading.Lock()
+
+# Per-endpoint counters live in one flat list: latency buckets (with +Inf), size
+# buckets (with +Inf), then the latency, size and write-time sums
+SIZE_OFFSET = len(LATENCY_BUCKETS) + 1
+LATENCY_SUM = SIZE_OFFSET + len(SIZE_BUCKETS) + 1
+SIZE_SUM = LATENCY_SUM + 1
+WRITE_SUM = LATENCY_SUM + 2
+SERIES_LENGTH = LATENCY_SUM + 3
+
+
+class Metrics:
+   """One process's cumulative counters, histograms and cache statistics."""
+
+   def __init__(self, directory, flush_seconds=1.0):
+      self.directory = directory
+      self.flush_seconds = flush_seconds
+      self.pid = None
+      self._lru_caches = {}
+
+   def _start(self):
+      """Resets the counters for this process; runs again in every forked worker."""
+      self.pid = os.getpid()
+      self.path = os.path.join(self.directory, f"{self.pid}-{uuid.uuid4().hex[:8]}.json")
+      self.lock = threading.Lock()
+      self.requests = {}
+      self.series = {}
+      self.render = {}
+      self.cache = {}
+      self.dirty = False
+      self._written = None
+      thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+      thread.start()
+
+   def _ensure_started(self):
+      if self.pid != os.getpid():
+         with _start_lock:
+            if self.pid != os.getpid():
+               self._start()
+
+   def observe_request(self, endpoint, method, status, seconds, write_seconds, size):
+      self._ensure_started()
+      key = (endpoint, method, status)
+      latency_bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+      size_bucket = SIZE_OFFSET + bisect.bisect_left(SIZE_BUCKETS, size)
+      with self.lock:
+         self.requests[key] = self.requests.get(key, 0) + 1
+         series = self.series.get(endpoint)
+         if series is None:
+            series = self.series[endpoint] = [0] * SERIES_LENGTH
+         series[latency_bucket] += 1
+         series[LATENCY_SUM] += seconds
+         series[size_bucket] += 1
+         series[SIZE_SUM] += size
+         series[WRITE_SUM] += write_seconds
+         self.dirty = True
+
+   def observe_render(self, endpoint, seconds):
+      self._ensure_started()
+      with self.lock:
+         _add(self.render, endpoint, seconds)
+         self.dirty = True
+
+   def count_cache(self, name, hit):
+      self._ensure_started()
+      with self.lock:
+         key = (name, "hit" if hit else "miss")
+         self.cache[key] = self.cache.get(key, 0) + 1
+         self.dirty = True
+
+   def register_lru(self, name, function):
+      """Reports a functools.lru_cache's (or SharedCache.memoize's) hits and misses under `name`."""
+      self._lru_caches[name] = function
+
+   def snapshot(self):
+      """This process's totals as JSON-ready lists of (labels, values)."""
+      self._ensure_started()
+      with self.lock:
+         cache = dict(self.cache)
+         for name, function in self._lru_caches.items():
+            info = function.cache_info()
+            # hits answered from the cross-worker tier are reported as their own result
+            shared_hits = getattr(info, "shared_hits", 0)
+            cache[(name, "hit")] = cache.get((name, "hit"), 0) + info.hits - shared_hits
+            if shared_hits:
+               cache[(name, "shared_hit")] = cache.get((name, "shared_hit"), 0) + shared_hits
+            cache[(name, "miss")] = cache.get((name, "miss"), 0) + info.misses
+         series = list(self.series.items())
+         return {
+            "requests": [[list(key), value] for key, value in self.requests.items()],
+            "latency": [[key, values[:SIZE_OFFSET] + [values[LATENCY_SUM]]] for key, values in series],
+            "sizes": [[key, values[SIZE_OFFSET:LATENCY_SUM] + [values[SIZE_SUM]]] for key, values in series],
+            "write": [[key, [sum(values[:SIZE_OFFSET]), values[WRITE_SUM]]] for key, values in series],
+            "render": [[key, value] for key, value in self.render.items()],
+            "cache": [[list(key), value] for key, value in cache.items()],
+         }
+
+   def flush(self):
+      """Writes this process's totals to its file, unless they haven't changed since the last write."""
+      self.dirty = False
+      data = json.dumps(self.snapshot(), separators=(",", ":"))
+      if data == self._written:
+         return
+      os.makedirs(self.directory, exist_ok=True)
+      tmp = f"{self.path}.tmp"
+      with open(tmp, "w") as f:
+         f.write(data)
+      os.replace(tmp, self.path)
+      self._written = data
+
+   def _flush_loop(self):
+      pid = self.pid
+      while self.pid == pid:
+         time.sleep(self.flush_seconds)
+         if self.dirty or self._lru_caches:
+            try:
+               self.flush()
+            except OSError:
+               pass
+
+   def collect(self):
+      """Sums the files of every worker (and the archive of exited ones) into one snapshot."""
+      self.flush()
+      with _Locked(os.path.join(self.directory, ARCHIVE_NAME)):
+         archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+         archive = _read(archive_path) or {}
+         total = _merge({}, archive)
+         exited = []
+         for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name == ARCHIVE_NAME:
+               continue
+            path = os.path.join(self.directory, name)
+            data = _read(path)
+            if data is None:
+               continue
+            total = _merge(total, data)
+            if not _alive(int(name.split("-", 1)[0])):
+               archive = _merge(archive, data)
+               exited.append(path)
+         if exited:
+            tmp = f"{archive_path}.tmp"
+            with open(tmp, "w") as f:
+               json.dump(archive, f, separators=(",", ":"))
+            os.replace(tmp, archive_path)
+            for path in exited:
+               os.remove(path)
+      return total
+
+
+def _add(summaries, key, value):
+   """Adds `value` to the [count, sum] summary under `key`."""
+   summary = summaries.get(key)
+   if summary is None:
+      summary = summaries[key] = [0, 0.0]
+   summary[0] += 1
+   summary[1] += value
+
+
+def _merge(total, data):
+   """Returns `total` with every series of `data` added in."""
+   merged = {name: {_key(labels): value for labels, value in total.get(name, ())} for name in total}
+   for name, series in data.items():
+      target = merged.setdefault(name, {})
+      for labels, value in series:
+         key = _key(labels)
+         current = target.get(key)
+         if current is None:
+            target[key] = value
+         elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(current, value)]
+         else:
+            target[key] = current + value
+   return {name: [[list(key) if isinstance(key, tuple) else key, value] for key, value in series.items()]
+           for name, series in merged.items()}
+
+
+def _key(labels):
+   return tuple(labels) if isinstance(labels, list) else labels
+
+
+def _read(path):
+   try:
+      with open(path) as f:
+         return json.load(f)
+   except (OSError, ValueError):
+      return None
+
+
+def _alive(pid):
+   try:
+      os.kill(pid, 0)
+   except ProcessLookupError:
+      return False
+   except PermissionError:
+      return True
+   return True
+
+
+class _Locked:
+   """An exclusive flock so only one worker folds exited workers into the archive at a time."""
+
+   def __init__(self, path):
+      self.path = path + ".lock"
+
+   def __enter__(self):
+      if fcntl is None:
+         return self
+      self.f = open(self.path, "a")
+      fcntl.flock(self.f, fcntl.LOCK_EX)
+      return self
+
+   def __exit__(self, *exc):
+      if fcntl is not None:
+         fcntl.flock(self.f, fcntl.LOCK_UN)
+         self.f.close()
+
+
+def _label(value):
+   return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name, help_text, unit_buckets, series, label):
+   lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+   for key, values in sorted(series, key=lambda item: str(item[0])):
+      cumulative = 0
+      for bound, count in zip((*unit_buckets, "+Inf"), values[:-1]):
+         cumulative += count
+         lines.append(f'{name}_bucket{{{label}="{_label(key)}",le="{bound}"}} {cumulative}')
+      lines.append(f'{name}_sum{{{label}="{_label(key)}"}} {values[-1]}')
+      lines.append(f'{name}_count{{{label}="{_label(key)}"}} {cumulative}')
+   return lines
+
+
+def _summary_lines(name, help_text, series, label):
+   lines = [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+   for key, (count, total) in sorted(series, key=lambda item: str(item[0])):
+      lines.append(f'{name}_sum{{{label}="{_label(key)}"}} {total}')
+      lines.append(f'{name}_count{{{label}="{_label(key)}"}} {count}')
+   return lines
+
+
+def exposition(data):
+   """Renders a collected snapshot in the Prometheus text format (version 0.0.4)."""
+   lines = [
+      f"# HELP {PREFIX}_http_requests_total Requests by endpoint, method and status.",
+      f"# TYPE {PREFIX}_http_requests_total counter",
+   ]
+   for (endpoint, method, status), count in sorted(data.get("requests", ()), key=lambda item: str(item[0])):
+      lines.append(f'{PREFIX}_http_requests_total{{endpoint="{_label(endpoint)}",method="{_label(method)}",'
+                   f'status="{status}"}} {count}')
+   lines += _histogram_lines(f"{PREFIX}_http_request_duration_seconds",
+                             "Time from receiving a request to the last byte handed to the server.",
+                             LATENCY_BUCKETS, data.get("latency", ()), "endpoint")
+   lines += _histogram_lines(f"{PREFIX}_http_response_size_bytes", "Response body size as sent.",
+                             SIZE_BUCKETS, data.get("sizes", ()), "endpoint")
+   lines += _summary_lines(f"{PREFIX}_render_seconds", "Time spent rendering templates.",
+                           data.get("render", ()), "endpoint")
+   lines += _summary_lines(f"{PREFIX}_write_seconds", "Time spent writing the response body after the app returned.",
+                           data.get("write", ()), "endpoint")
+   lines += [
+      f"# HELP {PREFIX}_cache_requests_total Cache lookups by cache and result.",
+      f"# TYPE {PREFIX}_cache_requests_total counter",
+   ]
+   for (name, result), count in sorted(data.get("cache", ())):
+      lines.append(f'{PREFIX}_cache_requests_total{{cache="{_label(name)}",result="{result}"}} {count}')
+   return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+   """Times every request around the Flask app, including writing the response body."""
+
+   def __init__(self, wsgi_app, metrics):
+      self.wsgi_app = wsgi_app
+      self.metrics = metrics
+
+   def __call__(self, environ, start_response):
+      observed = _ObservedResponse(self.metrics, environ, start_response)
+      result = self.wsgi_app(environ, observed.start_response)
+      observed.returned = time.perf_counter()
+      file_wrapper = environ.get("wsgi.file_wrapper")
+      if isinstance(file_wrapper, type) and isinstance(result, file_wrapper):
+         # wrapping the iterable would stop gunicorn from using sendfile, so hook close() instead
+         observed.result_close = getattr(result, "close", None)
+         observed.sent = None
+         result.close = observed.close
+         return result
+      observed.result = result
+      return observed
+
+
+class _ObservedResponse:
+   """Passes a response through, counting its bytes and recording the request when it is closed."""
+
+   __slots__ = ("metrics", "environ", "server_start_response", "started", "returned",
+                "status", "headers", "result", "result_close", "sent")
+
+   def __init__(self, metrics, environ, start_response):
+      self.metrics = metrics
+      self.environ = environ
+      self.server_start_response = start_response
+      self.started = time.perf_counter()
+      self.status = "500"
+      self.headers = ()
+      self.result = ()
+      self.result_close = None
+      self.sent = 0
+
+   def start_response(self, status, headers, exc_info=None):
+      self.status = status
+      self.headers = headers
+      return self.server_start_response(status, headers, exc_info)
+
+   def __iter__(self):
+      for chunk in self.result:
+         self.sent += len(chunk)
+         yield chunk
+
+   def close(self):
+      try:
+         close = self.result_close or getattr(self.result, "close", None)
+         if close is not None:
+            close()
+      finally:
+         finished = time.perf_counter()
+         size = self.sent
+         if size is None:
+            size = next((int(value) for name, value in self.headers if name.lower() == "content-length"), 0)
+         method = self.environ.get("REQUEST_METHOD", "GET")
+         self.metrics.observe_request(
+            self.environ.get(ENDPOINT_KEY) or "unmatched",
+            method if method in HTTP_METHODS else "other",
+            int(self.status[:3]),
+            finished - self.started,
+            finished - self.returned,
+            size,
+         )
+
+
+_metrics = None
+
+
+def observe_render(seconds):
+   """Attributes template render time to the current request's endpoint."""
+   if _metrics is not None and has_request_context():
+      _metrics.observe_render(request.endpoint or "unmatched", seconds)
+
+
+def count_cache(name, hit):
+   if _metrics is not None:
+      _metrics.count_cache(name, hit)
+
+
+def register_lru(name, function):
+   if _metrics is not None:
+      _metrics.register_lru(name, function)
+
+
+def init_app(app):
+   """Wraps the app in the metrics middleware and registers /metrics; a no-op when METRICS_ENABLED is off."""
+   global _metrics
+   app.config.setdefault("METRICS_ENABLED", True)
+   app.config.setdefault("METRICS_DIR", os.environ.get(
+      "METRICS_DIR", os.path.join(app.root_path, "data", "metrics")))
+   # When set, scrapes must send "Authorization: Bearer <token>"
+   app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN"))
+   app.config.setdefault("METRICS_FLUSH_SECONDS", 1.0)
+   if not app.config["METRICS_ENABLED"]:
+      return None
+   _metrics = Metrics(app.config["METRICS_DIR"], app.config["METRICS_FLUSH_SECONDS"])
+   app.wsgi_app = MetricsMiddleware(app.wsgi_app, _metrics)
+   app.config["FREEZE_SKIP"].append("metrics")
+
+   @app.before_request
+   def note_endpoint():
+      request.environ[ENDPOINT_KEY] = request.endpoint
+
+   @app.route("/metrics")
+   def metrics():
+      """Prometheus scrape endpoint, summed over every worker."""
+      token = app.config["METRICS_TOKEN"]
+      if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+         abort(403)
+      body = exposition(_metrics.collect())
+      response = Response(body, mimetype="text/plain")
+      response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+      response.headers["Cache-Control"] = "no-store"
+      return response
+
+   return _metrics
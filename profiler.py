@@ -0,0 +1,244 @@
+"""Opt-in profiling of individual page requests, written as pstats and collapsed stacks.
+
+Nothing is installed unless PROFILE_ENABLED is set, so a normal deployment
+runs the views untouched. When enabled, the views named in PROFILE_ENDPOINTS
+are wrapped. A request is profiled if it carries the admin token in an
+X-Profile-Token header (never the query string, which ends up in access
+logs and browser history) or if it is one of every PROFILE_SAMPLE_RATE
+requests. Each profile is written to PROFILE_DIR:
+
+   <time>-<endpoint>-<pid>.pstats      cProfile mode; open with pstats or snakeviz
+   <time>-<endpoint>-<pid>.collapsed   "a;b;c count" lines for flamegraph.pl / speedscope
+
+"cprofile" mode traces every call and derives the collapsed stacks from its
+call graph. "sampling" mode only records the view thread's stack every
+PROFILE_INTERVAL seconds, which costs far less but yields no pstats file and
+needs real threads (not gevent greenlets). The listing at /_profiles needs the
+same token.
+
+Only the view function itself is profiled; pages streamed after the view
+returns (paginated /rankings) are not covered.
+"""
+
+import cProfile
+import collections
+import datetime
+import functools
+import hmac
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+
+from flask import abort, current_app, jsonify, request, send_from_directory
+
+
+PROFILE_EXTENSIONS = (".pstats", ".collapsed")
+
+# Frames deeper than this are cut off in the derived stacks
+MAX_DEPTH = 64
+
+
+def _frame_label(filename, line, name):
+   return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def _stats_label(func):
+   """Labels a pstats function key; built-ins have the pseudo-filename "~"."""
+   return func[2] if func[0] == "~" else _frame_label(*func)
+
+
+def collapse_frame(frame):
+   """Returns a frame's stack as "outer;...;inner" labels."""
+   labels = []
+   while frame is not None:
+      code = frame.f_code
+      labels.append(_frame_label(code.co_filename, frame.f_lineno, code.co_name))
+      frame = frame.f_back
+   return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+   """Samples one thread's stack at a fixed interval from a helper thread."""
+
+   def __init__(self, interval):
+      self.interval = interval
+      self.stacks = collections.Counter()
+
+   def __enter__(self):
+      self.thread_id = threading.get_ident()
+      self._stop = threading.Event()
+      self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+      self._thread.start()
+      return self
+
+   def __exit__(self, *exc):
+      self._stop.set()
+      self._thread.join()
+
+   def _run(self):
+      while not self._stop.wait(self.interval):
+         frame = sys._current_frames().get(self.thread_id)
+         if frame is not None:
+            self.stacks[collapse_frame(frame)] += 1
+
+   def collapsed(self):
+      return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def collapsed_from_stats(stats):
+   """Turns a pstats.Stats call graph into collapsed stacks weighted in microseconds.
+
+   cProfile keeps only caller -> callee edges, not whole stacks, so each
+   function's own time is split across the paths into it in proportion to the
+   cumulative time of each incoming edge.
+   """
+   table = stats.stats
+   callees = collections.defaultdict(list)
+   for func, (_, _, _, _, callers) in table.items():
+      for caller, edge in callers.items():
+         callees[caller].append((func, edge[3]))
+   stacks = collections.Counter()
+
+   def walk(func, path, share):
+      own = table[func][2]
+      path = path + [_stats_label(func)]
+      if own * share > 0:
+         stacks[";".join(path)] += own * share
+      if len(path) >= MAX_DEPTH:
+         return
+      for callee, edge_time in callees.get(func, ()):
+         callee_total = table[callee][3]
+         if callee_total <= 0 or _stats_label(callee) in path:
+            continue
+         walk(callee, path, share * edge_time / callee_total)
+
+   for func, (_, _, _, _, callers) in table.items():
+      if not callers:
+         walk(func, [], 1.0)
+   return "".join(f"{stack} {round(seconds * 1e6)}\n"
+                  for stack, seconds in stacks.most_common() if round(seconds * 1e6) > 0)
+
+
+class Profiler:
+   """Decides which requests to profile, runs them under a profiler and writes the output."""
+
+   def __init__(self, directory, token=None, sample_rate=0, mode="cprofile", interval=0.001, keep=200):
+      self.directory = directory
+      self.token = token
+      self.sample_rate = sample_rate
+      self.mode = mode
+      self.interval = interval
+      self.keep = keep
+      self._counter = itertools.count(1)
+
+   def authorized(self):
+      """Whether the current request carries the admin token."""
+      supplied = request.headers.get("X-Profile-Token")
+      return bool(self.token and supplied) and hmac.compare_digest(supplied, self.token)
+
+   def wanted(self):
+      if self.sample_rate and next(self._counter) % self.sample_rate == 0:
+         return True
+      return self.authorized()
+
+   def wrap(self, endpoint, view):
+      @functools.wraps(view)
+      def profiled_view(*args, **kwargs):
+         if not self.wanted():
+            return view(*args, **kwargs)
+         return self.run(endpoint, view, args, kwargs)
+      return profiled_view
+
+   def run(self, endpoint, view, args, kwargs):
+      stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+      base = os.path.join(self.directory, f"{stamp}-{endpoint}-{os.getpid()}")
+      os.makedirs(self.directory, exist_ok=True)
+      started = time.perf_counter()
+      if self.mode == "sampling":
+         with SamplingProfiler(self.interval) as sampler:
+            response = view(*args, **kwargs)
+         collapsed = sampler.collapsed()
+      else:
+         profile = cProfile.Profile()
+         response = profile.runcall(view, *args, **kwargs)
+         profile.dump_stats(base + ".pstats")
+         collapsed = collapsed_from_stats(pstats.Stats(profile))
+      with open(base + ".collapsed", "w") as f:
+         f.write(collapsed)
+      self.prune()
+      response = current_app.make_response(response)
+      response.headers["X-Profile"] = os.path.basename(base)
+      response.headers["X-Profile-Time"] = f"{(time.perf_counter() - started) * 1000:.1f}ms"
+      return response
+
+   def listing(self):
+      """Profiles newest first as [{"name", "files", "bytes", "modified"}]."""
+      try:
+         names = os.listdir(self.directory)
+      except FileNotFoundError:
+         return []
+      profiles = {}
+      for name in names:
+         stem, ext = os.path.splitext(name)
+         if ext not in PROFILE_EXTENSIONS:
+            continue
+         stat = os.stat(os.path.join(self.directory, name))
+         entry = profiles.setdefault(stem, {"name": stem, "files": [], "bytes": 0, "modified": 0})
+         entry["files"].append(name)
+         entry["bytes"] += stat.st_size
+         entry["modified"] = max(entry["modified"], int(stat.st_mtime))
+      return sorted(profiles.values(), key=lambda entry: entry["name"], reverse=True)
+
+   def prune(self):
+      """Deletes the oldest profiles beyond `keep`."""
+      for entry in self.listing()[self.keep:]:
+         for name in entry["files"]:
+            try:
+               os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+               pass
+
+
+def init_app(app):
+   """Wraps the configured views when PROFILE_ENABLED is set; otherwise does nothing at all.
+
+   Call it after the views are registered.
+   """
+   app.config.setdefault("PROFILE_ENABLED", os.environ.get("PROFILE_ENABLED") == "1")
+   app.config.setdefault("PROFILE_TOKEN", os.environ.get("PROFILE_TOKEN"))
+   # Profile one in every N requests to the wrapped views; 0 turns sampling off
+   app.config.setdefault("PROFILE_SAMPLE_RATE", 0)
+   app.config.setdefault("PROFILE_MODE", "cprofile")
+   app.config.setdefault("PROFILE_INTERVAL", 0.001)
+   app.config.setdefault("PROFILE_DIR", os.path.join(app.root_path, "data", "profiles"))
+   app.config.setdefault("PROFILE_KEEP", 200)
+   app.config.setdefault("PROFILE_ENDPOINTS", ["index", "schedule", "rankings", "support"])
+   if not app.config["PROFILE_ENABLED"]:
+      return None
+
+   profiler = Profiler(
+      app.config["PROFILE_DIR"],
+      app.config["PROFILE_TOKEN"],
+      app.config["PROFILE_SAMPLE_RATE"],
+      app.config["PROFILE_MODE"],
+      app.config["PROFILE_INTERVAL"],
+      app.config["PROFILE_KEEP"],
+   )
+   app.config["FREEZE_SKIP"].append("profiles")
+   for endpoint in app.config["PROFILE_ENDPOINTS"]:
+      app.view_functions[endpoint] = profiler.wrap(endpoint, app.view_functions[endpoint])
+
+   @app.route("/_profiles", endpoint="profiles")
+   @app.route("/_profiles/<path:name>", endpoint="profile_file")
+   def profiles(name=None):
+      """Lists the saved profiles, or downloads one file; both need the admin token."""
+      if not profiler.authorized():
+         abort(403)
+      if name is None:
+         return jsonify(profiles=profiler.listing())
+      return send_from_directory(profiler.directory, name, as_attachment=True)
+
+   return profiler
@@ -0,0 +1,126 @@
+"""Head-to-head records, placements and per-player profiles built alongside the ratings.
+
+Everything is keyed by the RatingsEngine's compact player ids and updated as
+each batch of sets arrives, so a head-to-head lookup is two dict hits no
+matter how much history there is.
+"""
+
+import numpy as np
+
+from ratings import PlayerRows
+
+
+# Head-to-head keys pack (player id, opponent id) into one int: player << 32 | opponent
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+
+class PlayerStats:
+   """A sparse head-to-head matrix plus each player's placements.
+
+   The matrix is a dict from a packed (player, opponent) key to the number of
+   sets the player won in that pairing, so both directions of a record are
+   one dict lookup each. Listing a player's opponents uses a sorted key array
+   built on first use after a change.
+   """
+
+   def __init__(self):
+      self.wins = {}
+      self.placements = PlayerRows(("date", "event", "placement"))
+      self._opponents = None
+
+   def add_sets(self, engine, sets):
+      """Counts each set for its winner; the engine must already know every tag."""
+      ids = engine.ids
+      wins = self.wins
+      for row in sets:
+         key = ids[row.winner] << PAIR_SHIFT | ids[row.loser]
+         wins[key] = wins.get(key, 0) + 1
+      self._opponents = None
+
+   def add_placements(self, engine, placements):
+      """Records (date, event, tag, placement) rows for players the engine knows."""
+      rows = [(engine.ids[tag], date or "", event or "", placement)
+              for date, event, tag, placement in placements if tag in engine.ids]
+      if rows:
+         pid, date, event, placement = zip(*rows)
+         self.placements.append(pid, date=np.array(date, dtype=str), event=np.array(event, dtype=str),
+                                placement=np.array(placement, dtype=np.int32))
+
+   def record(self, a, b):
+      """Returns (a's set wins, a's set losses) against b."""
+      return self.wins.get(a << PAIR_SHIFT | b, 0), self.wins.get(b << PAIR_SHIFT | a, 0)
+
+   def opponents(self, pid):
+      """Returns {opponent id: (wins, losses)} for everyone `pid` has played."""
+      if self._opponents is None:
+         keys = np.fromiter(self.wins, dtype=np.int64, count=len(self.wins))
+         winners = keys >> PAIR_SHIFT
+         losers = keys & PAIR_MASK
+         players = np.concatenate([winners, losers])
+         others = np.concatenate([losers, winners])
+         order = np.argsort(players, kind="stable")
+         self._opponents = (players[order], others[order])
+      players, others = self._opponents
+      lo, hi = np.searchsorted(players, [pid, pid + 1])
+      return {opponent: self.record(pid, opponent) for opponent in np.unique(others[lo:hi]).tolist()}
+
+   def to_arrays(self):
+      """The matrix in COO form (packed key, wins) plus the placement columns."""
+      arrays = {
+         "h2h_keys": np.fromiter(self.wins, dtype=np.int64, count=len(self.wins)),
+         "h2h_wins": np.fromiter(self.wins.values(), dtype=np.int32, count=len(self.wins)),
+      }
+      for name, values in self.placements.arrays().items():
+         arrays[f"placement_{name}"] = values
+      return arrays
+
+   @classmethod
+   def from_arrays(cls, arrays):
+      stats = cls()
+      stats.wins = dict(zip(arrays["h2h_keys"].tolist(), arrays["h2h_wins"].tolist()))
+      if len(arrays["placement_pid"]):
+         stats.placements.append(arrays["placement_pid"], **{
+            name: arrays[f"placement_{name}"] for name in stats.placements.columns})
+      return stats
+
+
+def profile(engine, stats, tag, opponents=10):
+   """Returns a player's profile as a dict, or None for an unknown tag."""
+   pid = engine.ids.get(tag)
+   if pid is None:
+      return None
+   records = sorted(stats.opponents(pid).items(), key=lambda item: -(item[1][0] + item[1][1]))
+   placements = stats.placements.rows(pid)
+   return {
+      "tag": tag,
+      "rank": engine.rank_of(pid),
+      "rating": round(engine.rating(pid), 1),
+      "rd": round(engine.rd(pid), 1),
+      "elo": round(float(engine.elo[pid]), 1),
+      "sets_won": int(engine.wins[pid]),
+      "sets_lost": int(engine.losses[pid]),
+      "placements": [
+         {"date": date or None, "event": event or None, "placement": placement}
+         for date, event, placement in reversed(list(zip(
+            placements["date"].tolist(), placements["event"].tolist(), placements["placement"].tolist())))
+      ],
+      "rating_history": [
+         {"date": period, "rating": round(rating, 1), "rd": round(rd, 1)}
+         for period, rating, rd in engine.rating_history(pid)
+      ],
+      "opponents": [
+         {"tag": engine.tags[opponent], "wins": record[0], "losses": record[1]}
+         for opponent, record in records[:opponents]
+      ],
+   }
+
+
+def head_to_head(engine, stats, a, b):
+   """Returns the a-vs-b record as a dict, or None if either tag is unknown."""
+   a_id = engine.ids.get(a)
+   b_id = engine.ids.get(b)
+   if a_id is None or b_id is None:
+      return None
+   wins, losses = stats.record(a_id, b_id)
+   return {"a": a, "b": b, "a_wins": wins, "b_wins": losses, "sets": wins + losses}
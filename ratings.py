@@ -0,0 +1,457 @@
+"""Glicko-2 (and Elo) ratings computed from local tournament result exports.
+
+Every set played on the same (Eastern) day forms one rating period. A period is
+applied to all players at once with NumPy: per-set terms are gathered by player
+index and summed with bincount, and the Glicko-2 volatility iteration runs on
+whole arrays. Ratings are kept between calls, so adding last night's bracket
+only processes that bracket's sets.
+"""
+
+import collections
+import csv
+import datetime
+import json
+
+import numpy as np
+
+from events import EASTERN
+
+
+# Glicko-2 constants (see Glickman, "Example of the Glicko-2 system")
+SCALE = 173.7178
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+DEFAULT_VOLATILITY = 0.06
+TAU = 0.5
+EPSILON = 1e-6
+MAX_PHI = DEFAULT_RD / SCALE
+
+ELO_K = 32.0
+
+ResultSet = collections.namedtuple(
+   "ResultSet", "date event winner loser winner_score loser_score", defaults=(None, None))
+
+
+def _period_of(value):
+   """Turns an ISO date or datetime (or a Unix timestamp) into its Eastern calendar day."""
+   if isinstance(value, (int, float)):
+      return datetime.datetime.fromtimestamp(value, EASTERN).date().isoformat()
+   value = str(value)
+   if len(value) == 10:
+      return value
+   moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+   if moment.tzinfo is not None:
+      moment = moment.astimezone(EASTERN)
+   return moment.date().isoformat()
+
+
+def _score(value):
+   return None if value in (None, "") else int(value)
+
+
+def _result_set(row, date=None, event=None):
+   """Builds a ResultSet from a JSON object or CSV row, or None for DQs and byes."""
+   winner = (row.get("winner") or "").strip()
+   loser = (row.get("loser") or "").strip()
+   loser_score = _score(row.get("loser_score"))
+   if not winner or not loser or winner == loser or (loser_score is not None and loser_score < 0):
+      return None
+   return ResultSet(
+      _period_of(row.get("date") or date),
+      row.get("event") or event,
+      winner,
+      loser,
+      _score(row.get("winner_score")),
+      loser_score,
+   )
+
+
+def load_result_file(path):
+   """Reads the sets from one export.
+
+   JSON files hold either a list of sets or a bracket object with "event",
+   "date" and "sets"; CSV files need date, winner and loser columns. Sets are
+   objects/rows with winner, loser and optional scores; DQs (negative loser
+   score) are skipped.
+   """
+   if path.endswith(".csv"):
+      with open(path, newline="", encoding="utf-8") as f:
+         rows = [_result_set(row) for row in csv.DictReader(f)]
+   else:
+      with open(path, encoding="utf-8") as f:
+         data = json.load(f)
+      if isinstance(data, dict):
+         rows = [_result_set(row, data.get("date"), data.get("event")) for row in data.get("sets", [])]
+      else:
+         rows = [_result_set(row) for row in data]
+   return [row for row in rows if row is not None]
+
+
+def load_placements(path):
+   """Reads final placements from a JSON bracket export as (date, event, tag, placement) rows.
+
+   Brackets list them as "placements": [{"tag": ..., "placement": ...}, ...];
+   CSV exports and plain set lists carry none.
+   """
+   if not path.endswith(".json"):
+      return []
+   with open(path, encoding="utf-8") as f:
+      data = json.load(f)
+   if not isinstance(data, dict):
+      return []
+   date = _period_of(data["date"]) if data.get("date") else None
+   return [
+      (date, data.get("event"), row["tag"].strip(), int(row["placement"]))
+      for row in data.get("placements", [])
+      if row.get("tag") and row.get("placement")
+   ]
+
+
+def _g(phi):
+   return 1.0 / np.sqrt(1.0 + 3.0 * phi * phi / (np.pi * np.pi))
+
+
+def _volatility(delta, phi, v, sigma, tau):
+   """Step 5 of Glicko-2 (the Illinois iteration) for many players at once."""
+   a = np.log(sigma * sigma)
+   d2 = delta * delta
+   p2v = phi * phi + v
+
+   def f(x):
+      ex = np.exp(x)
+      return ex * (d2 - p2v - ex) / (2.0 * (p2v + ex) ** 2) - (x - a) / (tau * tau)
+
+   A = a.copy()
+   big = d2 > p2v
+   B = np.where(big, np.log(np.where(big, d2 - p2v, 1.0)), a - tau)
+   # players without the big-delta shortcut step B down until f(B) >= 0
+   while True:
+      stepping = ~big & (f(B) < 0)
+      if not stepping.any():
+         break
+      B[stepping] -= tau
+
+   fA = f(A)
+   fB = f(B)
+   active = np.abs(B - A) > EPSILON
+   for _ in range(100):
+      if not active.any():
+         break
+      with np.errstate(divide="ignore", invalid="ignore"):
+         C = np.where(active, A + (A - B) * fA / (fB - fA), B)
+      fC = f(C)
+      swap = active & (fC * fB <= 0)
+      A = np.where(swap, B, A)
+      fA = np.where(swap, fB, np.where(active, fA / 2.0, fA))
+      B = np.where(active, C, B)
+      fB = np.where(active, fC, fB)
+      active = np.abs(B - A) > EPSILON
+   return np.exp(A / 2.0)
+
+
+def glicko2_period(mu, phi, sigma, winners, losers, tau=TAU):
+   """Applies one rating period of sets to every player, returning new (mu, phi, sigma) arrays.
+
+   `winners` and `losers` are player index arrays, one entry per set. Players
+   without a set in the period only have their deviation grow.
+   """
+   n = len(mu)
+   player = np.concatenate([winners, losers])
+   opponent = np.concatenate([losers, winners])
+   outcome = np.concatenate([np.ones(len(winners)), np.zeros(len(losers))])
+
+   g = _g(phi[opponent])
+   expected = 1.0 / (1.0 + np.exp(-g * (mu[player] - mu[opponent])))
+   v_inv = np.bincount(player, weights=g * g * expected * (1.0 - expected), minlength=n)
+   improvement = np.bincount(player, weights=g * (outcome - expected), minlength=n)
+
+   new_mu = mu.copy()
+   new_phi = np.minimum(np.sqrt(phi * phi + sigma * sigma), MAX_PHI)
+   new_sigma = sigma.copy()
+
+   played = np.flatnonzero(v_inv > 0)
+   v = 1.0 / v_inv[played]
+   new_sigma[played] = _volatility(v * improvement[played], phi[played], v, sigma[played], tau)
+   phi_star = np.sqrt(phi[played] ** 2 + new_sigma[played] ** 2)
+   new_phi[played] = 1.0 / np.sqrt(1.0 / (phi_star * phi_star) + 1.0 / v)
+   new_mu[played] = mu[played] + new_phi[played] ** 2 * improvement[played]
+   return new_mu, new_phi, new_sigma
+
+
+def elo_period(ratings, winners, losers, k=ELO_K):
+   """Applies one period of sets to Elo ratings, all from the pre-period ratings."""
+   expected = 1.0 / (1.0 + 10.0 ** ((ratings[losers] - ratings[winners]) / 400.0))
+   change = k * (1.0 - expected)
+   n = len(ratings)
+   return ratings + np.bincount(winners, weights=change, minlength=n) - np.bincount(losers, weights=change, minlength=n)
+
+
+class PlayerRows:
+   """Rows of per-player data kept as appended column chunks.
+
+   Appending is a list append of whole arrays; the first lookup after a change
+   concatenates the chunks and sorts them by player once, after which a
+   player's rows are a binary search away.
+   """
+
+   def __init__(self, columns):
+      self.columns = columns
+      self._chunks = []
+      self._index = None
+
+   def __len__(self):
+      return sum(len(chunk["pid"]) for chunk in self._chunks)
+
+   def append(self, pid, **values):
+      self._chunks.append({"pid": np.asarray(pid, dtype=np.int32), **{k: np.asarray(v) for k, v in values.items()}})
+      self._index = None
+
+   def truncate(self, length):
+      """Drops every row after the first `length`."""
+      if len(self) > length:
+         self._chunks = [{name: values[:length] for name, values in self.arrays().items()}]
+         self._index = None
+
+   def arrays(self):
+      """All rows as one array per column (in append order)."""
+      if not self._chunks:
+         return {name: np.zeros(0) for name in ("pid", *self.columns)}
+      if len(self._chunks) > 1:
+         self._chunks = [{name: np.concatenate([chunk[name] for chunk in self._chunks])
+                          for name in self._chunks[0]}]
+      return self._chunks[0]
+
+   def rows(self, pid):
+      """Returns one array per column holding `pid`'s rows, oldest first."""
+      if self._index is None:
+         arrays = self.arrays()
+         order = np.argsort(arrays["pid"], kind="stable")
+         self._index = (arrays["pid"][order], {name: arrays[name][order] for name in self.columns})
+      pids, columns = self._index
+      lo, hi = np.searchsorted(pids, [pid, pid + 1])
+      return {name: values[lo:hi] for name, values in columns.items()}
+
+
+class RatingsEngine:
+   """Player ratings, updated one rating period (day) at a time.
+
+   Players get compact integer ids in order of first appearance; all per-player
+   state lives in arrays indexed by those ids.
+   """
+
+   STATE = ("mu", "phi", "sigma", "elo", "wins", "losses")
+
+   def __init__(self, tau=TAU, elo=True):
+      self.tau = tau
+      self.with_elo = elo
+      self.tags = []
+      self.ids = {}
+      self.mu = np.zeros(0)
+      self.phi = np.zeros(0)
+      self.sigma = np.zeros(0)
+      self.elo = np.zeros(0)
+      self.wins = np.zeros(0, dtype=np.int64)
+      self.losses = np.zeros(0, dtype=np.int64)
+      self.last_period = None
+      # state before last_period and that period's sets, so a late bracket from
+      # the same day re-runs one period instead of the whole history
+      self._before_last = None
+      self._history_before_last = 0
+      self._last_sets = []
+      # each player's rating after every period they played in
+      self.periods = []
+      self.history = PlayerRows(("period", "rating", "rd"))
+      self.version = 0
+      self._ranks = None
+
+   def __len__(self):
+      return len(self.tags)
+
+   def player_id(self, tag):
+      """Returns the id for `tag`, registering a new player at the default rating."""
+      pid = self.ids.get(tag)
+      if pid is None:
+         pid = self.ids[tag] = len(self.tags)
+         self.tags.append(tag)
+      return pid
+
+   def _grow(self):
+      extra = len(self.tags) - len(self.mu)
+      if extra <= 0:
+         return
+      self.mu = np.concatenate([self.mu, np.zeros(extra)])
+      self.phi = np.concatenate([self.phi, np.full(extra, MAX_PHI)])
+      self.sigma = np.concatenate([self.sigma, np.full(extra, DEFAULT_VOLATILITY)])
+      self.elo = np.concatenate([self.elo, np.full(extra, DEFAULT_RATING)])
+      self.wins = np.concatenate([self.wins, np.zeros(extra, dtype=np.int64)])
+      self.losses = np.concatenate([self.losses, np.zeros(extra, dtype=np.int64)])
+
+   def _save(self):
+      return {name: getattr(self, name).copy() for name in self.STATE}
+
+   def _restore(self, saved):
+      for name, values in saved.items():
+         # players first seen in the rolled-back period keep their slot at defaults
+         grown = getattr(self, name)
+         grown[:len(values)] = values
+         if name in ("mu", "wins", "losses"):
+            grown[len(values):] = 0
+         elif name == "phi":
+            grown[len(values):] = MAX_PHI
+         elif name == "sigma":
+            grown[len(values):] = DEFAULT_VOLATILITY
+         else:
+            grown[len(values):] = DEFAULT_RATING
+
+   def _apply(self, period, sets):
+      winners = np.fromiter((self.ids[row.winner] for row in sets), dtype=np.int64, count=len(sets))
+      losers = np.fromiter((self.ids[row.loser] for row in sets), dtype=np.int64, count=len(sets))
+      self.mu, self.phi, self.sigma = glicko2_period(self.mu, self.phi, self.sigma, winners, losers, self.tau)
+      if self.with_elo:
+         self.elo = elo_period(self.elo, winners, losers)
+      n = len(self.mu)
+      self.wins += np.bincount(winners, minlength=n)
+      self.losses += np.bincount(losers, minlength=n)
+      if not self.periods or self.periods[-1] != period:
+         self.periods.append(period)
+      played = np.unique(np.concatenate([winners, losers]))
+      self.history.append(
+         played,
+         # history is display-only, so it is stored compactly
+         period=np.full(len(played), len(self.periods) - 1, dtype=np.int32),
+         rating=(SCALE * self.mu[played] + DEFAULT_RATING).astype(np.float32),
+         rd=(SCALE * self.phi[played]).astype(np.float32),
+      )
+
+   def rating_history(self, pid):
+      """Returns [(period, rating, rd), ...] for every period `pid` played in."""
+      rows = self.history.rows(pid)
+      return [(self.periods[i], rating, rd)
+              for i, rating, rd in zip(rows["period"].tolist(), rows["rating"].tolist(), rows["rd"].tolist())]
+
+   def add_sets(self, sets):
+      """Adds result sets, processing only the periods they touch.
+
+      Returns False (and changes nothing) if a set predates the most recent
+      period; the caller must then rebuild from the full history.
+      """
+      if not sets:
+         return True
+      periods = collections.defaultdict(list)
+      for row in sets:
+         periods[row.date].append(row)
+      first = min(periods)
+      if self.last_period is not None and first < self.last_period:
+         return False
+      for row in sets:
+         self.player_id(row.winner)
+         self.player_id(row.loser)
+      self._grow()
+      for period in sorted(periods):
+         rows = periods[period]
+         if period == self.last_period:
+            self._restore(self._before_last)
+            self.history.truncate(self._history_before_last)
+            rows = self._last_sets + rows
+         else:
+            self._before_last = self._save()
+            self._history_before_last = len(self.history)
+         self._apply(period, rows)
+         self.last_period = period
+         self._last_sets = rows
+      self.version += 1
+      return True
+
+   def to_arrays(self):
+      """Returns the engine state as a dict of NumPy arrays (no Python objects, so no pickling)."""
+      arrays = {name: getattr(self, name) for name in self.STATE}
+      arrays["tags"] = np.array(self.tags, dtype=str)
+      arrays["last_period"] = np.array(self.last_period or "", dtype=str)
+      arrays["params"] = np.array([self.tau, float(self.with_elo), float(self.version)])
+      arrays["periods"] = np.array(self.periods, dtype=str)
+      for name, values in self.history.arrays().items():
+         arrays[f"history_{name}"] = values
+      if self._before_last is not None:
+         for name, values in self._before_last.items():
+            arrays[f"before_{name}"] = values
+         arrays["before_history"] = np.array(self._history_before_last)
+         arrays["last_winners"] = np.array([self.ids[row.winner] for row in self._last_sets], dtype=np.int64)
+         arrays["last_losers"] = np.array([self.ids[row.loser] for row in self._last_sets], dtype=np.int64)
+      return arrays
+
+   @classmethod
+   def from_arrays(cls, arrays):
+      """Rebuilds an engine from the output of to_arrays."""
+      tau, with_elo, version = arrays["params"]
+      engine = cls(tau=float(tau), elo=bool(with_elo))
+      engine.version = int(version)
+      engine.tags = arrays["tags"].tolist()
+      engine.ids = {tag: pid for pid, tag in enumerate(engine.tags)}
+      for name in cls.STATE:
+         setattr(engine, name, np.array(arrays[name]))
+      engine.last_period = str(arrays["last_period"]) or None
+      engine.periods = arrays["periods"].tolist()
+      if len(arrays["history_pid"]):
+         engine.history.append(arrays["history_pid"], **{
+            name: arrays[f"history_{name}"] for name in engine.history.columns})
+      if "last_winners" in arrays:
+         engine._before_last = {name: np.array(arrays[f"before_{name}"]) for name in cls.STATE}
+         engine._history_before_last = int(arrays["before_history"])
+         engine._last_sets = [
+            ResultSet(engine.last_period, None, engine.tags[w], engine.tags[l])
+            for w, l in zip(arrays["last_winners"].tolist(), arrays["last_losers"].tolist())
+         ]
+      return engine
+
+   def rating(self, pid):
+      return float(SCALE * self.mu[pid] + DEFAULT_RATING)
+
+   def rd(self, pid):
+      return float(SCALE * self.phi[pid])
+
+   def _ranking(self):
+      """Returns (order, ranks): player ids best first and each player's 1-based rank, once per version."""
+      if self._ranks is None or self._ranks[0] != self.version:
+         order = np.argsort(-(SCALE * self.mu + DEFAULT_RATING), kind="stable")
+         ranks = np.empty(len(order), dtype=np.int64)
+         ranks[order] = np.arange(1, len(order) + 1)
+         self._ranks = (self.version, order, ranks)
+      return self._ranks[1], self._ranks[2]
+
+   def rank_of(self, pid):
+      """Returns a player's position in standings(), ranking everyone once per ratings version."""
+      return int(self._ranking()[1][pid])
+
+   def iter_standings(self, start=0, stop=None):
+      """Yields standings() rows for positions start..stop (0-based), building one row at a time."""
+      order = self._ranking()[0][start:stop].tolist()
+      for rank, pid in enumerate(order, start=start + 1):
+         yield (rank, self.tags[pid], self.rating(pid), self.rd(pid),
+                float(self.elo[pid]), int(self.wins[pid]), int(self.losses[pid]))
+
+   def position_after(self, tag, rating):
+      """Returns the position a page resumes at after `tag`, last seen rated `rating`.
+
+      That is just past the player's current rank; if the tag is unknown, just
+      past everyone rated at least `rating`.
+      """
+      pid = self.ids.get(tag)
+      if pid is not None:
+         return self.rank_of(pid)
+      order = self._ranking()[0]
+      descending = SCALE * self.mu[order] + DEFAULT_RATING
+      return int(np.searchsorted(-descending, -rating, side="right"))
+
+   def standings(self, min_sets=1, limit=None):
+      """Returns rows of (rank, tag, rating, rd, elo, wins, losses), best rating first."""
+      played = self.wins + self.losses
+      rating = SCALE * self.mu + DEFAULT_RATING
+      eligible = np.flatnonzero(played >= min_sets)
+      order = eligible[np.argsort(-rating[eligible], kind="stable")]
+      if limit is not None:
+         order = order[:limit]
+      return [
+         (rank, self.tags[pid], float(rating[pid]), float(SCALE * self.phi[pid]),
+          float(self.elo[pid]), int(self.wins[pid]), int(self.losses[pid]))
+         for rank, pid in enumerate(order, start=1)
+      ]
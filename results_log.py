@@ -0,0 +1,316 @@
+"""Append-only tournament results log with compact snapshots of the derived ratings.
+
+The log is the source of truth for every result the site has imported. Each
+record is one export file's sets, framed as
+
+   <u32 payload length> <u32 CRC-32 of payload> <JSON payload>
+
+so a torn write at the tail is detected and ignored. Snapshots store the
+RatingsEngine arrays (np.savez, no pickling) together with the log offset they
+cover; a worker boots by loading the snapshot and replaying only the records
+written after it.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import click
+import numpy as np
+
+from profiles import PlayerStats
+from ratings import RatingsEngine, ResultSet, load_placements, load_result_file
+from startgg import SyncDatabase
+
+try:
+   import fcntl
+except ImportError:  # not on Windows; single-process dev servers don't need the lock
+   fcntl = None
+
+
+HEADER = struct.Struct("<II")
+
+# Result exports picked up from the import directory
+RESULT_EXTENSIONS = (".json", ".csv")
+
+
+class ResultsLog:
+   """Reads and appends checksummed records in a single log file."""
+
+   def __init__(self, path):
+      self.path = path
+
+   def append(self, record):
+      """Appends one record and fsyncs it; returns the offset just past it."""
+      payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+      os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+      with open(self.path, "ab") as f:
+         f.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+         f.flush()
+         os.fsync(f.fileno())
+         return f.tell()
+
+   def read(self, offset=0, end=None):
+      """Yields (offset after record, record) from `offset`, stopping at a torn or corrupt record."""
+      try:
+         f = open(self.path, "rb")
+      except FileNotFoundError:
+         return
+      with f:
+         f.seek(offset)
+         while end is None or offset < end:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+               return
+            length, checksum = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+               return
+            offset += HEADER.size + length
+            yield offset, json.loads(payload)
+
+   def truncate(self, offset):
+      """Drops a torn tail left by a writer that died mid-append."""
+      with open(self.path, "r+b") as f:
+         f.truncate(offset)
+
+   def size(self):
+      try:
+         return os.path.getsize(self.path)
+      except FileNotFoundError:
+         return 0
+
+
+def save_snapshot(path, engine, stats, offset, sources):
+   """Atomically writes the engine and stats arrays plus the log position they reflect."""
+   arrays = engine.to_arrays()
+   arrays.update(stats.to_arrays())
+   arrays["meta"] = np.array(json.dumps({"offset": offset, "sources": sources}), dtype=str)
+   buffer = io.BytesIO()
+   np.savez(buffer, **arrays)
+   tmp = f"{path}.{os.getpid()}.tmp"
+   with open(tmp, "wb") as f:
+      f.write(buffer.getvalue())
+      f.flush()
+      os.fsync(f.fileno())
+   os.replace(tmp, path)
+
+
+def load_snapshot(path):
+   """Returns (engine, stats, offset, sources) from a snapshot, or None if it is missing or unreadable."""
+   try:
+      with np.load(path, allow_pickle=False) as data:
+         arrays = {name: data[name] for name in data.files}
+      meta = json.loads(str(arrays.pop("meta")))
+      # a snapshot from an older layout is missing arrays; replaying the log rebuilds it
+      return RatingsEngine.from_arrays(arrays), PlayerStats.from_arrays(arrays), meta["offset"], meta["sources"]
+   except (OSError, ValueError, KeyError, zlib.error):
+      return None
+
+
+class _Locked:
+   """An exclusive flock on the log so only one worker appends or snapshots at a time."""
+
+   def __init__(self, path):
+      self.path = path + ".lock"
+
+   def __enter__(self):
+      if fcntl is None:
+         return self
+      os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+      self.f = open(self.path, "a")
+      fcntl.flock(self.f, fcntl.LOCK_EX)
+      return self
+
+   def __exit__(self, *exc):
+      if fcntl is not None:
+         fcntl.flock(self.f, fcntl.LOCK_UN)
+         self.f.close()
+
+
+class ResultsStore:
+   """Ratings backed by the results log, kept current across every worker.
+
+   refresh() replays records other workers appended, then imports any export
+   file in `import_dir`, and any event in the start.gg database at `sync_db`,
+   that is new or changed since it was last logged. Records are keyed by source
+   (file name or synced event); a record that replaces an earlier source
+   or predates the current ratings triggers a rebuild from the whole log.
+   An export that can't be read is logged to `logger` and retried on every
+   refresh until it is fixed.
+   """
+
+   def __init__(self, log_path, snapshot_path, import_dir=None, poll_seconds=30, snapshot_every=50,
+                sync_db=None, logger=None):
+      self.log = ResultsLog(log_path)
+      self.logger = logger or logging.getLogger(__name__)
+      self.snapshot_path = snapshot_path
+      self.import_dir = import_dir
+      self.sync_db = sync_db
+      self.poll_seconds = poll_seconds
+      self.snapshot_every = snapshot_every
+      self.engine = RatingsEngine()
+      self.stats = PlayerStats()
+      self.offset = 0
+      self.sources = {}
+      self._unsnapshotted = 0
+      self._checked = 0.0
+      self._lock = threading.Lock()
+
+   def load(self):
+      """Boots from the latest snapshot, then replays the log tail written after it."""
+      with self._lock:
+         snapshot = load_snapshot(self.snapshot_path)
+         if snapshot is not None and snapshot[2] <= self.log.size():
+            self.engine, self.stats, self.offset, self.sources = snapshot
+         self._replay()
+
+   def _rebuild(self, end):
+      """Recomputes ratings and stats from every record up to `end`, keeping the latest per source."""
+      latest = {}
+      for _, record in self.log.read(0, end):
+         latest[record["source"]] = record
+      sets = [ResultSet(*row) for record in latest.values() for row in record["sets"]]
+      sets.sort(key=lambda row: row.date)
+      engine = RatingsEngine()
+      engine.add_sets(sets)
+      engine.version = self.engine.version + 1
+      stats = PlayerStats()
+      stats.add_sets(engine, sets)
+      for record in latest.values():
+         stats.add_placements(engine, record.get("placements", []))
+      self.engine = engine
+      self.stats = stats
+
+   def _replay(self):
+      """Applies records appended since self.offset; returns how many there were."""
+      count = 0
+      for end, record in self.log.read(self.offset):
+         sets = [ResultSet(*row) for row in record["sets"]]
+         replaces = record["source"] in self.sources
+         self.sources[record["source"]] = record["version"]
+         if replaces or not self.engine.add_sets(sets):
+            self._rebuild(end)
+         else:
+            self.stats.add_sets(self.engine, sets)
+            self.stats.add_placements(self.engine, record.get("placements", []))
+         self.offset = end
+         count += 1
+      self._unsnapshotted += count
+      return count
+
+   def _scan(self):
+      try:
+         names = sorted(name for name in os.listdir(self.import_dir) if name.endswith(RESULT_EXTENSIONS))
+      except (FileNotFoundError, TypeError):
+         return {}
+      found = {}
+      for name in names:
+         stat = os.stat(os.path.join(self.import_dir, name))
+         found[name] = [stat.st_mtime_ns, stat.st_size]
+      return found
+
+   def _import_synced(self):
+      """Logs synced start.gg events that are new or were updated since they were logged."""
+      if not self.sync_db or not os.path.exists(self.sync_db):
+         return
+      # runs inside web requests, so read only: the sync process owns the schema and writes
+      with SyncDatabase(self.sync_db, read_only=True) as db:
+         try:
+            completed = db.completed_events()
+         except sqlite3.OperationalError:
+            # the sync created the file but not its tables yet; look again next refresh
+            return
+         for source, version in completed.items():
+            if self.sources.get(source) != version:
+               self.append(source, version, *db.event_results(source))
+
+   def _import_file(self, name, version):
+      """Logs one export file; a malformed (or half-uploaded) one is skipped and left unrecorded."""
+      path = os.path.join(self.import_dir, name)
+      try:
+         sets, placements = load_result_file(path), load_placements(path)
+      except (ValueError, KeyError, TypeError, AttributeError, OSError, csv.Error) as exc:
+         self.logger.warning("Skipping result file %s until it can be read: %s", name, exc)
+         return
+      self.append(name, version, sets, placements)
+
+   def append(self, source, version, sets, placements=()):
+      """Logs one batch of sets (and final placements) under `source`, e.g. an export file name."""
+      self.log.append({
+         "source": source,
+         "version": version,
+         "sets": [list(row) for row in sets],
+         "placements": [list(row) for row in placements],
+      })
+
+   def refresh(self, snapshot=False):
+      """Catches up with the log and imports new exports; returns True if the ratings changed.
+
+      snapshot=True also writes a snapshot, under the same lock, whether or not
+      snapshot_every records have built up.
+      """
+      with self._lock:
+         self._checked = time.monotonic()
+         before = self.engine.version
+         with _Locked(self.log.path):
+            self._replay()
+            if self.log.size() > self.offset:
+               self.log.truncate(self.offset)
+            for name, version in self._scan().items():
+               if self.sources.get(name) != version:
+                  self._import_file(name, version)
+            self._import_synced()
+            self._replay()
+            if snapshot or self._unsnapshotted >= self.snapshot_every:
+               self.snapshot()
+         return self.engine.version != before
+
+   def refresh_if_due(self):
+      """Like refresh, but at most once every poll_seconds."""
+      if time.monotonic() - self._checked < self.poll_seconds:
+         return False
+      return self.refresh()
+
+   def snapshot(self):
+      """Writes a snapshot covering everything replayed so far."""
+      save_snapshot(self.snapshot_path, self.engine, self.stats, self.offset, self.sources)
+      self._unsnapshotted = 0
+
+
+def init_app(app):
+   """Creates the app's ResultsStore from config, boots it and registers its CLI commands."""
+   data_dir = os.path.join(app.root_path, "data")
+   app.config.setdefault("RESULTS_LOG", os.path.join(data_dir, "results.log"))
+   app.config.setdefault("RESULTS_SNAPSHOT", os.path.join(data_dir, "results.snapshot.npz"))
+   app.config.setdefault("RESULTS_SNAPSHOT_EVERY", 50)
+   store = ResultsStore(
+      app.config["RESULTS_LOG"],
+      app.config["RESULTS_SNAPSHOT"],
+      app.config["RESULTS_DIR"],
+      app.config["RESULTS_POLL_SECONDS"],
+      app.config["RESULTS_SNAPSHOT_EVERY"],
+      app.config.get("STARTGG_DB"),
+      app.logger,
+   )
+   started = time.perf_counter()
+   store.load()
+   store.refresh()
+   app.logger.info("Loaded %d players from the results log in %.0f ms",
+                   len(store.engine), (time.perf_counter() - started) * 1000)
+
+   @app.cli.command("snapshot-results")
+   def snapshot_results_command():
+      """Write a ratings snapshot covering the whole results log."""
+      # refresh() takes the log lock itself; taking it here too would deadlock on its flock
+      store.refresh(snapshot=True)
+      click.echo(f"Snapshot of {len(store.engine)} players at log offset {store.offset}")
+
+   return store
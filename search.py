@@ -0,0 +1,72 @@
+"""Prefix search over player tags for the autocomplete endpoint.
+
+Every tag is indexed under its folded form (case and diacritics removed) and,
+for sponsored tags like "TEAM | Tag", under the bare tag as well, plus any
+aliases. The keys live in one sorted list, so a prefix is a contiguous slice
+found with two bisects; the best-rated matches in that slice are picked with
+a NumPy partial sort.
+"""
+
+import bisect
+import json
+import unicodedata
+
+import numpy as np
+
+
+# Longest result list a query may ask for
+MAX_RESULTS = 20
+
+# Separators between a sponsor prefix and the tag ("TEAM | Tag", "TEAM ~ Tag")
+SPONSOR_SEPARATORS = ("|", "~")
+
+
+def fold(text):
+   """Normalizes text for matching: no diacritics, case-folded, single spaces."""
+   decomposed = unicodedata.normalize("NFKD", text)
+   stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+   return " ".join(stripped.casefold().split())
+
+
+def search_keys(tag, aliases=()):
+   """Returns the folded keys a tag can be found under."""
+   keys = {fold(tag)}
+   for separator in SPONSOR_SEPARATORS:
+      if separator in tag:
+         keys.add(fold(tag.rsplit(separator, 1)[1]))
+   keys.update(fold(alias) for alias in aliases)
+   keys.discard("")
+   return keys
+
+
+def load_aliases(path):
+   """Reads {"tag": ["alias", ...]} from a JSON file; a missing file means no aliases."""
+   try:
+      with open(path, encoding="utf-8") as f:
+         return json.load(f)
+   except FileNotFoundError:
+      return {}
+
+
+class PlayerIndex:
+   """Sorted prefix index over a list of tags, ranked by a parallel rating array."""
+
+   def __init__(self, tags, aliases=None):
+      aliases = aliases or {}
+      pairs = sorted((key, pid) for pid, tag in enumerate(tags) for key in search_keys(tag, aliases.get(tag, ())))
+      self.size = len(tags)
+      self.keys = [key for key, _ in pairs]
+      self.pids = np.fromiter((pid for _, pid in pairs), dtype=np.int64, count=len(pairs))
+
+   def search(self, query, ratings, limit=10):
+      """Returns up to `limit` player ids whose keys start with `query`, best rating first."""
+      prefix = fold(query)
+      if not prefix:
+         return []
+      limit = max(1, min(limit, MAX_RESULTS))
+      lo = bisect.bisect_left(self.keys, prefix)
+      hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo)
+      candidates = np.unique(self.pids[lo:hi])
+      if len(candidates) > limit:
+         candidates = candidates[np.argpartition(-ratings[candidates], limit - 1)[:limit]]
+      return candidates[np.argsort(-ratings[candidates], kind="stable")].tolist()
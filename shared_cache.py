@@ -0,0 +1,255 @@
+"""A two-tier cache shared by every worker process: a per-process LRU in front of a SQLite table.
+
+Each gunicorn worker keeps a small LRU of live objects, so repeat hits cost a
+dict lookup. On a local miss the worker looks in the shared tier, a SQLite
+database in WAL mode under data/ that every worker (and the `flask` CLI)
+opens. Only on a miss there too is the value built, and it is then written
+to both tiers, so a page one worker renders is served by the others without
+rendering it again. While one worker builds a value it holds a short lease on
+the key, and workers that miss on it meanwhile wait for that value instead of
+all building it at once (as they would right after new results come in).
+
+Nothing is ever invalidated in place. Callers put the versions a value was
+built from in its arguments (the results log offset, the asset manifest
+digest, ...), so new data simply produces new keys and every worker that has
+caught up with the same data finds the same entries. The whole key space is
+also prefixed with a generation derived from the app's source files, so a
+deploy never serves entries built by the previous code. Old entries are
+pruned oldest first once the shared tier outgrows max_bytes.
+
+Values cross process boundaries as pickles, so only put trusted objects in
+here; the database is a cache and can be deleted at any time.
+"""
+
+import collections
+import functools
+import glob
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+   key TEXT PRIMARY KEY,
+   value BLOB NOT NULL,
+   size INTEGER NOT NULL,
+   stored REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored);
+CREATE TABLE IF NOT EXISTS leases (
+   key TEXT PRIMARY KEY,
+   expires REAL NOT NULL
+);
+"""
+
+# The shared tier is pruned after every this many writes
+PRUNE_EVERY = 64
+
+# How often a worker waiting on another's lease looks for the value
+LEASE_POLL_SECONDS = 0.005
+
+CacheInfo = collections.namedtuple("CacheInfo", "hits misses maxsize currsize shared_hits")
+
+
+class LocalTier:
+   """A thread-safe, bounded LRU of live objects for one process."""
+
+   def __init__(self, maxsize):
+      self.maxsize = maxsize
+      self._entries = collections.OrderedDict()
+      self._lock = threading.Lock()
+
+   def __len__(self):
+      return len(self._entries)
+
+   def get(self, key, default=None):
+      with self._lock:
+         try:
+            self._entries.move_to_end(key)
+         except KeyError:
+            return default
+         return self._entries[key]
+
+   def set(self, key, value):
+      with self._lock:
+         self._entries[key] = value
+         self._entries.move_to_end(key)
+         while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+   def clear(self):
+      with self._lock:
+         self._entries.clear()
+
+
+class SQLiteTier:
+   """Byte values in a SQLite database (WAL mode) that any number of processes can share.
+
+   Connections don't survive fork(), so each process opens its own on first use.
+   A lease that is never released (its builder died) lapses after `lease` seconds.
+   """
+
+   def __init__(self, path, max_bytes=256 * 1024 * 1024, timeout=5.0, lease=10.0):
+      self.path = path
+      self.max_bytes = max_bytes
+      self.timeout = timeout
+      self.lease = lease
+      self._pid = None
+      self._lock = threading.Lock()
+      self._writes = 0
+
+   def _connection(self):
+      if self._pid != os.getpid():
+         os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+         # autocommit: every statement is its own short transaction
+         self._db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                    check_same_thread=False)
+         self._db.execute("PRAGMA journal_mode=WAL")
+         self._db.execute("PRAGMA synchronous=OFF")
+         self._db.executescript(SCHEMA)
+         self._pid = os.getpid()
+      return self._db
+
+   def get(self, key):
+      with self._lock:
+         row = self._connection().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+      return row and row[0]
+
+   def set(self, key, value):
+      with self._lock:
+         db = self._connection()
+         db.execute("INSERT OR REPLACE INTO entries (key, value, size, stored) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()))
+         self._writes += 1
+         if self._writes % PRUNE_EVERY == 0:
+            self._prune(db)
+
+   def claim(self, key):
+      """Takes the build lease on `key`; returns False if another builder holds it."""
+      now = time.time()
+      with self._lock:
+         db = self._connection()
+         db.execute("DELETE FROM leases WHERE key = ? AND expires < ?", (key, now))
+         return db.execute("INSERT OR IGNORE INTO leases (key, expires) VALUES (?, ?)",
+                           (key, now + self.lease)).rowcount == 1
+
+   def release(self, key):
+      with self._lock:
+         self._connection().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+   def _prune(self, db):
+      """Deletes the oldest entries until the table is back under max_bytes."""
+      total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+      excess = total - self.max_bytes
+      if excess <= 0:
+         return
+      doomed = []
+      for key, size in db.execute("SELECT key, size FROM entries ORDER BY stored"):
+         doomed.append((key,))
+         excess -= size
+         if excess <= 0:
+            break
+      db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+   def clear(self):
+      with self._lock:
+         self._connection().execute("DELETE FROM entries")
+
+   def stats(self):
+      """(entries, bytes) currently stored."""
+      with self._lock:
+         return tuple(self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone())
+
+
+class SharedCache:
+   """Memoizes functions through a LocalTier per function and one shared tier (or none)."""
+
+   def __init__(self, shared=None, generation="", dumps=None, loads=None):
+      self.shared = shared
+      self.generation = generation
+      self.dumps = dumps or functools.partial(pickle.dumps, protocol=pickle.HIGHEST_PROTOCOL)
+      self.loads = loads or pickle.loads
+
+   def memoize(self, namespace, maxsize=128, shared=True):
+      """Decorates a function of hashable, repr()-stable arguments, like functools.lru_cache.
+
+      A None result is only kept locally, so it is cheap to answer again but
+      never shared. shared=False keeps every result local: for functions keyed
+      by free-text input, where each new key would cost a write under the
+      database's single write lock and crowd real pages out of the shared tier.
+      The wrapper has cache_info() and cache_clear() (which empties the local
+      tier only).
+      """
+      def decorator(function):
+         local = LocalTier(maxsize)
+         counts = {"hits": 0, "shared_hits": 0, "misses": 0}
+         missing = object()
+
+         @functools.wraps(function)
+         def wrapper(*args):
+            value = local.get(args, missing)
+            if value is not missing:
+               counts["hits"] += 1
+               return value
+            if self.shared is None or not shared:
+               counts["misses"] += 1
+               value = function(*args)
+            else:
+               value = self._shared_call(f"{self.generation}:{namespace}:{args!r}", function, args, counts)
+            local.set(args, value)
+            return value
+
+         def cache_info():
+            return CacheInfo(counts["hits"] + counts["shared_hits"], counts["misses"], maxsize, len(local),
+                             counts["shared_hits"])
+
+         wrapper.cache_info = cache_info
+         wrapper.cache_clear = local.clear
+         return wrapper
+      return decorator
+
+   def _shared_call(self, key, function, args, counts):
+      """Reads `key` from the shared tier, or builds and stores it under the lease."""
+      data = self.shared.get(key)
+      while data is None:
+         if self.shared.claim(key):
+            try:
+               # the previous holder may have stored it between our read and the claim
+               data = self.shared.get(key)
+               if data is not None:
+                  break
+               counts["misses"] += 1
+               value = function(*args)
+               if value is not None:
+                  self.shared.set(key, self.dumps(value))
+               return value
+            finally:
+               self.shared.release(key)
+         time.sleep(LEASE_POLL_SECONDS)
+         data = self.shared.get(key)
+      counts["shared_hits"] += 1
+      return self.loads(data)
+
+
+def source_generation(root):
+   """A digest of the app's top-level Python sources, which changes with every deploy."""
+   digest = hashlib.sha256()
+   for path in sorted(glob.glob(os.path.join(root, "*.py"))):
+      with open(path, "rb") as f:
+         digest.update(f.read())
+   return digest.hexdigest()[:16]
+
+
+def init_app(app):
+   """Builds the app's SharedCache; SHARED_CACHE_PATH = None keeps every cache per process."""
+   app.config.setdefault("SHARED_CACHE_PATH", os.environ.get(
+      "SHARED_CACHE_PATH", os.path.join(app.root_path, "data", "cache.sqlite3")))
+   app.config.setdefault("SHARED_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+   shared = None
+   if app.config["SHARED_CACHE_PATH"]:
+      shared = SQLiteTier(app.config["SHARED_CACHE_PATH"], app.config["SHARED_CACHE_MAX_BYTES"])
+   return SharedCache(shared, source_generation(app.root_path))
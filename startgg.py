@@ -0,0 +1,482 @@
+"""Pulls completed Melee at Night brackets from the start.gg GraphQL API into SQLite.
+
+A sync is one asyncio run over a single pooled keep-alive session. A semaphore
+bounds the requests in flight, a token bucket keeps us under start.gg's rate
+limit, and 429s, 5xxs and dropped connections are retried with exponential
+backoff (honouring Retry-After). Tournament listings are cached with their ETag
+and revalidated with If-None-Match; an event is only refetched when its
+updatedAt moves. The ResultsStore imports finished events from the database
+into the results log, which is what /rankings reads.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import random
+import sqlite3
+import time
+
+import click
+
+from events import EASTERN
+from ratings import ResultSet
+
+try:
+   import aiohttp
+except ImportError:  # aiohttp is only needed to sync; the site reads the database without it
+   aiohttp = None
+
+
+# start.gg's public API allows 80 requests a minute per token
+DEFAULT_RATE = 80 / 60
+
+# videogame id of Super Smash Bros. Melee, and the event type of 1v1 brackets
+MELEE_VIDEOGAME_ID = 1
+SINGLES_EVENT_TYPE = 1
+
+# Statuses worth retrying; anything else is a bug in the query or the token
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Results-log source names for synced events are SOURCE_PREFIX + event id
+SOURCE_PREFIX = "startgg/"
+
+TOURNAMENTS_PER_PAGE = 25
+SETS_PER_PAGE = 50
+STANDINGS_PER_PAGE = 64
+
+TOURNAMENTS_QUERY = """
+query Tournaments($ownerId: ID!, $page: Int!, $perPage: Int!, $afterDate: Timestamp) {
+  tournaments(query: {page: $page, perPage: $perPage, sortBy: "startAt desc",
+                      filter: {ownerId: $ownerId, past: true, afterDate: $afterDate}}) {
+    pageInfo { totalPages }
+    nodes {
+      id name slug startAt
+      events { id name slug type state startAt updatedAt videogame { id } }
+    }
+  }
+}
+"""
+
+EVENT_SETS_QUERY = """
+query EventSets($eventId: ID!, $page: Int!, $perPage: Int!) {
+  event(id: $eventId) {
+    sets(page: $page, perPage: $perPage, sortType: STANDARD) {
+      pageInfo { totalPages }
+      nodes {
+        id completedAt winnerId
+        slots { entrant { id participants { gamerTag } } standing { stats { score { value } } } }
+      }
+    }
+  }
+}
+"""
+
+EVENT_STANDINGS_QUERY = """
+query EventStandings($eventId: ID!, $page: Int!, $perPage: Int!) {
+  event(id: $eventId) {
+    standings(query: {page: $page, perPage: $perPage}) {
+      pageInfo { totalPages }
+      nodes { placement entrant { participants { gamerTag } } }
+    }
+  }
+}
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+   id INTEGER PRIMARY KEY,
+   name TEXT NOT NULL,
+   slug TEXT NOT NULL,
+   date TEXT NOT NULL,
+   updated_at INTEGER NOT NULL,
+   set_count INTEGER NOT NULL,
+   synced_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sets (
+   id INTEGER PRIMARY KEY,
+   event_id INTEGER NOT NULL,
+   completed_at INTEGER,
+   winner TEXT NOT NULL,
+   loser TEXT NOT NULL,
+   winner_score INTEGER,
+   loser_score INTEGER
+);
+CREATE INDEX IF NOT EXISTS sets_by_event ON sets (event_id);
+CREATE TABLE IF NOT EXISTS placements (
+   event_id INTEGER NOT NULL,
+   tag TEXT NOT NULL,
+   placement INTEGER NOT NULL,
+   PRIMARY KEY (event_id, tag)
+);
+CREATE TABLE IF NOT EXISTS responses (
+   key TEXT PRIMARY KEY,
+   etag TEXT NOT NULL,
+   body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+   key TEXT PRIMARY KEY,
+   value TEXT NOT NULL
+);
+"""
+
+
+class StartGGError(Exception):
+   """The API refused a query or answered with GraphQL errors."""
+
+
+class SyncDatabase:
+   """The synced events, their sets and placements, and the sync's own bookkeeping.
+
+   The database runs in WAL mode so web workers can read it while a sync writes.
+   Only the sync sets it up; readers (read_only=True) open the existing file
+   without taking the write lock.
+   """
+
+   def __init__(self, path, read_only=False):
+      if read_only:
+         self.db = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True, timeout=30)
+         return
+      os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+      self.db = sqlite3.connect(path, timeout=30)
+      self.db.execute("PRAGMA journal_mode=WAL")
+      self.db.execute("PRAGMA synchronous=NORMAL")
+      self.db.executescript(SCHEMA)
+
+   def close(self):
+      self.db.close()
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *exc):
+      self.close()
+
+   def get_state(self, key, default=None):
+      row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+      return default if row is None else json.loads(row[0])
+
+   def set_state(self, key, value):
+      with self.db:
+         self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+   def cached_response(self, key):
+      """Returns (etag, body) stored for a request key, or None."""
+      return self.db.execute("SELECT etag, body FROM responses WHERE key = ?", (key,)).fetchone()
+
+   def store_response(self, key, etag, body):
+      with self.db:
+         self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, etag, body))
+
+   def updated_at(self):
+      """Returns {event id: updatedAt} for every synced event."""
+      return dict(self.db.execute("SELECT id, updated_at FROM events"))
+
+   def save_event(self, event, sets, placements):
+      """Replaces one event's sets and placements in a single transaction."""
+      with self.db:
+         self.db.execute("DELETE FROM sets WHERE event_id = ?", (event["id"],))
+         self.db.execute("DELETE FROM placements WHERE event_id = ?", (event["id"],))
+         self.db.executemany(
+            "INSERT OR REPLACE INTO sets VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(row[0], event["id"], *row[1:]) for row in sets])
+         self.db.executemany(
+            "INSERT OR REPLACE INTO placements VALUES (?, ?, ?)",
+            [(event["id"], tag, placement) for tag, placement in placements])
+         self.db.execute(
+            "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (event["id"], event["name"], event["slug"], event["date"], event["updated_at"],
+             len(sets), int(time.time())))
+
+   def completed_events(self):
+      """Returns {results-log source: version} for every synced event."""
+      rows = self.db.execute("SELECT id, updated_at, set_count FROM events")
+      return {f"{SOURCE_PREFIX}{id_}": [updated_at, set_count] for id_, updated_at, set_count in rows}
+
+   def event_results(self, source):
+      """Returns (sets, placements) for a source from completed_events, in the results-log layout."""
+      event_id = int(source[len(SOURCE_PREFIX):])
+      date, name = self.db.execute("SELECT date, name FROM events WHERE id = ?", (event_id,)).fetchone()
+      sets = [
+         ResultSet(date, name, winner, loser, winner_score, loser_score)
+         for winner, loser, winner_score, loser_score in self.db.execute(
+            "SELECT winner, loser, winner_score, loser_score FROM sets"
+            " WHERE event_id = ? ORDER BY completed_at, id", (event_id,))
+      ]
+      placements = [
+         (date, name, tag, placement)
+         for tag, placement in self.db.execute(
+            "SELECT tag, placement FROM placements WHERE event_id = ? ORDER BY placement", (event_id,))
+      ]
+      return sets, placements
+
+
+class TokenBucket:
+   """Allows `rate` acquisitions a second on average with bursts of up to `capacity`."""
+
+   def __init__(self, rate, capacity):
+      self.rate = rate
+      self.capacity = capacity
+      self.tokens = capacity
+      self.updated = time.monotonic()
+      self._lock = asyncio.Lock()
+
+   async def acquire(self):
+      # waiters queue on the lock, so tokens go out in arrival order
+      async with self._lock:
+         while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+               self.tokens -= 1
+               return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+   def drain(self, seconds):
+      """Spends the next `seconds` of refill, e.g. after the server answered 429."""
+      self.tokens = min(self.tokens, 0) - seconds * self.rate
+      self.updated = time.monotonic()
+
+
+class GraphQLClient:
+   """Sends GraphQL queries over a shared session with bounded concurrency, rate limiting and retries."""
+
+   def __init__(self, session, url, bucket, db=None, concurrency=4, retries=5, backoff=0.5):
+      self.session = session
+      self.url = url
+      self.bucket = bucket
+      self.db = db
+      self.retries = retries
+      self.backoff = backoff
+      self._semaphore = asyncio.Semaphore(concurrency)
+      self.counts = {"requests": 0, "not_modified": 0, "retries": 0}
+
+   def _delay(self, attempt, retry_after=None):
+      if retry_after:
+         try:
+            return float(retry_after)
+         except ValueError:
+            pass
+      # full jitter keeps retrying clients from hitting the server in lockstep
+      return random.uniform(0, self.backoff * 2 ** attempt)
+
+   async def query(self, operation, query, variables, conditional=False):
+      """Runs one query and returns its "data"; conditional queries revalidate a cached response."""
+      body = json.dumps({"operationName": operation, "query": query, "variables": variables}, sort_keys=True)
+      key = hashlib.sha256(body.encode("utf-8")).hexdigest() if conditional and self.db else None
+      cached = self.db.cached_response(key) if key else None
+      headers = {"If-None-Match": cached[0]} if cached else {}
+
+      for attempt in range(self.retries + 1):
+         await self.bucket.acquire()
+         try:
+            async with self._semaphore, self.session.post(self.url, data=body, headers=headers) as response:
+               self.counts["requests"] += 1
+               if response.status == 304 and cached:
+                  self.counts["not_modified"] += 1
+                  text = cached[1]
+               elif response.status == 200:
+                  text = await response.text()
+                  etag = response.headers.get("ETag")
+                  if key and etag:
+                     self.db.store_response(key, etag, text)
+               elif response.status in RETRY_STATUSES and attempt < self.retries:
+                  self.counts["retries"] += 1
+                  delay = self._delay(attempt, response.headers.get("Retry-After"))
+                  if response.status == 429:
+                     # every request waits out the limit, not just this one
+                     self.bucket.drain(delay)
+                  else:
+                     await asyncio.sleep(delay)
+                  continue
+               else:
+                  raise StartGGError(f"{operation}: HTTP {response.status}")
+         except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            if attempt == self.retries:
+               raise StartGGError(f"{operation}: {exc!r}") from exc
+            self.counts["retries"] += 1
+            await asyncio.sleep(self._delay(attempt))
+            continue
+
+         data = json.loads(text)
+         if data.get("errors"):
+            raise StartGGError(f"{operation}: {data['errors'][0].get('message')}")
+         return data["data"]
+
+   async def paginate(self, operation, query, variables, path, per_page, conditional=False):
+      """Returns the nodes of every page of a connection: page 1 gives the page count, the rest run concurrently."""
+      async def page(number):
+         data = await self.query(operation, query, dict(variables, page=number, perPage=per_page), conditional)
+         for name in path:
+            data = data.get(name) if data else None
+         if data is None:
+            raise StartGGError(f"{operation}: {'.'.join(path)} missing for {variables}")
+         return data
+
+      first = await page(1)
+      rest = await asyncio.gather(*(page(n) for n in range(2, (first["pageInfo"]["totalPages"] or 1) + 1)))
+      return [node for connection in (first, *rest) for node in connection["nodes"] or ()]
+
+
+def _tag(entrant):
+   """An entrant's gamer tag without sponsor prefix, or None for teams and byes."""
+   participants = (entrant or {}).get("participants") or ()
+   return participants[0]["gamerTag"].strip() if len(participants) == 1 else None
+
+
+def parse_set(node):
+   """Turns a set node into (id, completed_at, winner, loser, winner_score, loser_score), or None.
+
+   Unfinished sets, byes and DQs (a score of -1) carry no result and are dropped.
+   """
+   slots = node.get("slots") or ()
+   if node.get("winnerId") is None or len(slots) != 2:
+      return None
+   entrants = [slot.get("entrant") or {} for slot in slots]
+   tags = [_tag(entrant) for entrant in entrants]
+   scores = []
+   for slot in slots:
+      score = (((slot.get("standing") or {}).get("stats") or {}).get("score") or {}).get("value")
+      scores.append(None if score is None else int(score))
+   if None in tags or tags[0] == tags[1] or any(score is not None and score < 0 for score in scores):
+      return None
+   w = 0 if str(entrants[0].get("id")) == str(node["winnerId"]) else 1
+   return (int(node["id"]), node.get("completedAt"), tags[w], tags[1 - w], scores[w], scores[1 - w])
+
+
+class Sync:
+   """One pass over the owner's tournaments, saving every completed singles event that changed."""
+
+   def __init__(self, client, db, owner_id, lookback_days=7):
+      self.client = client
+      self.db = db
+      self.owner_id = owner_id
+      self.lookback_days = lookback_days
+      self.counts = {"events": 0, "sets": 0, "skipped": 0}
+
+   async def discover(self):
+      """Returns the completed Melee singles events and the latest tournament start seen.
+
+      Each pass re-reads the last few days of tournaments, so brackets finished
+      late or edited afterwards are picked up again.
+      """
+      through = self.db.get_state("discovered_through")
+      variables = {"ownerId": self.owner_id}
+      if through is not None:
+         variables["afterDate"] = through - self.lookback_days * 86400
+      tournaments = await self.client.paginate(
+         "Tournaments", TOURNAMENTS_QUERY, variables, ("tournaments",), TOURNAMENTS_PER_PAGE, conditional=True)
+      found = []
+      for tournament in tournaments:
+         for event in tournament.get("events") or ():
+            if (event.get("state") == "COMPLETED" and event.get("type") == SINGLES_EVENT_TYPE
+                  and (event.get("videogame") or {}).get("id") == MELEE_VIDEOGAME_ID):
+               start = event.get("startAt") or tournament["startAt"]
+               found.append({
+                  "id": int(event["id"]),
+                  "name": f"{tournament['name']}: {event['name']}",
+                  "slug": event["slug"],
+                  "date": datetime.datetime.fromtimestamp(start, EASTERN).date().isoformat(),
+                  "updated_at": int(event.get("updatedAt") or 0),
+               })
+      starts = [tournament["startAt"] for tournament in tournaments if tournament.get("startAt")]
+      return found, max(starts, default=through)
+
+   async def sync_event(self, event):
+      variables = {"eventId": event["id"]}
+      set_nodes, standing_nodes = await asyncio.gather(
+         self.client.paginate("EventSets", EVENT_SETS_QUERY, variables, ("event", "sets"), SETS_PER_PAGE),
+         self.client.paginate("EventStandings", EVENT_STANDINGS_QUERY, variables,
+                              ("event", "standings"), STANDINGS_PER_PAGE),
+      )
+      sets = [row for row in map(parse_set, set_nodes) if row is not None]
+      placements = [
+         (tag, int(node["placement"]))
+         for node in standing_nodes
+         if node.get("placement") and (tag := _tag(node.get("entrant"))) is not None
+      ]
+      self.db.save_event(event, sets, placements)
+      self.counts["events"] += 1
+      self.counts["sets"] += len(sets)
+
+   async def run(self):
+      synced = self.db.updated_at()
+      found, through = await self.discover()
+      stale = []
+      for event in found:
+         if synced.get(event["id"]) == event["updated_at"]:
+            self.counts["skipped"] += 1
+         else:
+            stale.append(event)
+      await asyncio.gather(*(self.sync_event(event) for event in stale))
+      if through is not None:
+         self.db.set_state("discovered_through", through)
+      return dict(self.counts, **self.client.counts)
+
+
+async def sync(db_path, url, token, owner_id, concurrency=4, rate=DEFAULT_RATE, burst=10,
+               retries=5, lookback_days=7, timeout=30):
+   """Runs one sync against `url` and returns its request and event counts."""
+   if aiohttp is None:
+      raise StartGGError("the start.gg sync needs aiohttp (pip install aiohttp)")
+   headers = {"Content-Type": "application/json"}
+   if token:
+      headers["Authorization"] = f"Bearer {token}"
+   connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+   session = aiohttp.ClientSession(
+      connector=connector, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout))
+   with SyncDatabase(db_path) as db:
+      async with session:
+         client = GraphQLClient(session, url, TokenBucket(rate, burst), db, concurrency, retries)
+         started = time.perf_counter()
+         counts = await Sync(client, db, owner_id, lookback_days).run()
+   counts["seconds"] = time.perf_counter() - started
+   return counts
+
+
+def init_app(app):
+   """Sets the sync's config defaults and registers `flask sync-startgg`."""
+   app.config.setdefault("STARTGG_API", os.environ.get("STARTGG_API", "https://api.start.gg/gql/alpha"))
+   app.config.setdefault("STARTGG_TOKEN", os.environ.get("STARTGG_TOKEN"))
+   # the start.gg user or organisation that runs the Melee at Night tournaments
+   app.config.setdefault("STARTGG_OWNER_ID", os.environ.get("STARTGG_OWNER_ID"))
+   app.config.setdefault("STARTGG_DB", os.path.join(app.root_path, "data", "startgg.sqlite3"))
+   app.config.setdefault("STARTGG_CONCURRENCY", 4)
+   app.config.setdefault("STARTGG_RATE", DEFAULT_RATE)
+   app.config.setdefault("STARTGG_BURST", 10)
+   app.config.setdefault("STARTGG_RETRIES", 5)
+   app.config.setdefault("STARTGG_LOOKBACK_DAYS", 7)
+   app.config.setdefault("STARTGG_INTERVAL", 15 * 60)
+
+   def run_once():
+      config = app.config
+      return asyncio.run(sync(
+         config["STARTGG_DB"], config["STARTGG_API"], config["STARTGG_TOKEN"], config["STARTGG_OWNER_ID"],
+         config["STARTGG_CONCURRENCY"], config["STARTGG_RATE"], config["STARTGG_BURST"],
+         config["STARTGG_RETRIES"], config["STARTGG_LOOKBACK_DAYS"],
+      ))
+
+   @app.cli.command("sync-startgg")
+   @click.option("--loop", is_flag=True, help="Keep syncing every STARTGG_INTERVAL seconds.")
+   def sync_startgg_command(loop):
+      """Pull completed events from start.gg into the results database."""
+      if not app.config["STARTGG_OWNER_ID"]:
+         raise click.ClickException("Set STARTGG_OWNER_ID to the start.gg owner of the tournaments")
+      while True:
+         try:
+            counts = run_once()
+         except StartGGError as exc:
+            if not loop:
+               raise click.ClickException(str(exc))
+            app.logger.error("start.gg sync failed: %s", exc)
+         else:
+            click.echo(
+               f"Synced {counts['events']} events ({counts['sets']} sets, {counts['skipped']} unchanged) "
+               f"in {counts['seconds']:.1f}s: {counts['requests']} requests, "
+               f"{counts['not_modified']} not modified, {counts['retries']} retries")
+         if not loop:
+            return
+         time.sleep(app.config["STARTGG_INTERVAL"])